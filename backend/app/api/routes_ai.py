@@ -1,18 +1,24 @@
 # backend/app/api/routes_ai.py
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Any, Dict, AsyncIterator
+from typing import Optional, Any, Dict, AsyncIterator, Callable
 import json
 import asyncio
 import logging
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_current_user, get_current_user_async, get_current_active_superuser
 from app.core.ai_client import ask_ai, stream_ai
-from app.db.session import get_db
-from app.services import tutor_service
+from app.core.ai_metrics import ai_metrics
+from app.core.ai_router import ai_router
+from app.core.ai_scheduler import ai_scheduler
+from app.core import sse
+from app.core.stream_replay import parse_last_event_id, stream_hub, subscribe
+from app.db.session import get_async_db, get_async_sessionmaker, get_db
+from app.services import tutor_search, tutor_service
 from app.core.rate_limit import limiter
 
 logger = logging.getLogger("app.api.routes_ai")
@@ -66,12 +72,16 @@ class CodeExecRequest(BaseModel):
 # ---------------------------
 
 
-async def _safe_ask_ai(prompt: str, temperature: float = 0.7, max_tokens: int = 450) -> str:
+async def _safe_ask_ai(
+    prompt: str, temperature: float = 0.7, max_tokens: int = 450, user_id: Optional[int] = None
+) -> str:
     """
     Wrapper around ask_ai that centralizes error handling.
     """
     try:
-        answer = await ask_ai(prompt=prompt, temperature=temperature, max_tokens=max_tokens)
+        answer = await ask_ai(
+            prompt=prompt, temperature=temperature, max_tokens=max_tokens, user_id=user_id
+        )
         if not isinstance(answer, str):
             answer = str(answer)
         return answer
@@ -85,11 +95,67 @@ async def _safe_ask_ai(prompt: str, temperature: float = 0.7, max_tokens: int =
 # ---------------------------
 
 
+def _replayable_stream(
+    request: Request, new_session: Callable[[], AsyncSession], conv_id: int, user_id, events, label: str
+):
+    """
+    Run the reply in a replay buffer (see app/core/stream_replay.py) and follow it.
+    The reply is saved in a session of its own: the generation can outlive the
+    request, and with it the request's `adb`.
+    """
+    stream = stream_hub.start(
+        conv_id,
+        user_id,
+        sse.reply_events(
+            events,
+            conv_id=conv_id,
+            on_finish=lambda text: tutor_service.save_streamed_reply_async(new_session(), conv_id, text),
+            label=label,
+        ),
+    )
+    return StreamingResponse(subscribe(request, stream), media_type="text/event-stream", headers=sse.SSE_HEADERS)
+
+
+def _resume_stream(request: Request, conv_id: int, user_id, last_event_id: int):
+    """Re-attach a reconnecting client to a running (or recently finished) reply."""
+    stream = stream_hub.get(conv_id)
+    if stream is None or stream.user_id != user_id or not stream.covers(last_event_id):
+        raise HTTPException(status_code=410, detail="Stream no longer available; reload the conversation")
+    return StreamingResponse(
+        subscribe(request, stream, after_id=last_event_id),
+        media_type="text/event-stream",
+        headers=sse.SSE_HEADERS,
+    )
+
+
 @router.get("/", summary="AI router root (diagnostic)")
 def ai_root():
     return {"status": "ai router mounted"}
 
 
+@router.get("/providers", summary="Provider health: breakers, latency, failovers (admin)")
+def ai_providers(user=Depends(get_current_active_superuser)):
+    return ai_router.snapshot()
+
+
+@router.get("/scheduler", summary="Upstream queue depth, in-flight calls and wait times (admin)")
+def ai_scheduler_stats(user=Depends(get_current_active_superuser)):
+    return ai_scheduler.snapshot()
+
+
+@router.get("/streams", summary="SSE stream counters: frames, bytes, deltas per frame (admin)")
+def ai_stream_stats(user=Depends(get_current_active_superuser)):
+    return {**sse.sse_stats.snapshot(), **stream_hub.snapshot()}
+
+
+@router.get("/metrics", summary="LLM call telemetry per endpoint/provider/model (admin)")
+def ai_call_metrics(reset: bool = False, user=Depends(get_current_active_superuser)):
+    snapshot = ai_metrics.snapshot()
+    if reset:
+        ai_metrics.reset()
+    return snapshot
+
+
 # ---------------------------
 # [REMOVED] /test endpoint — was unauthenticated (VULN-02)
 # Use /ask with auth instead.
@@ -103,25 +169,26 @@ def ai_root():
 async def ask_question(
     request: Request,
     req: AskRequest,
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user=Depends(get_current_user_async),
+    adb: AsyncSession = Depends(get_async_db),
 ):
     """
     Simple non-streaming ask endpoint. Saves to conversation memory if conversation_id provided.
     Request body: { "prompt": "...", "conversation_id": 123 (optional) }
     Returns: { "response": "...", "conversation_id": n }
     """
+    user_id = getattr(user, "id", None)
     try:
-        conv_id = req.conversation_id
-        if conv_id is None:
-            conv = tutor_service.create_conversation(db, user_id=getattr(user, "id", None))
-            conv_id = conv.id
-
-        tutor_service.add_message(db, conv_id, "user", req.prompt)
+        conv_id, _ = await tutor_service.prepare_turn(
+            adb, req.conversation_id, user_id, req.prompt, build_context=False
+        )
+        await tutor_service.release_connection_async(adb)
 
-        answer = await _safe_ask_ai(prompt=req.prompt, temperature=0.7, max_tokens=450)
+        answer = await _safe_ask_ai(
+            prompt=req.prompt, temperature=0.7, max_tokens=450, user_id=user_id
+        )
 
-        tutor_service.add_message(db, conv_id, "assistant", answer)
+        await tutor_service.add_message_async(adb, conv_id, "assistant", answer)
 
         return {"response": answer, "conversation_id": conv_id}
     except HTTPException:
@@ -133,22 +200,28 @@ async def ask_question(
 
 @router.post("/chat", summary="Compatibility /chat endpoint (accepts { message })")
 @limiter.limit("10/minute")
-async def chat_compat(request: Request, req: ChatPayload, user=Depends(get_current_user), db: Session = Depends(get_db)):
+async def chat_compat(
+    request: Request,
+    req: ChatPayload,
+    user=Depends(get_current_user_async),
+    adb: AsyncSession = Depends(get_async_db),
+):
     """
     Backwards-compatible endpoint for older frontends that POST { "message": "..." } to /api/ai/chat.
     The frontend expects: { reply: string, conversation_id: number }
     """
+    user_id = getattr(user, "id", None)
     try:
-        conv_id = req.conversation_id
-        if conv_id is None:
-            conv = tutor_service.create_conversation(db, user_id=getattr(user, "id", None))
-            conv_id = conv.id
-
-        tutor_service.add_message(db, conv_id, "user", req.message)
+        conv_id, _ = await tutor_service.prepare_turn(
+            adb, req.conversation_id, user_id, req.message, build_context=False
+        )
+        await tutor_service.release_connection_async(adb)
 
-        answer = await _safe_ask_ai(prompt=req.message, temperature=0.7, max_tokens=1024)
+        answer = await _safe_ask_ai(
+            prompt=req.message, temperature=0.7, max_tokens=1024, user_id=user_id
+        )
 
-        tutor_service.add_message(db, conv_id, "assistant", answer)
+        await tutor_service.add_message_async(adb, conv_id, "assistant", answer)
 
         # IMPORTANT: 'reply' key matches frontend/src/lib/ai.ts expectation
         return {"reply": answer, "conversation_id": conv_id}
@@ -164,8 +237,9 @@ async def chat_compat(request: Request, req: ChatPayload, user=Depends(get_curre
 async def chat_stream(
     request: Request,
     req: ChatPayload,
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user=Depends(get_current_user_async),
+    adb: AsyncSession = Depends(get_async_db),
+    new_session: Callable[[], AsyncSession] = Depends(get_async_sessionmaker),
 ):
     """
     Real-time streaming chat endpoint using Server-Sent Events (SSE).
@@ -177,64 +251,54 @@ async def chat_stream(
       data: {"type":"conv","conversation_id":123}   ← sent first
       data: {"type":"delta","text":"Hello"}          ← token chunks
       data: {"type":"done","full_text":"Hello ..."}  ← final event
-    """
-    try:
-        conv_id = req.conversation_id
-        if conv_id is None:
-            conv = tutor_service.create_conversation(db, user_id=getattr(user, "id", None))
-            conv_id = conv.id
 
-        # Save user message immediately
-        tutor_service.add_message(db, conv_id, "user", req.message)
+    Every event carries an SSE `id:`. If the connection drops, re-POST with
+    the conversation_id and a `Last-Event-ID` header (or use
+    GET /chat/stream/{conv_id}/resume) to pick up where it stopped — the
+    generation keeps running server-side, so no new AI call is made.
 
-        # Build contextual messages with conversation history
-        messages = tutor_service.build_contextual_messages(db, conv_id, req.message)
+    No DB connection is held while tokens flow: setup writes commit (on the
+    async engine, so the event loop never blocks on them) and the connection
+    goes back to the pool before streaming starts; the reply is saved
+    afterwards in its own short unit of work.
+    """
+    user_id = getattr(user, "id", None)
+    last_event_id = parse_last_event_id(request)
+    if last_event_id is not None and req.conversation_id is not None:
+        return _resume_stream(request, req.conversation_id, user_id, last_event_id)
 
+    try:
+        # Save the user message and build the prompt with conversation history
+        conv_id, messages = await tutor_service.prepare_turn(adb, req.conversation_id, user_id, req.message)
     except Exception as e:
         logger.exception("chat_stream setup error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        await tutor_service.release_connection_async(adb)
 
-    async def event_generator() -> AsyncIterator[str]:
-        # Send conversation ID first so frontend can track it
-        yield f"data: {json.dumps({'type': 'conv', 'conversation_id': conv_id})}\n\n"
-
-        full_text_parts = []
-        try:
-            async for evt in stream_ai(messages=messages, temperature=0.7, max_tokens=1024):
-                if await request.is_disconnected():
-                    break
-
-                if evt.get("type") == "delta":
-                    text = evt.get("text", "")
-                    full_text_parts.append(text)
-                    yield f"data: {json.dumps({'type': 'delta', 'text': text})}\n\n"
-
-                elif evt.get("type") == "done":
-                    full_text = "".join(full_text_parts).strip()
-                    # Save complete assistant response to DB
-                    if full_text:
-                        tutor_service.add_message(db, conv_id, "assistant", full_text)
-                    yield f"data: {json.dumps({'type': 'done', 'full_text': full_text})}\n\n"
+    return _replayable_stream(
+        request, new_session, conv_id, user_id,
+        stream_ai(messages=messages, temperature=0.7, max_tokens=1024, user_id=user_id),
+        label="chat",
+    )
 
-        except asyncio.CancelledError:
-            logger.info("SSE client disconnected for conv_id=%s", conv_id)
-            # Still save what we have
-            partial = "".join(full_text_parts).strip()
-            if partial:
-                tutor_service.add_message(db, conv_id, "assistant", partial)
-        except Exception as e:
-            logger.exception("stream_ai error: %s", e)
-            yield f"data: {json.dumps({'type': 'error', 'message': 'AI streaming error'})}\n\n"
 
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",   # Disable nginx/Render proxy buffering
-            "Connection": "keep-alive",
-        },
-    )
+@router.get("/chat/stream/{conv_id}/resume", summary="Resume a dropped chat stream (SSE, Last-Event-ID)")
+async def chat_stream_resume(
+    conv_id: int,
+    request: Request,
+    last_event_id: Optional[int] = None,
+    user=Depends(get_current_user_async),
+):
+    """
+    Replays a chat stream's events after `Last-Event-ID` (header, as sent by
+    EventSource on reconnect, or the `last_event_id` query parameter) and
+    follows it live if it is still generating. 410 once it has expired.
+    """
+    user_id = getattr(user, "id", None)
+    header_id = parse_last_event_id(request)
+    after = header_id if header_id is not None else (last_event_id if last_event_id is not None else 0)
+    return _resume_stream(request, conv_id, user_id, after)
 
 
 # ---------------------------
@@ -299,69 +363,38 @@ def _build_contextual_system_prompt(req: ContextualChatPayload) -> str:
 async def chat_stream_contextual(
     request: Request,
     req: ContextualChatPayload,
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user=Depends(get_current_user_async),
+    adb: AsyncSession = Depends(get_async_db),
+    new_session: Callable[[], AsyncSession] = Depends(get_async_sessionmaker),
 ):
     """
     Context-aware streaming chat endpoint for the inline AI tutor.
     Accepts additional context (code, language, system design state) and injects
     it into the system prompt so the AI can give contextual assistance.
+    Like chat_stream, no DB connection is held while streaming, and a dropped
+    stream can be resumed with `Last-Event-ID`.
     """
-    try:
-        conv_id = req.conversation_id
-        if conv_id is None:
-            conv = tutor_service.create_conversation(db, user_id=getattr(user, "id", None))
-            conv_id = conv.id
-
-        tutor_service.add_message(db, conv_id, "user", req.message)
+    user_id = getattr(user, "id", None)
+    last_event_id = parse_last_event_id(request)
+    if last_event_id is not None and req.conversation_id is not None:
+        return _resume_stream(request, req.conversation_id, user_id, last_event_id)
 
+    try:
         # Build contextual system prompt
         system_prompt = _build_contextual_system_prompt(req)
-        messages = tutor_service.build_contextual_messages(
-            db, conv_id, req.message, extra_system=system_prompt
+        conv_id, messages = await tutor_service.prepare_turn(
+            adb, req.conversation_id, user_id, req.message, extra_system=system_prompt
         )
-
     except Exception as e:
         logger.exception("chat_stream_contextual setup error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        await tutor_service.release_connection_async(adb)
 
-    async def event_generator() -> AsyncIterator[str]:
-        yield f"data: {json.dumps({'type': 'conv', 'conversation_id': conv_id})}\n\n"
-
-        full_text_parts = []
-        try:
-            async for evt in stream_ai(messages=messages, temperature=0.7, max_tokens=2048):
-                if await request.is_disconnected():
-                    break
-
-                if evt.get("type") == "delta":
-                    text = evt.get("text", "")
-                    full_text_parts.append(text)
-                    yield f"data: {json.dumps({'type': 'delta', 'text': text})}\n\n"
-
-                elif evt.get("type") == "done":
-                    full_text = "".join(full_text_parts).strip()
-                    if full_text:
-                        tutor_service.add_message(db, conv_id, "assistant", full_text)
-                    yield f"data: {json.dumps({'type': 'done', 'full_text': full_text})}\n\n"
-
-        except asyncio.CancelledError:
-            logger.info("SSE client disconnected for contextual conv_id=%s", conv_id)
-            partial = "".join(full_text_parts).strip()
-            if partial:
-                tutor_service.add_message(db, conv_id, "assistant", partial)
-        except Exception as e:
-            logger.exception("contextual stream_ai error: %s", e)
-            yield f"data: {json.dumps({'type': 'error', 'message': 'AI streaming error'})}\n\n"
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-        },
+    return _replayable_stream(
+        request, new_session, conv_id, user_id,
+        stream_ai(messages=messages, temperature=0.7, max_tokens=2048, user_id=user_id),
+        label="contextual chat",
     )
 
 
@@ -374,54 +407,64 @@ async def chat_stream_contextual(
 async def stream_response(
     conv_id: int,
     request: Request,
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user=Depends(get_current_user_async),
+    adb: AsyncSession = Depends(get_async_db),
 ):
     """
     Streams a model response as server-sent events (SSE).
     Example client: use EventSource('/api/ai/stream/123') and parse events.
     """
-    # SECURITY: Verify conversation ownership (VULN-05 IDOR fix)
-    from app.db.models_tutor import Conversation
-    conv = db.query(Conversation).filter(
-        Conversation.id == conv_id,
-        Conversation.user_id == getattr(user, "id", None),
-    ).first()
+    user_id = getattr(user, "id", None)
+
+    def _load(session: Session):
+        # SECURITY: Verify conversation ownership (VULN-05 IDOR fix)
+        from app.db.models_tutor import Conversation
+        conv = session.query(Conversation).filter(
+            Conversation.id == conv_id,
+            Conversation.user_id == user_id,
+        ).first()
+        if not conv:
+            return None, None
+        last = tutor_service.get_recent_messages(session, conv_id, 1)
+        return conv, (
+            tutor_service.build_contextual_messages(session, conv_id, last[0].content)
+            if last else None
+        )
+
+    try:
+        # Read everything the stream needs up front, then release the connection
+        conv, messages = await adb.run_sync(_load)
+    finally:
+        await tutor_service.release_connection_async(adb)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    async def event_generator() -> AsyncIterator[str]:
-        msgs = tutor_service.get_conversation_messages(db, conv_id)
-        if not msgs:
-            yield "data: " + json.dumps({"error": "conversation not found"}) + "\n\n"
+    async def event_generator() -> AsyncIterator[bytes]:
+        if not messages:
+            yield sse.frame({"error": "conversation not found"})
             return
 
-        messages = tutor_service.build_contextual_messages(db, conv_id, msgs[-1].content)
-
         try:
-            async for evt in stream_ai(messages=messages, temperature=0.7, max_tokens=600):
-                try:
-                    payload = json.dumps({"event": evt})
-                except Exception:
-                    payload = json.dumps({"event": str(evt)})
-                yield f"data: {payload}\n\n"
-
-                if await request.is_disconnected():
-                    break
+            async with sse.DisconnectWatcher(request) as watcher:
+                async for evt in sse.coalesce(
+                    stream_ai(messages=messages, temperature=0.7, max_tokens=600, user_id=user_id),
+                    abort=watcher.gone,
+                ):
+                    try:
+                        payload = sse.frame({"event": evt})
+                    except Exception:
+                        payload = sse.frame({"event": str(evt)})
+                    yield payload
         except asyncio.CancelledError:
             logger.info("SSE client disconnected (CancelledError) for conv_id=%s", conv_id)
         except Exception as e:
             logger.exception("stream_ai error: %s", e)
-            yield "data: " + json.dumps({"error": "AI streaming error"}) + "\n\n"
+            yield sse.frame({"error": "AI streaming error"})
 
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",   # Disable nginx/Render proxy buffering
-            "Connection": "keep-alive",
-        },
+        headers=sse.SSE_HEADERS,
     )
 
 
@@ -444,13 +487,15 @@ def list_conversations(
     db: Session = Depends(get_db),
 ):
     """
-    Returns paginated conversations for the current user, ordered by most recent first.
-    Each includes a preview snippet and message count.
+    Returns paginated conversations for the current user, most recently
+    active first, each with a preview snippet and message count.
 
-    Optimized: single query with subqueries instead of N+1 pattern.
+    The count, preview and last activity are stored on the conversation row
+    (kept current as messages are inserted), so this is one range scan of
+    idx_tutor_conversations_user_recent — independent of message volume.
     """
-    from app.db.models_tutor import Conversation, TutorMessage
-    from sqlalchemy import func, select
+    from app.db.models_tutor import Conversation
+    from sqlalchemy import func
 
     user_id = getattr(user, "id", None)
 
@@ -458,51 +503,17 @@ def list_conversations(
     limit = min(max(limit, 1), 50)
     offset = max(offset, 0)
 
-    # Subquery: message count per conversation
-    msg_count_sq = (
-        select(
-            TutorMessage.conversation_id,
-            func.count(TutorMessage.id).label("msg_count"),
-        )
-        .group_by(TutorMessage.conversation_id)
-        .subquery()
-    )
-
-    # Subquery: first user message per conversation (for preview)
-    # Use ROW_NUMBER to pick the earliest user message per conversation
-    first_msg_sq = (
-        select(
-            TutorMessage.conversation_id,
-            TutorMessage.content,
-            func.row_number()
-            .over(
-                partition_by=TutorMessage.conversation_id,
-                order_by=TutorMessage.created_at.asc(),
-            )
-            .label("rn"),
-        )
-        .where(TutorMessage.role == "user")
-        .subquery()
-    )
-    first_user_msg = (
-        select(first_msg_sq.c.conversation_id, first_msg_sq.c.content)
-        .where(first_msg_sq.c.rn == 1)
-        .subquery()
-    )
-
-    # Main query — single pass with LEFT JOINs
     rows = (
         db.query(
             Conversation.id,
             Conversation.topic,
             Conversation.created_at,
-            func.coalesce(msg_count_sq.c.msg_count, 0).label("message_count"),
-            first_user_msg.c.content.label("preview_content"),
+            Conversation.message_count,
+            Conversation.preview,
+            Conversation.last_message_at,
         )
-        .outerjoin(msg_count_sq, msg_count_sq.c.conversation_id == Conversation.id)
-        .outerjoin(first_user_msg, first_user_msg.c.conversation_id == Conversation.id)
         .filter(Conversation.user_id == user_id)
-        .order_by(Conversation.created_at.desc())
+        .order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
         .limit(limit)
         .offset(offset)
         .all()
@@ -517,21 +528,54 @@ def list_conversations(
 
     result = []
     for row in rows:
-        content = row.preview_content or ""
-        preview = (content[:80] + "...") if len(content) > 80 else content
         result.append({
             "id": row.id,
             "topic": row.topic,
-            "preview": preview,
-            "message_count": row.message_count,
+            "preview": row.preview or "",
+            "message_count": row.message_count or 0,
             "created_at": row.created_at.isoformat() if row.created_at else None,
+            "last_message_at": row.last_message_at.isoformat() if row.last_message_at else None,
         })
 
     return {"conversations": result, "total": total, "limit": limit, "offset": offset}
 
 
-@router.get("/conversations/{conv_id}", summary="Get conversation messages")
-def get_conversation(conv_id: int, user=Depends(get_current_user), db: Session = Depends(get_db)):
+# Declared before /conversations/{conv_id} so "search" isn't parsed as an id
+@router.get("/conversations/search", summary="Full-text search across the user's conversations")
+def search_conversations(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Ranked message matches with highlighted snippets (matches wrapped in
+    <mark>, everything else HTML-escaped). Archived conversations match as a
+    whole (message_id null, archived true). Supports web-search syntax on
+    Postgres ("quoted phrase", -exclude, or).
+    """
+    results = tutor_search.search_messages(db, getattr(user, "id", None), q, limit=limit)
+    return {"query": q, "results": results}
+
+
+@router.get("/conversations/{conv_id}", summary="Get conversation messages (keyset-paginated)")
+def get_conversation(
+    conv_id: int,
+    before_id: Optional[int] = Query(None, description="Page of messages older than this id"),
+    after_id: Optional[int] = Query(None, description="Page of messages newer than this id"),
+    limit: int = Query(50, ge=1, le=200),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Messages oldest first. Without a cursor this is the latest `limit`
+    messages; pass the first message's id as `before_id` to load older ones
+    (`has_more` says whether any are left), or the last id as `after_id` to
+    catch up on newer ones.
+    """
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id, not both")
+
     # SECURITY: Verify conversation ownership (IDOR fix)
     from app.db.models_tutor import Conversation
     conv = db.query(Conversation).filter(
@@ -541,7 +585,10 @@ def get_conversation(conv_id: int, user=Depends(get_current_user), db: Session =
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    msgs = tutor_service.get_conversation_messages(db, conv_id)
+    tutor_service.ensure_live(db, conv)
+    msgs, has_more = tutor_service.get_messages_page(
+        db, conv_id, before_id=before_id, after_id=after_id, limit=limit
+    )
     return {
         "messages": [
             {
@@ -551,7 +598,8 @@ def get_conversation(conv_id: int, user=Depends(get_current_user), db: Session =
                 "created_at": m.created_at.isoformat(),
             }
             for m in msgs
-        ]
+        ],
+        "has_more": has_more,
     }
 
 
@@ -566,8 +614,7 @@ def delete_conversation(conv_id: int, user=Depends(get_current_user), db: Sessio
     ).first()
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    db.delete(conv)
-    db.commit()
+    tutor_service.delete_conversation(db, conv)
     return {"status": "deleted"}
 
 
@@ -584,6 +631,7 @@ async def create_mcq(request: Request, req: MCQRequest, user=Depends(get_current
             topic=req.topic,
             difficulty=req.difficulty,
             count=req.count,
+            user_id=getattr(user, "id", None),
         )
         return mcq
     except HTTPException:
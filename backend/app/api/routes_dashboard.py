@@ -9,8 +9,9 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.auth.dependencies import get_current_user
 from app.models.user import User
-from app.models.problem import Problem
 from app.models.progress import Progress, UserProgress
+from app.services.problem_catalog import problem_catalog
+from app.services.solved_index import solved_index
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -57,15 +58,15 @@ def get_dashboard_summary(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    # ── Per-problem Progress records ─────────────────────────────────
+    # ── Solved count from the cached solved bitmap ───────────────────
+    problems_solved = len(solved_index.get(db, current_user.id))
+
+    # ── Streak (only the solve timestamps are read) ──────────────────
     progress_records = (
-        db.query(Progress)
-        .filter(Progress.user_id == current_user.id)
+        db.query(Progress.solved, Progress.last_attempt)
+        .filter(Progress.user_id == current_user.id, Progress.solved == True)  # noqa: E712
         .all()
     )
-    problems_solved = sum(1 for p in progress_records if p.solved)
-
-    # ── Streak ───────────────────────────────────────────────────────
     streak = _compute_streak(progress_records)
 
     # ── Completed roadmaps (UserProgress JSON list) ──────────────────
@@ -80,24 +81,23 @@ def get_dashboard_summary(
         else []
     )
 
-    # ── Recent activity (last 5 solved problems with titles) ─────────
-    solved_records = [p for p in progress_records if p.solved]
-    solved_records.sort(key=lambda p: p.last_attempt or datetime.min, reverse=True)
-    recent_solved = solved_records[:5]
-
-    # Bulk-fetch the problem titles  
-    problem_ids = [p.problem_id for p in recent_solved]
-    problems_map: dict[int, str] = {}
-    if problem_ids:
-        probs = db.query(Problem.id, Problem.title).filter(Problem.id.in_(problem_ids)).all()
-        problems_map = {row.id: row.title for row in probs}
+    # ── Recent activity (last 5 solved problems, titles from the catalog snapshot) ──
+    recent_solved = (
+        db.query(Progress.id, Progress.problem_id, Progress.last_attempt)
+        .filter(Progress.user_id == current_user.id, Progress.solved == True)  # noqa: E712
+        .order_by(Progress.last_attempt.desc().nulls_last(), Progress.id.desc())
+        .limit(5)
+        .all()
+    )
+    catalog = problem_catalog.get(db)
 
     activity_list = []
     for prog in recent_solved:
         ts = prog.last_attempt
         if ts and ts.tzinfo is None:
             ts = ts.replace(tzinfo=timezone.utc)
-        title = problems_map.get(prog.problem_id, f"Problem #{prog.problem_id}")
+        row = catalog.row(prog.problem_id)
+        title = row["title"] if row else f"Problem #{prog.problem_id}"
         activity_list.append(
             {
                 "id": prog.id,
@@ -1,11 +1,13 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Body
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import httpx
 from typing import Dict, Any, Optional
 
-from app.db.session import get_db
-from app.auth.dependencies import get_current_user
+from app.db.session import get_async_db, get_db
+from app.auth.dependencies import get_current_user, get_current_user_async
 from app.models.user import User
 from app.core.config import settings
 import base64
@@ -29,8 +31,8 @@ def get_auth_url() -> Dict[str, str]:
 @router.post("/connect")
 async def connect_github(
     code: str = Body(..., embed=True),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    adb: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ) -> Dict[str, str]:
     if not settings.GITHUB_CLIENT_ID or not settings.GITHUB_CLIENT_SECRET:
         raise HTTPException(status_code=500, detail="GitHub OAuth not configured.")
@@ -72,9 +74,12 @@ async def connect_github(
         github_username = user_resp.json().get("login")
 
         # 3. Store in DB
-        current_user.github_access_token = access_token
-        current_user.github_username = github_username
-        db.commit()
+        await adb.execute(
+            update(User)
+            .where(User.id == current_user.id)
+            .values(github_access_token=access_token, github_username=github_username)
+        )
+        await adb.commit()
 
         return {"status": "success", "github_username": github_username}
 
@@ -103,7 +103,10 @@ Return ONLY the polished answer text, nothing else."""
     ]
 
     try:
-        answer = await ask_ai_interview(messages, temperature=0.6, max_tokens=500)
+        # Same STAR fields → same polish; serve repeats from the response cache
+        answer = await ask_ai_interview(
+            messages, temperature=0.6, max_tokens=500, cache=True, user_id=user.id
+        )
         return {"polished": answer}
     except Exception as e:
         logger.exception("polish_star error: %s", e)
@@ -190,7 +193,7 @@ Now provide your final feedback in this EXACT JSON format (no markdown, no expla
             messages = history_messages
 
     try:
-        answer = await ask_ai_mock_interview(messages, temperature=0.7, max_tokens=600)
+        answer = await ask_ai_mock_interview(messages, temperature=0.7, max_tokens=600, user_id=user.id)
 
         # Try to parse JSON feedback response
         if is_final_feedback:
@@ -282,7 +285,7 @@ async def salary_negotiate(
         messages.append({"role": "user", "content": req.user_response})
 
     try:
-        answer = await ask_ai_interview(messages, temperature=0.75, max_tokens=300)
+        answer = await ask_ai_interview(messages, temperature=0.75, max_tokens=300, user_id=user.id)
         return {"text": answer, "role": "interviewer"}
     except Exception as e:
         logger.exception("salary_negotiate error: %s", e)
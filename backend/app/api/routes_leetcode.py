@@ -1,10 +1,10 @@
 # backend/app/api/routes_leetcode.py
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.user import User
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_current_user_async
 from app.schemas.leetcode import LeetCodeSyncRequest, LeetCodeSyncResponse
 from app.services.leetcode_service import sync_leetcode
 from app.core.rate_limit import limiter
@@ -17,8 +17,8 @@ router = APIRouter(tags=["LeetCode"])
 async def sync_profile(
     request: Request,
     payload: LeetCodeSyncRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ):
     result = await sync_leetcode(
         db=db,
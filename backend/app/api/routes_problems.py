@@ -1,15 +1,18 @@
 # backend/app/api/routes_problems.py
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
 from typing import List, Optional
-import random
+import base64
+import binascii
+import json
 
 from app.db.session import get_db
 from app.models.problem import Problem
-from app.models.progress import Progress
 from app.models.user import User
 from app.auth.dependencies import get_current_user, get_current_active_superuser
+from app.services.problem_catalog import bump_version, page_ids, problem_catalog, problem_stats, random_id
+from app.services.problem_search import problem_search
+from app.services.solved_index import solved_index
 from app.schemas.problem import (
     Problem as ProblemSchema,
     ProblemDetail,
@@ -21,6 +24,22 @@ from app.schemas.problem import (
 router = APIRouter(tags=["Problems"])  # ❗ NO PREFIX
 
 
+def _is_set(value: Optional[str]) -> bool:
+    return bool(value) and value.lower() not in ("all", "none", "")
+
+
+def _encode_cursor(after_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": after_id}).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return int(json.loads(raw)["after"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 # ============================================================
 # GET PROBLEMS (with pagination & filtering)
 # ============================================================
@@ -32,93 +51,54 @@ def get_problems(
     difficulty: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
     status: Optional[str] = Query(None),  # "all", "solved", "unsolved"
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (replaces `page`)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user_id = current_user.id
-    
-    # Base query
-    query = db.query(Problem)
-
-    # Search filter
+    """
+    Page mode (`page`) or cursor mode (`cursor`, for infinite scroll); both
+    return `next_cursor`. Either way a page costs the same at any depth.
+    """
+    # Filtering, counting and paging run on the in-memory catalog snapshot;
+    # a search narrows it to the index's hits, most relevant first
+    catalog = problem_catalog.get(db)
+    hits = None
     if search and search.strip():
-        search_term = f"%{search.strip()}%"
-        query = query.filter(
-            or_(
-                Problem.title.ilike(search_term),
-                Problem.description.ilike(search_term)
-            )
+        hits = problem_search.search_ids(db, search, catalog.version)
+    filters = {
+        "difficulty": difficulty if _is_set(difficulty) else None,
+        "category": category if _is_set(category) else None,
+    }
+    ids = catalog.filter_ids(**filters, within=hits)
+
+    # The only per-user lookup (cached bitmap)
+    solved_set = solved_index.get(db, current_user.id)
+
+    # Status filter (solved/unsolved) and the page itself
+    try:
+        page_list, total, last_id = page_ids(
+            ids,
+            solved_set,
+            status.lower() if _is_set(status) else None,
+            page_size,
+            offset=(page - 1) * page_size,
+            after_id=_decode_cursor(cursor) if cursor else None,
+            id_ordered=hits is None,
+            ids_bits=catalog.filter_bits(**filters) if hits is None else None,
         )
+    except ValueError:   # cursor from a different search
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    # Difficulty filter (case-insensitive - capitalize to match DB format)
-    if difficulty and difficulty.lower() not in ["all", "none", ""]:
-        difficulty_value = difficulty.capitalize()
-        query = query.filter(Problem.difficulty == difficulty_value)
-
-    # Category filter
-    if category and category.lower() not in ["all", "none", ""]:
-        query = query.filter(Problem.category == category)
-
-    # Status filter (solved/unsolved)
-    if status and status.lower() not in ["all", "none", ""]:
-        if status.lower() == "solved":
-            # Only problems that the user has solved
-            solved_problem_ids = db.query(Progress.problem_id).filter(
-                Progress.user_id == user_id,
-                Progress.solved == True
-            ).subquery()
-            query = query.filter(Problem.id.in_(solved_problem_ids))
-        elif status.lower() == "unsolved":
-            # Problems that user hasn't solved
-            solved_problem_ids = db.query(Progress.problem_id).filter(
-                Progress.user_id == user_id,
-                Progress.solved == True
-            ).subquery()
-            query = query.filter(~Problem.id.in_(solved_problem_ids))
-
-    # Get total count after all filters
-    total = query.count()
-
-    # Pagination
-    skip = (page - 1) * page_size
-    problems = query.order_by(Problem.id).offset(skip).limit(page_size).all()
-
-    # Build response with solved status — single batch query instead of N+1
-    problem_ids = [p.id for p in problems]
-    solved_set = set()
-    if problem_ids:
-        solved_rows = db.query(Progress.problem_id).filter(
-            Progress.user_id == user_id,
-            Progress.problem_id.in_(problem_ids),
-            Progress.solved == True,
-        ).all()
-        solved_set = {row[0] for row in solved_rows}
-
-    problem_list = []
-    for p in problems:
-        problem_list.append(
-            ProblemSchema(
-                id=p.id,
-                title=p.title,
-                description=p.description,
-                difficulty=p.difficulty,
-                category=p.category,
-                acceptance=p.acceptance,
-                likes=p.likes,
-                tags=p.tags,
-                starter_code=p.starter_code,
-                test_cases=p.test_cases,
-                hints=p.hints,
-                solved=p.id in solved_set,
-                leetcode_slug=p.leetcode_slug,
-            )
-        )
+    problem_list = [
+        ProblemSchema(**catalog.row(pid), solved=pid in solved_set) for pid in page_list
+    ]
 
     return ProblemListResponse(
         problems=problem_list,
         total=total,
         page=page,
         page_size=page_size,
+        next_cursor=_encode_cursor(last_id) if last_id is not None else None,
     )
 
 
@@ -130,8 +110,7 @@ def get_categories(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),  # SECURITY: require auth (VULN-14)
 ):
-    categories = db.query(Problem.category).distinct().all()
-    return [c[0] for c in categories if c[0]]
+    return problem_catalog.get(db).categories
 
 
 # ============================================================
@@ -142,59 +121,7 @@ def get_problem_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user_id = current_user.id
-    
-    total = db.query(Problem).count()
-    
-    # Get user's solved problems
-    solved_progress = db.query(Progress).filter(
-        Progress.user_id == user_id,
-        Progress.solved == True
-    ).all()
-    
-    total_solved = len(solved_progress)
-    
-    # Count by difficulty (case-insensitive)
-    easy_solved = 0
-    medium_solved = 0
-    hard_solved = 0
-    
-    solved_problem_ids = [p.problem_id for p in solved_progress]
-    if solved_problem_ids:
-        solved_problems = db.query(Problem).filter(
-            Problem.id.in_(solved_problem_ids)
-        ).all()
-        
-        for problem in solved_problems:
-            difficulty_lower = problem.difficulty.lower() if problem.difficulty else ""
-            if difficulty_lower == "easy":
-                easy_solved += 1
-            elif difficulty_lower == "medium":
-                medium_solved += 1
-            elif difficulty_lower == "hard":
-                hard_solved += 1
-    
-    # Get total count by difficulty (case-insensitive)
-    easy_total = db.query(Problem).filter(
-        func.lower(Problem.difficulty) == "easy"
-    ).count()
-    medium_total = db.query(Problem).filter(
-        func.lower(Problem.difficulty) == "medium"
-    ).count()
-    hard_total = db.query(Problem).filter(
-        func.lower(Problem.difficulty) == "hard"
-    ).count()
-
-    return {
-        "total_problems": total,
-        "total_solved": total_solved,
-        "easy_solved": easy_solved,
-        "easy_total": easy_total,
-        "medium_solved": medium_solved,
-        "medium_total": medium_total,
-        "hard_solved": hard_solved,
-        "hard_total": hard_total,
-    }
+    return problem_stats(db, current_user.id)
 
 
 # ============================================================
@@ -208,45 +135,29 @@ def get_random_problem(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user_id = current_user.id
-    
-    query = db.query(Problem)
-
-    # Difficulty filter (case-insensitive - capitalize to match DB)
-    if difficulty and difficulty != "all":
-        difficulty_value = difficulty.capitalize()
-        query = query.filter(Problem.difficulty == difficulty_value)
-    
-    if category and category != "all":
-        query = query.filter(Problem.category == category)
-    
-    # Filter for unsolved problems only
-    if unsolved_only:
-        solved_problem_ids = db.query(Progress.problem_id).filter(
-            Progress.user_id == user_id,
-            Progress.solved == True
-        ).subquery()
-        query = query.filter(~Problem.id.in_(solved_problem_ids))
-
-    problems = query.all()
-
-    if not problems:
+    catalog = problem_catalog.get(db)
+    filters = {
+        "difficulty": difficulty if difficulty and difficulty != "all" else None,
+        "category": category if category and category != "all" else None,
+    }
+    solved_set = solved_index.get(db, current_user.id)
+
+    # Uniform pick from the filter's precomputed id array, skipping solved ids
+    pick = random_id(
+        catalog.filter_ids(**filters),
+        solved_set if unsolved_only else None,
+        catalog.filter_bits(**filters),
+    )
+    if pick is None:
         raise HTTPException(status_code=404, detail="No problems found matching criteria")
 
-    problem = random.choice(problems)
-    
-    # Check if solved
-    progress = db.query(Progress).filter(
-        Progress.user_id == user_id,
-        Progress.problem_id == problem.id
-    ).first()
-    
+    problem = catalog.row(pick)
     return {
-        "id": problem.id,
-        "title": problem.title,
-        "difficulty": problem.difficulty,
-        "category": problem.category,
-        "solved": progress.solved if progress else False
+        "id": problem["id"],
+        "title": problem["title"],
+        "difficulty": problem["difficulty"],
+        "category": problem["category"],
+        "solved": problem["id"] in solved_set,
     }
 
 
@@ -259,19 +170,12 @@ def get_problem(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user_id = current_user.id
-    
     problem = db.query(Problem).filter(Problem.id == problem_id).first()
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
-    
+
     # Check if user has solved it
-    progress = db.query(Progress).filter(
-        Progress.user_id == user_id,
-        Progress.problem_id == problem_id
-    ).first()
-    
-    solved = progress.solved if progress else False
+    solved = problem_id in solved_index.get(db, current_user.id)
 
     return ProblemDetail(
         id=problem.id,
@@ -301,6 +205,7 @@ def create_problem(
 ):
     db_problem = Problem(**problem.dict())
     db.add(db_problem)
+    bump_version(db)
     db.commit()
     db.refresh(db_problem)
 
@@ -338,6 +243,7 @@ def update_problem(
     for field, value in problem_update.dict(exclude_unset=True).items():
         setattr(db_problem, field, value)
 
+    bump_version(db)
     db.commit()
     db.refresh(db_problem)
 
@@ -372,5 +278,6 @@ def delete_problem(
         raise HTTPException(status_code=404, detail="Problem not found")
 
     db.delete(db_problem)
+    bump_version(db)
     db.commit()
     return {"message": "Problem deleted successfully"}
\ No newline at end of file
@@ -1,13 +1,14 @@
 """Profile routes — user profile CRUD + avatar upload via Supabase Storage."""
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.auth.dependencies import get_current_user
+from app.db.session import get_async_db, get_db
+from app.auth.dependencies import get_current_user, get_current_user_async
 from app.models.user import User
-from app.models.problem import Problem
-from app.models.progress import Progress
 from app.services import supabase_storage
+from app.services.problem_catalog import problem_stats
 from pydantic import BaseModel
 from typing import Optional
 
@@ -96,11 +97,18 @@ EXTENSION_MAP = {
 }
 
 
+async def _save_avatar_url(adb: AsyncSession, user: User, url: Optional[str]) -> None:
+    """Write avatar_url on the async engine; `user` mirrors it for the response."""
+    await adb.execute(update(User).where(User.id == user.id).values(avatar_url=url))
+    await adb.commit()
+    user.avatar_url = url
+
+
 @router.post("/avatar")
 async def upload_avatar(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    adb: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ):
     """Upload a profile picture to Supabase Storage."""
     if not supabase_storage.is_configured():
@@ -130,9 +138,7 @@ async def upload_avatar(
         )
 
         # Update user record
-        current_user.avatar_url = public_url
-        db.commit()
-        db.refresh(current_user)
+        await _save_avatar_url(adb, current_user, public_url)
 
         return _user_dict(current_user)
 
@@ -144,16 +150,14 @@ async def upload_avatar(
 
 @router.delete("/avatar")
 async def delete_avatar(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    adb: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ):
     """Remove the user's profile picture."""
     if current_user.avatar_url:
         await supabase_storage.delete_avatar(current_user.avatar_url)
 
-    current_user.avatar_url = None
-    db.commit()
-    db.refresh(current_user)
+    await _save_avatar_url(adb, current_user, None)
 
     return _user_dict(current_user)
 
@@ -167,12 +171,9 @@ def get_profile_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    total_problems = db.query(Problem).count()
-
-    solved = db.query(Progress).filter(
-        Progress.user_id == current_user.id,
-        Progress.solved == True
-    ).count()
+    # Same cached engine as GET /api/problems/stats
+    stats = problem_stats(db, current_user.id)
+    total_problems, solved = stats["total_problems"], stats["total_solved"]
 
     percentage = (solved / total_problems * 100) if total_problems > 0 else 0
 
@@ -1,12 +1,15 @@
+from datetime import datetime, timezone
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.models.user import User
-from app.models.progress import UserProgress
+from app.models.progress import Progress, UserProgress
 from app.models.roadmap import Roadmap
 from app.models.problem import Problem
 from app.auth.dependencies import get_current_user, get_current_active_superuser
+from app.services.solved_index import clear_solved, mark_solved
 
 router = APIRouter()
 
@@ -157,6 +160,22 @@ def complete_problem(
         # Simple level calc: 1 level per 500 XP
         current_user.level = (current_user.xp // 500) + 1
 
+    # Practice completions count as solved in the problem list, stats and dashboard
+    record = (
+        db.query(Progress)
+        .filter(Progress.user_id == current_user.id, Progress.problem_id == problem_id)
+        .first()
+    )
+    newly_solved = record is None or not record.solved
+    if record is None:
+        db.add(Progress(user_id=current_user.id, problem_id=problem_id, solved=True, attempted=True))
+    elif not record.solved:
+        record.solved = True
+        record.attempted = True
+        record.last_attempt = datetime.now(timezone.utc)
+    if newly_solved:
+        mark_solved(db, current_user.id, [problem_id])
+
     db.commit()
     db.refresh(progress)
 
@@ -179,12 +198,18 @@ def reset_user_progress(
         .filter(UserProgress.user_id == user_id)
         .first()
     )
+    solved_rows = db.query(Progress).filter(Progress.user_id == user_id)
 
-    if not progress:
+    if not progress and solved_rows.first() is None:
         return {"message": "User has no progress to reset"}
 
-    progress.completed_roadmaps = []
-    progress.completed_problems = []
+    if progress:
+        progress.completed_roadmaps = []
+        progress.completed_problems = []
+
+    # Solved state behind the problem list, stats and dashboard
+    clear_solved(db, user_id)
+    solved_rows.delete(synchronize_session=False)
 
     db.commit()
     return {"message": "Progress reset successfully"}
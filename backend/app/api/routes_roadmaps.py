@@ -8,9 +8,10 @@ import re
 import asyncio
 
 from sqlalchemy.orm import Session
-from openai import AsyncOpenAI, OpenAIError
+from openai import OpenAIError
 
 from app.db.session import get_db
+from app.core.ai_client import complete
 from app.core.config import settings
 
 from app.auth.dependencies import get_current_user
@@ -29,9 +30,6 @@ CHEAP_MODEL = getattr(settings, "AI_CHEAP_MODEL", None) or (settings.OPENAI_MODE
 if not getattr(settings, "OPENAI_API_KEY", None):
     logger.warning("OPENAI_API_KEY not set in settings - roadmap endpoints will fail until configured.")
 
-# Create a single client instance (async)
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
-
 
 class RoadmapGenerateRequest(BaseModel):
     topic: str
@@ -115,6 +113,7 @@ def _extract_json_from_message(message) -> Dict[str, Any]:
     """
     Accept several shapes of message objects returned by various OpenAI SDK versions.
     Attempt to extract a JSON object robustly:
+      - If message is a plain str (ai_client.complete output) parse it directly
       - If message has attribute 'parsed' return that (common when response_format=json_object)
       - If message.content is str -> try to find JSON inside and parse
       - If message.content is list -> join textual parts and parse
@@ -214,30 +213,42 @@ def _extract_json_from_message(message) -> Dict[str, Any]:
 # ------------------------------------------------------
 # Helpers to call planner and week-expander models
 # ------------------------------------------------------
-async def _call_planner(prompt: str) -> Dict[str, Any]:
+def _roadmap_provider() -> str:
+    """Roadmaps need OpenAI JSON mode; AI_PROVIDER=stub swaps in the local stub."""
+    if settings.AI_PROVIDER.lower().strip() == "stub":
+        return "stub"
+    if not settings.OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="OpenAI client not configured (missing API key).")
+    return "openai"
+
+
+async def _call_planner(prompt: str, user_id: Optional[int] = None) -> Dict[str, Any]:
     """
     Call premium planner model (expects valid JSON in response).
+    The planner runs at low temperature, so identical requests are served
+    from the LLM response cache instead of regenerating a 7k-token skeleton.
     """
-    if client is None:
-        raise HTTPException(status_code=500, detail="OpenAI client not configured (missing API key).")
+    provider = _roadmap_provider()
 
     try:
-        resp = await client.chat.completions.create(
-            model=ROADMAP_PLANNER_MODEL,
-            # If the SDK supports response_format json_object, some SDKs will populate .parsed
-            # But many older/newer SDK variations differ; we'll parse ourselves for robustness.
-            response_format={"type": "json_object"},
-            messages=[
+        # response_format=json_object is requested via json_mode; many SDK
+        # variations differ in what they return, so we parse the text ourselves.
+        text = await complete(
+            [
                 {"role": "system", "content": "You are an expert curriculum architect. Return a single valid JSON object only."},
                 {"role": "user", "content": prompt},
             ],
+            provider=provider,
+            model=ROADMAP_PLANNER_MODEL if provider == "openai" else None,
             temperature=0.25,
             max_tokens=7000,
+            json_mode=True,
+            cache=True,
+            priority="background",
+            user_id=user_id,
         )
 
-        # resp.choices[0].message is the typical structure; handle unexpected shapes via helper
-        message = resp.choices[0].message
-        parsed = _extract_json_from_message(message)
+        parsed = _extract_json_from_message(text)
         if not isinstance(parsed, dict):
             raise HTTPException(status_code=502, detail="Planner model returned non-object JSON.")
         return parsed
@@ -252,27 +263,30 @@ async def _call_planner(prompt: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Planner model error: {e}")
 
 
-async def _call_week_expander(prompt: str) -> Dict[str, Any]:
+async def _call_week_expander(prompt: str, user_id: Optional[int] = None) -> Dict[str, Any]:
     """
     Call cheaper model to expand a single week into days + XP.
+    Runs in the scheduler's background class: a roadmap fans out one call per
+    week, and those must not crowd out interactive chat.
     """
-    if client is None:
-        raise HTTPException(status_code=500, detail="OpenAI client not configured (missing API key).")
+    provider = _roadmap_provider()
 
     try:
-        resp = await client.chat.completions.create(
-            model=CHEAP_MODEL,
-            response_format={"type": "json_object"},
-            messages=[
+        text = await complete(
+            [
                 {"role": "system", "content": "Expand the supplied week into JSON containing days, per-day items and xp. Return valid JSON only."},
                 {"role": "user", "content": prompt},
             ],
+            provider=provider,
+            model=CHEAP_MODEL if provider == "openai" else None,
             temperature=0.35,
             max_tokens=4000,
+            json_mode=True,
+            priority="background",
+            user_id=user_id,
         )
 
-        message = resp.choices[0].message
-        parsed = _extract_json_from_message(message)
+        parsed = _extract_json_from_message(text)
         if not isinstance(parsed, dict):
             raise HTTPException(status_code=502, detail="Week expander returned non-object JSON.")
         return parsed
@@ -362,7 +376,7 @@ Example minimal structure:
 Do not include any 'days' arrays in the planner output.
 """
     # 1) Planner skeleton
-    skeleton = await _call_planner(planner_prompt)
+    skeleton = await _call_planner(planner_prompt, user_id=current_user.id)
 
     # Ensure required skeleton fields & defaults
     skeleton.setdefault("id", f"{topic.lower().replace(' ', '-')}-{duration_weeks}w")
@@ -422,7 +436,7 @@ Rules:
 - Return valid JSON only.
 """
         try:
-            expanded = await _call_week_expander(week_prompt)
+            expanded = await _call_week_expander(week_prompt, user_id=current_user.id)
         except Exception as e:
             logger.error("Failed to expand week %s: %s", week_number, e)
             expanded = {}
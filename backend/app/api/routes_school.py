@@ -2,17 +2,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional, AsyncIterator
+from typing import Optional, AsyncIterator, Callable
 import json
 import asyncio
 import logging
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from app.auth.dependencies import get_current_user
 from app.core.ai_client import stream_ai
-from app.db.session import get_db
+from app.core import sse
+from app.db.session import get_async_db, get_async_sessionmaker, get_db
 from app.services import tutor_service
 from app.core.rate_limit import limiter
 from app.db.models_tutor import Conversation, TutorMessage
@@ -40,7 +42,8 @@ Keep your responses very concise (1-3 short paragraphs max)."""
 async def school_chat_stream(
     request: Request,
     req: ChatPayload,
-    db: Session = Depends(get_db),
+    adb: AsyncSession = Depends(get_async_db),
+    new_session: Callable[[], AsyncSession] = Depends(get_async_sessionmaker),
 ):
     """
     Real-time streaming chat endpoint using Server-Sent Events (SSE).
@@ -48,67 +51,37 @@ async def school_chat_stream(
     NOTE: Open access for pilot batch users.
     """
     try:
-        conv_id = req.conversation_id
-        if conv_id is None:
-            # Create anon conversation for pilot
-            conv = tutor_service.create_conversation(db, user_id=None, topic="school_module_1")
-            conv_id = conv.id
-
-        # Save user message immediately
-        tutor_service.add_message(db, conv_id, "user", req.message)
-
-        # Build contextual messages with custom system prompt
-        messages = tutor_service.build_contextual_messages(
-            db, 
-            conv_id, 
+        # Anon conversation for the pilot; custom system prompt in the context
+        conv_id, messages = await tutor_service.prepare_turn(
+            adb,
+            req.conversation_id,
+            None,
             req.message,
-            extra_system=SCHOOL_SYSTEM_PROMPT
+            topic="school_module_1",
+            extra_system=SCHOOL_SYSTEM_PROMPT,
         )
 
     except Exception as e:
         logger.exception("school_chat_stream setup error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        # Don't pin a pooled connection for the length of the stream
+        await tutor_service.release_connection_async(adb)
 
-    async def event_generator() -> AsyncIterator[str]:
-        # Send conversation ID first so frontend can track it
-        yield f"data: {json.dumps({'type': 'conv', 'conversation_id': conv_id})}\n\n"
-
-        full_text_parts = []
-        try:
-            # Note: We use Haiku (via stream_ai defaults usually) or just the default model
-            async for evt in stream_ai(messages=messages, temperature=0.6, max_tokens=1024):
-                if await request.is_disconnected():
-                    break
-
-                if evt.get("type") == "delta":
-                    text = evt.get("text", "")
-                    full_text_parts.append(text)
-                    yield f"data: {json.dumps({'type': 'delta', 'text': text})}\n\n"
-
-                elif evt.get("type") == "done":
-                    full_text = "".join(full_text_parts).strip()
-                    # Save complete assistant response to DB
-                    if full_text:
-                        tutor_service.add_message(db, conv_id, "assistant", full_text)
-                    yield f"data: {json.dumps({'type': 'done', 'full_text': full_text})}\n\n"
-
-        except asyncio.CancelledError:
-            logger.info("SSE client disconnected for conv_id=%s", conv_id)
-            partial = "".join(full_text_parts).strip()
-            if partial:
-                tutor_service.add_message(db, conv_id, "assistant", partial)
-        except Exception as e:
-            logger.exception("stream_ai error: %s", e)
-            yield f"data: {json.dumps({'type': 'error', 'message': 'AI streaming error'})}\n\n"
+    client_key = f"ip:{request.client.host}" if request.client else None
 
+    # Open access — queue fairly per client address instead of per user
     return StreamingResponse(
-        event_generator(),
+        sse.reply_stream(
+            request,
+            stream_ai(messages=messages, temperature=0.6, max_tokens=1024, user_id=client_key),
+            conv_id=conv_id,
+            # The request's `adb` is closed by now; save in a session of its own
+            on_finish=lambda text: tutor_service.save_streamed_reply_async(new_session(), conv_id, text),
+            label="school chat",
+        ),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-        },
+        headers=sse.SSE_HEADERS,
     )
 
 
@@ -2,20 +2,24 @@ from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.core.config import settings
 from app.models.user import User
 from app.auth.schemas import TokenPayload
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _user_id_from_token(token: str) -> int:
+    credentials_exception = _credentials_exception()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
@@ -27,10 +31,30 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         token_data = TokenPayload(**payload)
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    return int(user_id)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    user_id = _user_id_from_token(token)
+    user = db.query(User).filter(User.id == user_id).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme), adb: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    get_current_user for `async def` routes: the lookup runs on the request's
+    AsyncSession, and its connection goes back to the pool before the handler
+    runs (which may stream for minutes). The returned User is detached.
+    """
+    user_id = _user_id_from_token(token)
+    try:
+        user = await adb.get(User, user_id)
+    finally:
+        await adb.close()
+    if user is None:
+        raise _credentials_exception()
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -2,39 +2,187 @@
 """
 Unified AI client with support for both blocking and streaming responses.
 
-Streaming is implemented natively for Gemini (generate_content with stream=True).
-The model instance is cached at module level to avoid re-initialization overhead.
+Gemini and OpenAI calls (blocking and streaming) use the SDKs' native async
+APIs, so no request ever blocks the event loop.
+Provider clients and model handles are owned by app.core.ai_registry, so every
+call reuses the same pooled connections instead of re-initializing them.
+
+Every non-streaming call funnels through `complete()`, which consults the
+content-addressed response cache (app.core.llm_cache) before routing.
+Provider choice, failover and hedging are delegated to app.core.ai_router;
+every upstream call then waits for a slot from app.core.ai_scheduler, which
+bounds concurrency and serves interactive chat ahead of batch generation.
+Each attempt is timed and token-counted by app.core.ai_metrics; the router's
+breakers and latency stats see only the provider request itself.
 """
 
 from typing import AsyncGenerator, Dict, Any
+import json
 import logging
 
+from app.core import ai_registry, ai_stub
+from app.core.ai_metrics import ai_metrics, note_usage
+from app.core.ai_router import KNOWN_PROVIDERS, ai_router
+from app.core.ai_scheduler import ai_scheduler
 from app.core.config import settings
+from app.core.llm_cache import llm_cache, make_key, should_cache
 
 logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT = settings.AI_SYSTEM_PROMPT
 
+# Providers whose completion endpoint can be forced to emit a JSON object
+JSON_MODE_PROVIDERS = ("openai", "stub")
+
 # ============================================================
-#  Cached Gemini model — initialized ONCE, reused on every call
+#  Model tiers — which model each provider uses for a use-case
 # ============================================================
-_gemini_model = None
+MODEL_TIERS: Dict[str, Dict[str, str]] = {
+    "chat": {
+        "openai": settings.OPENAI_MODEL,
+        "gemini": settings.GEMINI_MODEL,
+        "stub": ai_stub.STUB_MODEL,
+    },
+    "interview": {
+        "openai": settings.INTERVIEW_OPENAI_MODEL,
+        "gemini": settings.INTERVIEW_GEMINI_MODEL,
+        "stub": ai_stub.STUB_MODEL,
+    },
+    "mock_interview": {
+        "openai": settings.MOCK_INTERVIEW_OPENAI_MODEL,
+        "gemini": settings.MOCK_INTERVIEW_GEMINI_MODEL,
+        "stub": ai_stub.STUB_MODEL,
+    },
+}
+
+
+def _current_provider() -> str:
+    return (settings.AI_PROVIDER or "").lower().strip()
+
+
+def _has_api_key(provider: str) -> bool:
+    if provider == "openai":
+        return bool(settings.OPENAI_API_KEY)
+    if provider == "gemini":
+        return bool(settings.GEMINI_API_KEY)
+    return provider == "stub"   # local, needs no key
 
 
-def _get_gemini_model():
-    """Return a cached GenerativeModel instance (lazy-init on first call)."""
-    global _gemini_model
-    if _gemini_model is None:
-        import google.generativeai as genai
+def _any_provider_configured() -> bool:
+    """True if the primary or any failover provider has an API key."""
+    return any(_has_api_key(p) for p in ai_router.order())
 
-        if not settings.GEMINI_API_KEY:
-            raise RuntimeError("GEMINI_API_KEY missing.")
 
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        _gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        logger.info("Gemini model '%s' initialized (cached)", settings.GEMINI_MODEL)
+# ============================================================
+#  Gemini model handles come from the process-wide registry
+# ============================================================
 
-    return _gemini_model
+def _get_gemini_model(model_name: str | None = None):
+    """Return the cached GenerativeModel for `model_name` (default: GEMINI_MODEL)."""
+    return ai_registry.get_gemini_model(model_name or settings.GEMINI_MODEL)
+
+
+# ============================================================
+#          CORE COMPLETION — cache + provider dispatch
+# ============================================================
+
+async def complete(
+    messages: list,
+    *,
+    tier: str = "chat",
+    provider: str | None = None,
+    model: str | None = None,
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+    json_mode: bool = False,
+    cache: bool | None = None,
+    hedge: bool | None = None,
+    priority: str = "interactive",
+    user_id: Any = None,
+) -> str:
+    """
+    Run one non-streaming completion and return the raw text.
+
+    provider=None routes through ai_router (AI_PROVIDER first, failover to the
+    other configured provider, optional hedging); an explicit provider pins
+    the call, e.g. when `model` only exists on that provider.
+    cache=None caches only low-temperature calls; True/False force it. Any
+    candidate provider's cached answer is served without routing, so cache
+    hits never queue and never count as provider calls.
+    priority/user_id place the call in ai_scheduler's queue ("interactive",
+    "interview" or "background").
+    Raises on provider errors — the public ask_* helpers turn those into
+    user-facing fallback strings.
+    """
+    pinned = [provider.lower()] if provider else None
+    use_cache = should_cache(temperature, cache)
+    if use_cache:
+        for p in pinned or ai_router.order():
+            if p not in KNOWN_PROVIDERS:
+                continue
+            cached = await _cached(p, model or MODEL_TIERS[tier][p], messages, temperature, max_tokens, json_mode)
+            if cached is not None:
+                return cached
+
+    async def _run(p: str) -> str:
+        return await _complete_on(
+            p, model or MODEL_TIERS[tier][p], messages,
+            temperature, max_tokens, json_mode, use_cache,
+            priority=priority, user_id=user_id,
+        )
+
+    return await ai_router.call(_run, providers=pinned, hedge=hedge)
+
+
+async def _cached(
+    provider: str, model: str, messages: list, temperature: float, max_tokens: int, json_mode: bool
+) -> str | None:
+    key = make_key(provider, model, messages, temperature, max_tokens, json_mode)
+    cached = await llm_cache.get(key)
+    if cached is not None:
+        with ai_metrics.track(provider, model, messages) as sample:
+            sample.cache_hit = True
+    return cached
+
+
+async def _complete_on(
+    provider: str,
+    model: str,
+    messages: list,
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool,
+    use_cache: bool,
+    *,
+    priority: str = "interactive",
+    user_id: Any = None,
+) -> str:
+    """
+    complete() against one specific provider (the cache was already checked).
+    Only the provider request is reported to ai_router: queueing for a
+    scheduler slot is not the provider's latency.
+    """
+    if provider not in KNOWN_PROVIDERS:
+        raise ValueError(f"Unknown AI provider: {provider!r}. Expected one of {KNOWN_PROVIDERS}.")
+
+    with ai_metrics.track(provider, model, messages) as sample:
+        async with ai_scheduler.slot(provider, priority, user_id):
+            sample.begin()   # queue wait is reported by ai_scheduler, not here
+            with ai_router.upstream(provider):
+                if provider == "openai":
+                    text = await _openai_complete(model, messages, temperature, max_tokens, json_mode)
+                elif provider == "stub":
+                    text = await ai_stub.complete(messages, max_tokens, json_mode)
+                else:
+                    text = await _gemini_generate(
+                        _messages_to_prompt(messages), model, temperature, max_tokens
+                    )
+        sample.add_text(text)
+
+    if use_cache and text:
+        key = make_key(provider, model, messages, temperature, max_tokens, json_mode)
+        await llm_cache.set(key, text, provider=provider, model=model)
+    return text
 
 
 # ============================================================
@@ -46,11 +194,16 @@ async def ask_ai(
     temperature: float = 0.7,
     max_tokens: int = 1024,
     json_mode: bool = False,
+    cache: bool | None = None,
+    priority: str = "interactive",
+    user_id: Any = None,
 ) -> Any:
     """
     Unified interface for chat + structured output (non-streaming).
 
-    json_mode=True → forces STRICT JSON output (OpenAI only).
+    json_mode=True → forces STRICT JSON output (OpenAI and the local stub).
+    cache → per-call override of the response cache (see complete()).
+    priority/user_id → scheduling class and fairness key (see complete()).
     Returns:
         - dict when json_mode=True
         - str when json_mode=False
@@ -58,101 +211,160 @@ async def ask_ai(
     if not prompt or not prompt.strip():
         return "Please provide a valid question."
 
-    provider = (settings.AI_PROVIDER or "").lower().strip()
+    provider = _current_provider()
 
-    if provider == "openai":
-        return await _ask_openai(prompt, temperature, max_tokens, json_mode)
-    elif provider == "gemini":
-        return await _ask_gemini(prompt, temperature, max_tokens)
-    else:
-        msg = f"Unknown AI provider: {provider!r}. Expected 'openai' or 'gemini'."
+    if provider not in KNOWN_PROVIDERS:
+        msg = f"Unknown AI provider: {provider!r}. Expected one of {KNOWN_PROVIDERS}."
         logger.error(msg)
         return msg
 
-
-# ============================================================
-#                     OPENAI IMPLEMENTATION
-# ============================================================
-
-async def _ask_openai(
-    prompt: str,
-    temperature: float,
-    max_tokens: int,
-    json_mode: bool
-) -> Any:
-    from openai import AsyncOpenAI
-
-    if not settings.OPENAI_API_KEY:
-        logger.error("OPENAI_API_KEY missing.")
+    if not _any_provider_configured():
+        logger.error("%s API key missing.", provider)
         return "AI is not configured correctly (no API key)."
 
-    try:
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
 
-        kwargs = {
-            "model": settings.OPENAI_MODEL,
-            "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt},
-            ],
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
+    # JSON mode is a per-provider capability: pin the call to the provider
+    # that has it (the order never holds both openai and the stub), so a
+    # failover or hedge can't answer in free text
+    json_provider = next((p for p in ai_router.order() if p in JSON_MODE_PROVIDERS), None) if json_mode else None
+    strict_json = json_provider is not None
+    if strict_json:
+        provider = json_provider
 
-        if json_mode:
-            kwargs["response_format"] = {"type": "json_object"}
+    try:
+        text = await complete(
+            messages,
+            provider=json_provider,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            json_mode=strict_json,
+            cache=cache,
+            priority=priority,
+            user_id=user_id,
+        )
+        if strict_json:
+            return json.loads(text)
+    except Exception as e:
+        logger.exception("%s error: %s", provider, e)
+        if strict_json:
+            return {"error": f"{provider}_error", "message": str(e)}
+        if provider == "gemini":
+            return "AI unavailable (Gemini error)."
+        return "AI error. Try again later."
 
-        resp = await client.chat.completions.create(**kwargs)
+    return text or "Gemini returned no usable response."
 
-        if json_mode:
-            return resp.choices[0].message.parsed
 
-        content = resp.choices[0].message.content
-        return content.strip() if isinstance(content, str) else str(content)
+# ============================================================
+#                     OPENAI IMPLEMENTATION
+# ============================================================
 
-    except Exception as e:
-        logger.exception("OpenAI error: %s", e)
-        return (
-            {"error": "openai_error", "message": str(e)}
-            if json_mode
-            else "AI error. Try again later."
-        )
+async def _openai_complete(
+    model: str,
+    messages: list,
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool,
+) -> str:
+    """Single non-streaming OpenAI call. Raises on provider errors."""
+    client = ai_registry.get_openai_client()
+
+    kwargs = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if json_mode:
+        kwargs["response_format"] = {"type": "json_object"}
+
+    resp = await client.chat.completions.create(**kwargs)
+    usage = getattr(resp, "usage", None)
+    if usage is not None:
+        note_usage(usage.prompt_tokens, usage.completion_tokens)
+    content = resp.choices[0].message.content
+    return content.strip() if isinstance(content, str) else str(content)
 
 
 # ============================================================
 #                    GEMINI IMPLEMENTATION
 # ============================================================
-
-async def _ask_gemini(prompt: str, temperature: float, max_tokens: int) -> str:
+#  All Gemini calls go through generate_content_async, which runs on the
+#  SDK's grpc.aio transport — nothing here blocks the event loop, and
+#  streamed chunks are awaited directly instead of one thread hop each.
+
+def _messages_to_prompt(messages: list) -> str:
+    """Flatten a chat `messages` list into Gemini's single-prompt format."""
+    parts = []
+    for msg in messages:
+        role = msg.get("role", "user")
+        content = msg.get("content", "")
+        if role == "system":
+            parts.append(f"{content}\n")
+        elif role == "user":
+            parts.append(f"User: {content}")
+        elif role == "assistant":
+            parts.append(f"Assistant: {content}")
+    parts.append("Assistant:")
+    return "\n".join(parts)
+
+
+def _gemini_config(temperature: float, max_tokens: int):
     import google.generativeai as genai
 
-    try:
-        model = _get_gemini_model()
-        full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {prompt}\nAssistant:"
-
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-            ),
-        )
+    return genai.types.GenerationConfig(
+        temperature=temperature,
+        max_output_tokens=max_tokens,
+    )
 
-        if hasattr(response, "text") and response.text:
-            return response.text.strip()
 
-        candidates = getattr(response, "candidates", None)
-        if candidates:
-            parts = getattr(candidates[0].content, "parts", [])
-            text_pieces = [p.text for p in parts if hasattr(p, "text")]
-            if text_pieces:
-                return "".join(text_pieces).strip()
+def _gemini_text(response) -> str:
+    """
+    Extract text from a Gemini response or stream chunk.
+    `.text` raises ValueError when a chunk carries no text parts (e.g. a
+    finish/safety chunk), so fall back to walking the candidate parts.
+    """
+    try:
+        text = response.text
+        if text:
+            return text
+    except Exception:
+        pass
 
-        return "Gemini returned no usable response."
+    candidates = getattr(response, "candidates", None)
+    if candidates:
+        parts = getattr(candidates[0].content, "parts", [])
+        return "".join(p.text for p in parts if getattr(p, "text", None))
+    return ""
 
-    except Exception as e:
-        logger.exception("Gemini error: %s", e)
-        return "AI unavailable (Gemini error)."
+
+async def _gemini_generate(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """Single non-streaming Gemini call. Raises on provider errors."""
+    model = _get_gemini_model(model_name)
+    response = await model.generate_content_async(
+        prompt,
+        generation_config=_gemini_config(temperature, max_tokens),
+    )
+    _note_gemini_usage(response)
+    return _gemini_text(response).strip()
+
+
+def _note_gemini_usage(response) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        note_usage(
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None),
+        )
 
 
 # ============================================================
@@ -164,184 +376,220 @@ async def stream_ai(
     model: str | None = None,
     temperature: float = 0.7,
     max_tokens: int = 1024,
+    priority: str = "interactive",
+    user_id: Any = None,
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
-    Stream AI response token-by-token using Gemini's native streaming.
+    Stream AI response token-by-token.
 
     Yields dicts: { "type": "delta", "text": "..." } for each chunk,
     then { "type": "done" } at the end.
+
+    If a provider fails before its first token, the stream fails over to the
+    next configured provider; once tokens have been sent it cannot, so a
+    mid-stream failure ends with an error delta.
+
+    The scheduler slot is held until the first token (or, with
+    AI_STREAM_HOLD_SLOT, until the stream finishes or the consumer stops
+    iterating). Closing or cancelling the generator closes the provider
+    stream straight away, so abandoned answers stop generating upstream.
     """
-    provider = (settings.AI_PROVIDER or "").lower().strip()
+    order = ai_router.order()
+    for provider in order:
+        if not ai_router.breakers[provider].allow():
+            continue
+
+        started = settled = False
+        try:
+            provider_model = model if (model and provider == order[0]) else None
+            async with ai_scheduler.slot(provider, priority, user_id) as held:
+                with ai_metrics.track(
+                    provider,
+                    provider_model or MODEL_TIERS["chat"][provider],
+                    messages,
+                    mode="stream",
+                    max_tokens=max_tokens,
+                ) as sample:
+                    async for text in _provider_stream(provider, provider_model, messages, temperature, max_tokens):
+                        if not started and not settings.AI_STREAM_HOLD_SLOT:
+                            held.release()   # see AI_STREAM_HOLD_SLOT
+                        started = True
+                        sample.add_text(text)
+                        yield {"type": "delta", "text": text}
+            ai_router.record(provider, None, ok=True)
+            settled = True
+            yield {"type": "done"}
+            return
+
+        except Exception as e:
+            ai_router.record(provider, None, ok=False)
+            settled = True
+            logger.exception("%s streaming error: %s", provider, e)
+            if started:
+                break
+        finally:
+            if not settled:
+                # Closed by the consumer or cancelled: neither outcome, but a
+                # half-open probe must not stay claimed forever
+                ai_router.breakers[provider].release()
+
+    yield {"type": "delta", "text": "AI streaming error. Try again."}
+    yield {"type": "done"}
+
 
+async def _provider_stream(
+    provider: str,
+    model: str | None,
+    messages: list,
+    temperature: float,
+    max_tokens: int,
+) -> AsyncGenerator[str, None]:
+    """Yield raw text chunks from one provider. Raises on provider errors."""
     if provider == "gemini":
-        async for evt in _stream_gemini(messages, temperature, max_tokens):
-            yield evt
+        async for text in _stream_gemini(messages, model, temperature, max_tokens):
+            yield text
+    elif provider == "openai":
+        async for text in _stream_openai(messages, model, temperature, max_tokens):
+            yield text
+    elif provider == "stub":
+        async for text in ai_stub.stream(messages, max_tokens):
+            yield text
     else:
-        # Fallback: non-streaming (OpenAI or unknown provider)
-        last_message = messages[-1]["content"] if messages else ""
-        response = await ask_ai(last_message, temperature, max_tokens)
-        yield {"type": "delta", "text": response}
-        yield {"type": "done"}
+        raise ValueError(f"Unknown AI provider: {provider!r}. Expected one of {KNOWN_PROVIDERS}.")
+
+
+async def _stream_openai(
+    messages: list,
+    model: str | None,
+    temperature: float,
+    max_tokens: int,
+) -> AsyncGenerator[str, None]:
+    """
+    True OpenAI streaming over the full multi-turn history (stream=True).
+    SYSTEM_PROMPT is only added when the caller did not supply a system turn.
+    """
+    if not any(m.get("role") == "system" for m in messages):
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}, *messages]
+
+    client = ai_registry.get_openai_client()
+    stream = await client.chat.completions.create(
+        model=model or settings.OPENAI_MODEL,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    try:
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                note_usage(usage.prompt_tokens, usage.completion_tokens)
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+    finally:
+        # Drops the HTTP response mid-body if we stopped early, which ends generation upstream
+        await stream.close()
 
 
 async def _stream_gemini(
     messages: list,
+    model: str | None,
     temperature: float,
     max_tokens: int,
-) -> AsyncGenerator[Dict[str, Any], None]:
+) -> AsyncGenerator[str, None]:
     """
-    True Gemini streaming using generate_content(stream=True).
+    True Gemini streaming using generate_content_async(stream=True).
     Each chunk yields as soon as Gemini produces it.
     """
-    import asyncio
-    import google.generativeai as genai
+    gemini_model = _get_gemini_model(model)
+    response = await gemini_model.generate_content_async(
+        _messages_to_prompt(messages),
+        generation_config=_gemini_config(temperature, max_tokens),
+        stream=True,
+    )
 
     try:
-        model = _get_gemini_model()
-
-        # Build prompt from conversation messages
-        parts = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role == "system":
-                parts.append(f"{content}\n")
-            elif role == "user":
-                parts.append(f"User: {content}\n")
-            elif role == "assistant":
-                parts.append(f"Assistant: {content}\n")
-        parts.append("Assistant:")
-        full_prompt = "\n".join(parts)
-
-        # Gemini's generate_content with stream=True is synchronous,
-        # so we run it in a thread to avoid blocking the event loop.
-        response = await asyncio.to_thread(
-            model.generate_content,
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-            ),
-            stream=True,
-        )
-
-        # Iterate chunks without blocking the event loop.
-        # Each next() call is offloaded to a thread so asyncio can flush
-        # SSE events to the client immediately between chunks.
-        _sentinel = object()
-        while True:
-            chunk = await asyncio.to_thread(
-                lambda it=response: next(it, _sentinel)
-            )
-            if chunk is _sentinel:
-                break
-            text = getattr(chunk, "text", None)
+        async for chunk in response:
+            _note_gemini_usage(chunk)   # cumulative; the last chunk wins
+            text = _gemini_text(chunk)
             if text:
-                yield {"type": "delta", "text": text}
+                yield text
+    finally:
+        _cancel_gemini_stream(response)
 
-        yield {"type": "done"}
 
-    except Exception as e:
-        logger.exception("Gemini streaming error: %s", e)
-        yield {"type": "delta", "text": "AI streaming error. Try again."}
-        yield {"type": "done"}
+def _cancel_gemini_stream(response) -> None:
+    """Cancel the underlying gRPC call of an unfinished Gemini stream (no-op once done)."""
+    call = getattr(response, "_iterator", None)
+    cancel = getattr(call, "cancel", None)
+    if callable(cancel):
+        try:
+            cancel()
+        except Exception as e:
+            logger.debug("Gemini stream cancel failed: %s", e)
 
 
 # ============================================================
 #  INTERVIEW AI — uses a higher model for premium quality
 # ============================================================
 
-async def ask_ai_interview(
-    messages: list,
-    temperature: float = 0.7,
-    max_tokens: int = 800,
-) -> str:
-    """
-    Multi-turn AI call optimised for interview coaching.
-    Uses a higher-capability model than the general ask_ai helper.
-
-    messages: list of {"role": "system"|"user"|"assistant", "content": str}
-    Returns: str response
-    """
-    provider = (settings.AI_PROVIDER or "").lower().strip()
-
-    if provider == "openai":
-        return await _ask_openai_interview(messages, temperature, max_tokens)
-    elif provider == "gemini":
-        return await _ask_gemini_interview(messages, temperature, max_tokens)
-    else:
-        return "AI is not configured."
-
-
-async def _ask_openai_interview(
+async def _ask_tier(
+    tier: str,
     messages: list,
     temperature: float,
     max_tokens: int,
+    cache: bool | None,
+    user_id: Any,
 ) -> str:
-    from openai import AsyncOpenAI
+    """Shared body of the interview helpers: multi-turn call on a model tier."""
+    provider = _current_provider()
 
-    if not settings.OPENAI_API_KEY:
-        logger.error("OPENAI_API_KEY missing.")
+    if provider not in KNOWN_PROVIDERS:
+        return "AI is not configured."
+
+    if not _any_provider_configured():
+        logger.error("%s API key missing.", provider)
         return "AI is not configured correctly (no API key)."
 
     try:
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        resp = await client.chat.completions.create(
-            model=settings.INTERVIEW_OPENAI_MODEL,
-            messages=messages,
+        text = await complete(
+            messages,
+            tier=tier,
             temperature=temperature,
             max_tokens=max_tokens,
+            cache=cache,
+            priority="interview",
+            user_id=user_id,
         )
-        content = resp.choices[0].message.content
-        return content.strip() if isinstance(content, str) else str(content)
     except Exception as e:
-        logger.exception("OpenAI interview error: %s", e)
-        return "AI error. Please try again."
+        logger.exception("%s %s error: %s", provider, tier, e)
+        if provider == "openai":
+            return "AI error. Please try again."
+        return "AI unavailable. Please try again."
+
+    return text or "Gemini returned no usable response."
 
 
-async def _ask_gemini_interview(
+async def ask_ai_interview(
     messages: list,
-    temperature: float,
-    max_tokens: int,
+    temperature: float = 0.7,
+    max_tokens: int = 800,
+    cache: bool | None = None,
+    user_id: Any = None,
 ) -> str:
-    import google.generativeai as genai
-
-    if not settings.GEMINI_API_KEY:
-        return "AI is not configured correctly (no API key)."
-
-    try:
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        model = genai.GenerativeModel(settings.INTERVIEW_GEMINI_MODEL)
-
-        # Build a flat prompt from the messages list
-        parts = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role == "system":
-                parts.append(f"{content}\n")
-            elif role == "user":
-                parts.append(f"User: {content}")
-            elif role == "assistant":
-                parts.append(f"Assistant: {content}")
-        parts.append("Assistant:")
-        full_prompt = "\n".join(parts)
-
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-            ),
-        )
-
-        if hasattr(response, "text") and response.text:
-            return response.text.strip()
-        return "Gemini returned no usable response."
+    """
+    Multi-turn AI call optimised for interview coaching.
+    Uses a higher-capability model than the general ask_ai helper.
 
-    except Exception as e:
-        logger.exception("Gemini interview error: %s", e)
-        return "AI unavailable. Please try again."
+    messages: list of {"role": "system"|"user"|"assistant", "content": str}
+    Returns: str response
+    """
+    return await _ask_tier("interview", messages, temperature, max_tokens, cache, user_id)
 
 
 # ============================================================
@@ -352,6 +600,8 @@ async def ask_ai_mock_interview(
     messages: list,
     temperature: float = 0.7,
     max_tokens: int = 800,
+    cache: bool | None = None,
+    user_id: Any = None,
 ) -> str:
     """
     Multi-turn AI call exclusively for the Mock Interview tab.
@@ -360,81 +610,4 @@ async def ask_ai_mock_interview(
     messages: list of {"role": "system"|"user"|"assistant", "content": str}
     Returns: str response
     """
-    provider = (settings.AI_PROVIDER or "").lower().strip()
-
-    if provider == "openai":
-        return await _ask_openai_mock_interview(messages, temperature, max_tokens)
-    elif provider == "gemini":
-        return await _ask_gemini_mock_interview(messages, temperature, max_tokens)
-    else:
-        return "AI is not configured."
-
-
-async def _ask_openai_mock_interview(
-    messages: list,
-    temperature: float,
-    max_tokens: int,
-) -> str:
-    from openai import AsyncOpenAI
-
-    if not settings.OPENAI_API_KEY:
-        logger.error("OPENAI_API_KEY missing.")
-        return "AI is not configured correctly (no API key)."
-
-    try:
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        resp = await client.chat.completions.create(
-            model=settings.MOCK_INTERVIEW_OPENAI_MODEL,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        content = resp.choices[0].message.content
-        return content.strip() if isinstance(content, str) else str(content)
-    except Exception as e:
-        logger.exception("OpenAI mock interview (gpt-5) error: %s", e)
-        return "AI error. Please try again."
-
-
-async def _ask_gemini_mock_interview(
-    messages: list,
-    temperature: float,
-    max_tokens: int,
-) -> str:
-    import google.generativeai as genai
-
-    if not settings.GEMINI_API_KEY:
-        return "AI is not configured correctly (no API key)."
-
-    try:
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        model = genai.GenerativeModel(settings.MOCK_INTERVIEW_GEMINI_MODEL)
-
-        parts = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role == "system":
-                parts.append(f"{content}\n")
-            elif role == "user":
-                parts.append(f"User: {content}")
-            elif role == "assistant":
-                parts.append(f"Assistant: {content}")
-        parts.append("Assistant:")
-        full_prompt = "\n".join(parts)
-
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-            ),
-        )
-
-        if hasattr(response, "text") and response.text:
-            return response.text.strip()
-        return "Gemini returned no usable response."
-
-    except Exception as e:
-        logger.exception("Gemini mock interview error: %s", e)
-        return "AI unavailable. Please try again."
+    return await _ask_tier("mock_interview", messages, temperature, max_tokens, cache, user_id)
@@ -0,0 +1,379 @@
+# backend/app/core/ai_metrics.py
+"""
+In-process telemetry for LLM calls.
+
+ai_client records one sample per provider attempt (and per cache hit) with:
+provider, model, calling endpoint, prompt chars/tokens, completion tokens,
+time-to-first-token, total latency, tokens/sec, cache hit and error class.
+Streams the client abandoned are counted separately, with an estimate of the
+completion tokens not paid for (max_tokens minus tokens already generated).
+
+Samples are folded into fixed-bucket histograms per
+(endpoint, provider, model, mode) series, so memory stays constant no matter
+how much traffic the worker sees. Token counts come from the provider's usage
+report when there is one, otherwise from a chars/4 estimate.
+
+The calling endpoint is resolved from the ASGI scope bound by
+AIEndpointMiddleware (app/main.py); work outside a request can label itself
+with `endpoint_label("...")`.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens (input, output). Override or extend with AI_MODEL_PRICES,
+# e.g. '{"gpt-4o": [2.5, 10]}'. Unknown models report cost as null.
+DEFAULT_MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+RATE_BUCKETS_TPS = (5, 10, 20, 40, 80, 160, 320)
+TOKEN_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+
+
+def estimate_tokens(chars: int) -> int:
+    """Rough token count for text we have no usage report for (~4 chars/token)."""
+    return (chars + 3) // 4
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_MODEL_PRICES)
+    if settings.AI_MODEL_PRICES:
+        try:
+            prices.update({k: (float(v[0]), float(v[1])) for k, v in json.loads(settings.AI_MODEL_PRICES).items()})
+        except Exception as e:
+            logger.warning("Ignoring malformed AI_MODEL_PRICES: %s", e)
+    return prices
+
+
+# ============================================================
+#                        HISTOGRAM
+# ============================================================
+
+class Histogram:
+    """Fixed-bucket counts plus a running sum; percentiles report the bucket's upper bound."""
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last bucket = +Inf
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.total:
+            return None
+        rank = p * self.total
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return float(self.bounds[i]) if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def summary(self) -> Dict[str, Any]:
+        def _finite(v):
+            return None if v is None or v == float("inf") else v
+
+        return {
+            "count": self.total,
+            "mean": round(self.sum / self.total, 1) if self.total else None,
+            "p50": _finite(self.percentile(0.5)),
+            "p95": _finite(self.percentile(0.95)),
+            "buckets": {
+                **{str(b): c for b, c in zip(self.bounds, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+# ============================================================
+#                    PER-CALL SAMPLE
+# ============================================================
+
+class CallSample:
+    """Mutable record for one provider call; filled in while it runs."""
+
+    __slots__ = (
+        "provider", "model", "endpoint", "mode", "prompt_chars", "prompt_tokens",
+        "completion_chars", "completion_tokens", "started", "first_token_at",
+        "cache_hit", "error_class", "max_tokens",
+    )
+
+    def __init__(self, provider: str, model: str, endpoint: str, mode: str, prompt_chars: int):
+        self.provider = provider
+        self.model = model
+        self.endpoint = endpoint
+        self.mode = mode
+        self.prompt_chars = prompt_chars
+        self.prompt_tokens: Optional[int] = None
+        self.completion_chars = 0
+        self.completion_tokens: Optional[int] = None
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.cache_hit = False
+        self.error_class: Optional[str] = None
+        self.max_tokens: Optional[int] = None
+
+    def begin(self) -> None:
+        """Restart the clock, e.g. once a scheduler slot has been granted."""
+        self.started = time.perf_counter()
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def add_text(self, text: str) -> None:
+        self.first_token()
+        self.completion_chars += len(text or "")
+
+    def usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        if prompt_tokens:
+            self.prompt_tokens = int(prompt_tokens)
+        if completion_tokens:
+            self.completion_tokens = int(completion_tokens)
+
+
+_current_call: ContextVar[Optional[CallSample]] = ContextVar("ai_current_call", default=None)
+_request_scope: ContextVar[Optional[dict]] = ContextVar("ai_request_scope", default=None)
+_endpoint_override: ContextVar[Optional[str]] = ContextVar("ai_endpoint_override", default=None)
+
+
+def note_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    """Called by provider helpers with the SDK's usage report, if any."""
+    sample = _current_call.get()
+    if sample is not None:
+        sample.usage(prompt_tokens, completion_tokens)
+
+
+# ============================================================
+#                   ENDPOINT ATTRIBUTION
+# ============================================================
+
+class AIEndpointMiddleware:
+    """Pure-ASGI middleware that makes the current request's route visible to ai_metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+@contextmanager
+def endpoint_label(label: str) -> Iterator[None]:
+    """Attribute AI calls made inside the block to `label` (e.g. background jobs)."""
+    token = _endpoint_override.set(label)
+    try:
+        yield
+    finally:
+        _endpoint_override.reset(token)
+
+
+def current_endpoint() -> str:
+    override = _endpoint_override.get()
+    if override:
+        return override
+    scope = _request_scope.get()
+    if scope is None:
+        return "unknown"
+    # The router stores the matched route in the (shared) scope dict, so the
+    # templated path is available by the time the handler calls the AI.
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "unknown")
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+# ============================================================
+#                       AGGREGATION
+# ============================================================
+
+class _Series:
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.prompt_chars = 0
+        self.abandoned = 0
+        self.tokens_saved_est = 0
+        self.ttft_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.tokens_per_sec = Histogram(RATE_BUCKETS_TPS)
+        self.prompt_tokens_hist = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens_hist = Histogram(TOKEN_BUCKETS)
+
+
+class AIMetrics:
+    def __init__(self):
+        self._series: Dict[Tuple[str, str, str, str], _Series] = {}
+        self._prices = _load_prices()
+        self.started_at = time.time()
+
+    @contextmanager
+    def track(
+        self,
+        provider: str,
+        model: str,
+        messages: list,
+        mode: str = "complete",
+        max_tokens: Optional[int] = None,
+    ) -> Iterator[CallSample]:
+        """
+        Time one provider call. Exceptions are recorded (by class) and re-raised.
+        mode="stream" callers must report text via sample.add_text(); for
+        blocking calls TTFT equals total latency.
+        """
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        sample = CallSample(provider, model, current_endpoint(), mode, prompt_chars)
+        sample.max_tokens = max_tokens
+        token = _current_call.set(sample)
+        try:
+            yield sample
+        except (GeneratorExit, asyncio.CancelledError):
+            # A stream consumer stopped early (client disconnect) or the
+            # generation was cancelled on its behalf
+            sample.error_class = "ClientDisconnected" if mode == "stream" else "Cancelled"
+            raise
+        except BaseException as e:
+            sample.error_class = type(e).__name__
+            raise
+        finally:
+            try:
+                _current_call.reset(token)
+            except ValueError:
+                pass   # stream generator finalised from another context
+            try:
+                self.record(sample)
+            except Exception as e:   # telemetry must never break a request
+                logger.warning("AI metrics record failed: %s", e)
+
+    def record(self, sample: CallSample) -> None:
+        if not settings.AI_METRICS_ENABLED:
+            return
+        now = time.perf_counter()
+        key = (sample.endpoint, sample.provider, sample.model, sample.mode)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series()
+
+        series.calls += 1
+        if sample.error_class == "ClientDisconnected":
+            series.abandoned += 1
+            if sample.max_tokens:
+                generated = sample.completion_tokens or estimate_tokens(sample.completion_chars)
+                series.tokens_saved_est += max(0, sample.max_tokens - generated)
+        if sample.error_class:
+            series.errors[sample.error_class] = series.errors.get(sample.error_class, 0) + 1
+            # Cut off after generation started (abandoned or failed mid-stream):
+            # what was generated is billed, so it counts towards tokens and cost
+            if sample.completion_chars or sample.completion_tokens or sample.prompt_tokens:
+                self._add_usage(series, sample)
+            return
+        if sample.cache_hit:
+            series.cache_hits += 1
+            return
+
+        latency = now - sample.started
+        first = sample.first_token_at or now
+        ttft = first - sample.started
+        prompt_tokens, completion_tokens = self._add_usage(series, sample)
+        series.latency_ms.observe(latency * 1000)
+        series.ttft_ms.observe(ttft * 1000)
+        series.prompt_tokens_hist.observe(prompt_tokens)
+        series.completion_tokens_hist.observe(completion_tokens)
+
+        # Streams: generation rate after the first token. Blocking: end-to-end.
+        gen_time = (now - first) if sample.mode == "stream" else latency
+        if completion_tokens and gen_time > 0:
+            series.tokens_per_sec.observe(completion_tokens / gen_time)
+
+    @staticmethod
+    def _add_usage(series: _Series, sample: CallSample) -> Tuple[int, int]:
+        prompt_tokens = sample.prompt_tokens or estimate_tokens(sample.prompt_chars)
+        completion_tokens = sample.completion_tokens or estimate_tokens(sample.completion_chars)
+        series.prompt_chars += sample.prompt_chars
+        series.prompt_tokens += prompt_tokens
+        series.completion_tokens += completion_tokens
+        return prompt_tokens, completion_tokens
+
+    def cost_usd(self, model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        price = self._prices.get(model)
+        if price is None:
+            return None
+        return round((prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000, 6)
+
+    def snapshot(self) -> Dict[str, Any]:
+        rows = []
+        by_endpoint: Dict[str, Dict[str, Any]] = {}
+        for (endpoint, provider, model, mode), s in sorted(self._series.items()):
+            cost = self.cost_usd(model, s.prompt_tokens, s.completion_tokens)
+            rows.append({
+                "endpoint": endpoint,
+                "provider": provider,
+                "model": model,
+                "mode": mode,
+                "calls": s.calls,
+                "cache_hits": s.cache_hits,
+                "errors": dict(s.errors),
+                "prompt_chars": s.prompt_chars,
+                "prompt_tokens": s.prompt_tokens,
+                "completion_tokens": s.completion_tokens,
+                "cost_usd": cost,
+                "abandoned": s.abandoned,
+                "tokens_saved_est": s.tokens_saved_est,
+                "ttft_ms": s.ttft_ms.summary(),
+                "latency_ms": s.latency_ms.summary(),
+                "tokens_per_sec": s.tokens_per_sec.summary(),
+                "prompt_tokens_dist": s.prompt_tokens_hist.summary(),
+                "completion_tokens_dist": s.completion_tokens_hist.summary(),
+            })
+            agg = by_endpoint.setdefault(
+                endpoint,
+                {"calls": 0, "errors": 0, "cache_hits": 0, "abandoned": 0, "tokens_saved_est": 0, "cost_usd": 0.0},
+            )
+            agg["calls"] += s.calls
+            agg["abandoned"] += s.abandoned
+            agg["tokens_saved_est"] += s.tokens_saved_est
+            agg["errors"] += sum(s.errors.values())
+            agg["cache_hits"] += s.cache_hits
+            agg["cost_usd"] = round(agg["cost_usd"] + (cost or 0.0), 6)
+        return {
+            "since": self.started_at,
+            "endpoints": by_endpoint,
+            "series": rows,
+        }
+
+    def reset(self) -> None:
+        self._series.clear()
+        self.started_at = time.time()
+
+
+# Process-wide instance used by ai_client
+ai_metrics = AIMetrics()
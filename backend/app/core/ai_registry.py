@@ -0,0 +1,119 @@
+# backend/app/core/ai_registry.py
+"""
+Process-wide registry of LLM provider clients.
+
+Every AI code path (ai_client, openai_client, routes_roadmaps) gets its clients
+from here instead of constructing them per call:
+
+  - OpenAI: one AsyncOpenAI client backed by a single keep-alive httpx pool
+    per event loop, so TLS handshakes and connection setup are paid once per
+    worker.
+  - Gemini: genai.configure() runs once (re-configuring drops the SDK's cached
+    transport), and one GenerativeModel handle is cached per model name.
+
+Clients are created lazily on first use and released by `aclose()` on shutdown.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+#            OPENAI — one pooled client per event loop
+# ============================================================
+# An httpx pool is bound to the event loop it was created on, so each loop
+# (the worker's, a TestClient portal, a script's asyncio.run, another thread)
+# gets its own client instead of replacing another loop's client in use.
+# aclose() closes them on their own loops; a client whose loop has already
+# closed cannot be closed any more (its transports need that loop), so it is
+# dropped from the registry on the next lookup.
+_openai_clients: Dict[asyncio.AbstractEventLoop, Any] = {}
+
+
+def get_openai_client():
+    """Return the running loop's shared AsyncOpenAI client (lazy-init on first call)."""
+    from openai import AsyncOpenAI
+
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY missing.")
+
+    loop = asyncio.get_running_loop()
+    client = _openai_clients.get(loop)
+    if client is None:
+        for stale in [l for l in list(_openai_clients) if l.is_closed()]:
+            _openai_clients.pop(stale, None)
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.AI_HTTP_TIMEOUT, connect=10.0),
+            follow_redirects=True,
+        )
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client)
+        _openai_clients[loop] = client
+        logger.info(
+            "OpenAI client initialized (pooled, max_connections=%s)",
+            settings.AI_HTTP_MAX_CONNECTIONS,
+        )
+
+    return client
+
+
+# ============================================================
+#          GEMINI — configure once, one handle per model
+# ============================================================
+_gemini_configured = False
+_gemini_models: Dict[str, Any] = {}
+
+
+def get_gemini_model(model_name: Optional[str] = None):
+    """Return a cached GenerativeModel for `model_name` (default: GEMINI_MODEL)."""
+    global _gemini_configured
+    import google.generativeai as genai
+
+    name = model_name or settings.GEMINI_MODEL
+    model = _gemini_models.get(name)
+    if model is not None:
+        return model
+
+    if not settings.GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY missing.")
+
+    if not _gemini_configured:
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        _gemini_configured = True
+
+    model = genai.GenerativeModel(name)
+    _gemini_models[name] = model
+    logger.info("Gemini model '%s' initialized (cached)", name)
+    return model
+
+
+# ============================================================
+#                         SHUTDOWN
+# ============================================================
+
+async def aclose() -> None:
+    """Close pooled connections. Called from the app shutdown hook."""
+    current = asyncio.get_running_loop()
+    clients = list(_openai_clients.items())
+    _openai_clients.clear()
+    for loop, client in clients:
+        try:
+            if loop is current:
+                await client.close()
+            elif loop.is_running():
+                # A pool can only be closed on its own loop
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.close(), loop))
+        except Exception as e:
+            logger.warning("Error closing OpenAI client: %s", e)
+    _gemini_models.clear()
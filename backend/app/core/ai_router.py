@@ -0,0 +1,320 @@
+# backend/app/core/ai_router.py
+"""
+Latency-aware routing between the configured AI providers.
+
+Per provider we keep:
+  - a circuit breaker (closed → open after N consecutive failures →
+    half-open after a cool-down, where a single probe decides), and
+  - rolling latency / error-rate stats over the last AI_STATS_WINDOW_SECONDS.
+
+`ai_router.call(fn)` tries the primary provider (AI_PROVIDER) and fails over
+to the next configured provider on error or while the primary's breaker is
+open. `fn` reports the provider request itself through `ai_router.upstream()`,
+which feeds the breaker and the latency stats. With hedging on, if the primary has not answered after its p95 latency
+(floored at AI_HEDGE_MIN_DELAY_MS), the same request is fired at the fallback
+and whichever succeeds first wins; the loser is cancelled.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KNOWN_PROVIDERS = ("gemini", "openai", "stub")
+
+
+# ============================================================
+#                      CIRCUIT BREAKER
+# ============================================================
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """May a request be sent to this provider right now?"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        # HALF_OPEN: let exactly one probe through
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def release(self) -> None:
+        """A request was cancelled before finishing — free the probe slot."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("AI circuit breaker opened after %s failures", self.consecutive_failures)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+# ============================================================
+#                   ROLLING PROVIDER STATS
+# ============================================================
+
+class ProviderStats:
+    """Latency samples and outcomes over a sliding time window."""
+
+    def __init__(self, window_seconds: float, max_samples: int = 2000):
+        self.window_seconds = window_seconds
+        self._samples: deque = deque(maxlen=max_samples)  # (ts, latency_s | None, ok)
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        self._samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self) -> list:
+        cutoff = time.monotonic() - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return list(self._samples)
+
+    def latency_percentile(self, p: float) -> Optional[float]:
+        latencies = sorted(s[1] for s in self._recent() if s[2] and s[1] is not None)
+        if not latencies:
+            return None
+        idx = min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))
+        return latencies[idx]
+
+    def summary(self) -> Dict[str, Any]:
+        recent = self._recent()
+        total = len(recent)
+        errors = sum(1 for s in recent if not s[2])
+        p50 = self.latency_percentile(0.5)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "calls": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+# ============================================================
+#                          ROUTER
+# ============================================================
+
+class AIRouter:
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats: Dict[str, ProviderStats] = {}
+        self.failovers = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        for p in KNOWN_PROVIDERS:
+            self._ensure(p)
+
+    def _ensure(self, provider: str) -> None:
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(
+                settings.AI_BREAKER_FAILURE_THRESHOLD,
+                settings.AI_BREAKER_OPEN_SECONDS,
+            )
+            self.stats[provider] = ProviderStats(settings.AI_STATS_WINDOW_SECONDS)
+
+    # ---------------- provider selection ----------------
+
+    @staticmethod
+    def _configured(provider: str) -> bool:
+        if provider == "openai":
+            return bool(settings.OPENAI_API_KEY)
+        if provider == "gemini":
+            return bool(settings.GEMINI_API_KEY)
+        return provider == "stub"
+
+    def order(self, primary: Optional[str] = None) -> List[str]:
+        """
+        Primary first, then fallbacks that have an API key configured. The
+        stub never fails over to a paid provider, nor stands in for one.
+        """
+        primary = (primary or settings.AI_PROVIDER or "").lower().strip()
+        order = [primary]
+        if settings.AI_FAILOVER_ENABLED and primary != "stub":
+            for p in settings.AI_FALLBACK_PROVIDERS.split(","):
+                p = p.strip().lower()
+                if p and p != "stub" and p not in order and p in KNOWN_PROVIDERS and self._configured(p):
+                    order.append(p)
+        for p in order:
+            self._ensure(p)
+        return order
+
+    def record(self, provider: str, latency: Optional[float], ok: bool) -> None:
+        self._ensure(provider)
+        self.stats[provider].record(latency, ok)
+        if ok:
+            self.breakers[provider].record_success()
+        else:
+            self.breakers[provider].record_failure()
+
+    def hedge_delay(self, provider: str) -> float:
+        p95 = self.stats[provider].latency_percentile(settings.AI_HEDGE_PERCENTILE)
+        floor = settings.AI_HEDGE_MIN_DELAY_MS / 1000
+        return max(p95 or 0.0, floor)
+
+    # ---------------- execution ----------------
+
+    @contextmanager
+    def upstream(self, provider: str) -> Iterator[None]:
+        """
+        Time and record one request to `provider`. `fn` wraps only the
+        provider call in it: a cache hit must not close a half-open breaker,
+        and local queueing is not provider latency (it would fire hedges
+        against a healthy provider).
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(provider, time.perf_counter() - t0, ok=False)
+            raise
+        self.record(provider, time.perf_counter() - t0, ok=True)
+
+    async def _attempt(self, provider: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        try:
+            return await fn(provider)
+        finally:
+            # Cancelled, or failed before reaching the provider: free a
+            # half-open probe slot (no-op once upstream() recorded an outcome)
+            self.breakers[provider].release()
+
+    async def call(
+        self,
+        fn: Callable[[str], Awaitable[Any]],
+        primary: Optional[str] = None,
+        providers: Optional[List[str]] = None,
+        hedge: Optional[bool] = None,
+    ) -> Any:
+        """
+        Run `fn(provider)` against the best available provider.
+
+        providers pins the candidate list (e.g. a call that needs a specific
+        model); otherwise primary + configured fallbacks are used.
+        """
+        order = providers or self.order(primary)
+        for p in order:
+            self._ensure(p)
+
+        hedge = settings.AI_HEDGE_ENABLED if hedge is None else hedge
+        if hedge and len(order) > 1:
+            return await self._hedged(fn, order)
+        return await self._sequential(fn, order)
+
+    async def _sequential(
+        self,
+        fn: Callable[[str], Awaitable[Any]],
+        order: List[str],
+        last_error: Optional[BaseException] = None,
+        previous: Optional[str] = None,
+    ) -> Any:
+        # Breakers are consulted lazily so a half-open probe slot is only
+        # claimed by the provider we actually send the request to.
+        for provider in order:
+            if not self.breakers[provider].allow():
+                continue
+            if previous is not None:
+                self.failovers += 1
+                logger.warning("AI failover: %s → %s (%s)", previous, provider, last_error)
+            try:
+                return await self._attempt(provider, fn)
+            except Exception as e:
+                last_error, previous = e, provider
+
+        if last_error is None:
+            raise RuntimeError("All AI providers are unavailable (circuit open).")
+        raise last_error
+
+    async def _hedged(self, fn: Callable[[str], Awaitable[Any]], order: List[str]) -> Any:
+        primary = next((p for p in order if self.breakers[p].allow()), None)
+        if primary is None:
+            raise RuntimeError("All AI providers are unavailable (circuit open).")
+        rest = order[order.index(primary) + 1:]
+
+        primary_task = asyncio.create_task(self._attempt(primary, fn))
+        tasks = {primary_task}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(primary))
+            if done:
+                if primary_task.exception() is None:
+                    return primary_task.result()
+                # Failed fast — nothing to race, plain failover.
+                return await self._sequential(fn, rest, primary_task.exception(), primary)
+
+            backup = next((p for p in rest if self.breakers[p].allow()), None)
+            if backup is not None:
+                self.hedges_fired += 1
+                tasks.add(asyncio.create_task(self._attempt(backup, fn)))
+
+            last_error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is not primary_task:
+                            self.hedges_won += 1
+                        return t.result()
+                    last_error = t.exception()
+            raise last_error
+        finally:
+            # Losers, and everything if the caller itself was cancelled
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-provider breaker state + rolling stats, for the admin endpoint."""
+        providers = {}
+        for p in self.breakers:
+            b = self.breakers[p]
+            providers[p] = {
+                "configured": self._configured(p),
+                "breaker": b.state,
+                "consecutive_failures": b.consecutive_failures,
+                **self.stats[p].summary(),
+                "hedge_delay_ms": round(self.hedge_delay(p) * 1000, 1),
+            }
+        return {
+            "primary": (settings.AI_PROVIDER or "").lower().strip(),
+            "order": self.order(),
+            "failover_enabled": settings.AI_FAILOVER_ENABLED,
+            "hedge_enabled": settings.AI_HEDGE_ENABLED,
+            "failovers": self.failovers,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "providers": providers,
+        }
+
+
+# Process-wide instance used by ai_client
+ai_router = AIRouter()
@@ -0,0 +1,228 @@
+# backend/app/core/ai_scheduler.py
+"""
+In-process admission control for upstream LLM calls.
+
+Every provider call holds one slot. A stream holds it until its first token
+by default (AI_STREAM_HOLD_SLOT=false): the limits then bound concurrent
+upstream call starts, where providers queue and time-to-first-token is
+decided, not the number of answers being streamed. With
+AI_STREAM_HOLD_SLOT=true a stream keeps its slot while open, so
+AI_PROVIDER_MAX_CONCURRENCY also caps concurrent tutor streams per worker.
+A slot is granted when:
+  - fewer than AI_MAX_CONCURRENCY calls are in flight in this worker,
+  - fewer than AI_PROVIDER_MAX_CONCURRENCY are in flight to that provider, and
+  - for the "background" class, fewer than AI_BACKGROUND_MAX_CONCURRENCY
+    background calls are running (the rest is headroom for people waiting
+    on a response).
+
+Waiters are served strictly by priority class (interactive > interview >
+background). Within a class, users take turns round-robin, so one roadmap
+generation fanning out 50 week expansions cannot starve another user's
+request that is queued behind it.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "interview", "background")
+
+
+class _Waiter:
+    __slots__ = ("provider", "priority", "future", "enqueued_at")
+
+    def __init__(self, provider: str, priority: str, future: asyncio.Future):
+        self.provider = provider
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _Slot:
+    __slots__ = ("_scheduler", "provider", "priority", "held")
+
+    def __init__(self, scheduler: "AIScheduler", provider: str, priority: str, held: bool):
+        self._scheduler = scheduler
+        self.provider = provider
+        self.priority = priority
+        self.held = held
+
+    def release(self) -> None:
+        """Give the slot back before the block ends (e.g. once a stream has started). Idempotent."""
+        if self.held:
+            self.held = False
+            self._scheduler._release(self.provider, self.priority)
+
+
+class AIScheduler:
+    def __init__(self, wait_samples: int = 1000):
+        # priority -> user key -> FIFO of waiters. Dict order is the round-robin
+        # order: a user that just got a slot is moved to the back.
+        self._queues: Dict[str, "OrderedDict[Any, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._inflight = 0
+        self._inflight_by_provider: Dict[str, int] = {}
+        self._inflight_by_priority: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._waits: Dict[str, deque] = {p: deque(maxlen=wait_samples) for p in PRIORITIES}
+        self._granted: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._max_depth: Dict[str, int] = {p: 0 for p in PRIORITIES}
+
+    # ---------------- admission ----------------
+
+    def _has_capacity(self, provider: str, priority: str) -> bool:
+        if self._inflight >= settings.AI_MAX_CONCURRENCY:
+            return False
+        if self._inflight_by_provider.get(provider, 0) >= settings.AI_PROVIDER_MAX_CONCURRENCY:
+            return False
+        if (
+            priority == "background"
+            and self._inflight_by_priority["background"] >= settings.AI_BACKGROUND_MAX_CONCURRENCY
+        ):
+            return False
+        return True
+
+    def _take(self, provider: str, priority: str) -> None:
+        self._inflight += 1
+        self._inflight_by_provider[provider] = self._inflight_by_provider.get(provider, 0) + 1
+        self._inflight_by_priority[priority] += 1
+        self._granted[priority] += 1
+
+    def _release(self, provider: str, priority: str) -> None:
+        self._inflight -= 1
+        self._inflight_by_provider[provider] -= 1
+        self._inflight_by_priority[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiters: highest class first, round-robin by user."""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            progressed = True
+            while progressed and queue:
+                progressed = False
+                for user_key in list(queue):
+                    waiters = queue[user_key]
+                    # A waiter cancelled (e.g. client disconnect) whose task has
+                    # not run its cleanup yet must not be handed a slot
+                    while waiters and waiters[0].future.done():
+                        waiters.popleft()
+                    if not waiters:
+                        del queue[user_key]
+                        progressed = True
+                        break
+                    head = waiters[0]
+                    if not self._has_capacity(head.provider, priority):
+                        continue
+                    waiters.popleft()
+                    if waiters:
+                        queue.move_to_end(user_key)
+                    else:
+                        del queue[user_key]
+                    self._take(head.provider, priority)
+                    self._waits[priority].append(time.monotonic() - head.enqueued_at)
+                    head.future.set_result(None)
+                    progressed = True
+                    break
+
+    def _remove(self, user_key: Any, waiter: _Waiter) -> None:
+        queue = self._queues[waiter.priority]
+        waiters = queue.get(user_key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            return
+        if not waiters:
+            del queue[user_key]
+
+    async def acquire(self, provider: str, priority: str = "interactive", user_id: Any = None) -> None:
+        if priority not in self._queues:
+            raise ValueError(f"Unknown AI priority: {priority!r}. Expected one of {PRIORITIES}.")
+
+        # Fast path: nothing queued in this class or above, and room to run now
+        ahead = any(self._queues[p] for p in PRIORITIES[: PRIORITIES.index(priority) + 1])
+        if not ahead and self._has_capacity(provider, priority):
+            self._take(provider, priority)
+            self._waits[priority].append(0.0)
+            return
+
+        user_key = user_id if user_id is not None else "anonymous"
+        waiter = _Waiter(provider, priority, asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(user_key, deque()).append(waiter)
+        depth = sum(len(q) for q in self._queues[priority].values())
+        self._max_depth[priority] = max(self._max_depth[priority], depth)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled — hand the slot back
+                self._release(provider, priority)
+            else:
+                self._remove(user_key, waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        provider: str,
+        priority: str = "interactive",
+        user_id: Any = None,
+    ) -> AsyncIterator[_Slot]:
+        """Hold one upstream-call slot until the block ends or the yielded slot is released."""
+        if not settings.AI_SCHEDULER_ENABLED:
+            yield _Slot(self, provider, priority, held=False)
+            return
+
+        await self.acquire(provider, priority, user_id)
+        held = _Slot(self, provider, priority, held=True)
+        try:
+            yield held
+        finally:
+            held.release()
+
+    # ---------------- metrics ----------------
+
+    @staticmethod
+    def _percentile_ms(samples: list, p: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+        return round(ordered[idx] * 1000, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        classes = {}
+        for p in PRIORITIES:
+            waits = list(self._waits[p])
+            classes[p] = {
+                "queued": sum(len(q) for q in self._queues[p].values()),
+                "queued_users": len(self._queues[p]),
+                "max_queued": self._max_depth[p],
+                "inflight": self._inflight_by_priority[p],
+                "granted": self._granted[p],
+                "wait_p50_ms": self._percentile_ms(waits, 0.5),
+                "wait_p95_ms": self._percentile_ms(waits, 0.95),
+            }
+        return {
+            "enabled": settings.AI_SCHEDULER_ENABLED,
+            "limits": {
+                "global": settings.AI_MAX_CONCURRENCY,
+                "per_provider": settings.AI_PROVIDER_MAX_CONCURRENCY,
+                "background": settings.AI_BACKGROUND_MAX_CONCURRENCY,
+            },
+            "inflight": self._inflight,
+            "inflight_by_provider": dict(self._inflight_by_provider),
+            "classes": classes,
+        }
+
+
+# Process-wide instance used by ai_client
+ai_scheduler = AIScheduler()
@@ -0,0 +1,232 @@
+# backend/app/core/ai_stub.py
+"""
+Local stub LLM provider (AI_PROVIDER=stub) for offline load and latency tests.
+
+No network: replies are generated from the prompt and paced with asyncio.sleep
+to mimic a real model —
+  - AI_STUB_TTFT_MS before the first token,
+  - then AI_STUB_TOKENS_PER_SEC (tokens estimated at ~4 chars each),
+  - AI_STUB_ERROR_RATE of calls fail before the first token (seeded RNG, so a
+    run with the same AI_STUB_SEED fails the same calls).
+
+Reply text depends only on the prompt, so the same prompt always gets the same
+answer. Prompts recognised as structured requests get JSON the real routes
+accept: roadmap planner skeletons, week expansions, MCQ sets and mock-interview
+feedback. Other json_mode calls get {"answer": ...}; everything else is prose.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+from typing import AsyncGenerator, Optional
+
+from app.core.ai_metrics import estimate_tokens
+from app.core.config import settings
+
+STUB_MODEL = "stub-1"
+
+_rng = random.Random(settings.AI_STUB_SEED)
+
+_WORDS = (
+    "the idea is to break the problem into smaller steps and check each one "
+    "carefully before moving on so start with a simple example then trace "
+    "how the data changes at every step and compare it with what you expected"
+).split()
+
+
+def _prompt_text(messages: list) -> str:
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _prose(seed: int, n_tokens: int) -> str:
+    words, i = [], seed % len(_WORDS)
+    while estimate_tokens(len(" ".join(words))) < n_tokens:
+        words.append(_WORDS[i % len(_WORDS)])
+        i += 1
+    text = " ".join(words)
+    return text[:1].upper() + text[1:] + "."
+
+
+def _int_after(pattern: str, text: str, default: int) -> int:
+    m = re.search(pattern, text)
+    return int(m.group(1)) if m else default
+
+
+# ============================================================
+#                  STRUCTURED (JSON) REPLIES
+# ============================================================
+
+def _roadmap_skeleton(prompt: str) -> dict:
+    topic_m = re.search(r"Topic/Skill:\s*(.+)", prompt)
+    topic = topic_m.group(1).strip() if topic_m else "Stub Topic"
+    weeks = _int_after(r"Duration:\s*(\d+)\s*weeks", prompt, 12)
+    n_phases = 3
+    per_phase = -(-weeks // n_phases)
+    phases, week = [], 1
+    for order in range(1, n_phases + 1):
+        start, end = week, min(weeks, week + per_phase - 1)
+        phases.append({
+            "id": f"phase-{order}",
+            "name": f"Phase {order}: {topic} part {order}",
+            "order": order,
+            "goal": f"Build {topic} skills, stage {order}.",
+            "start_week": start,
+            "end_week": end,
+            "milestone_summary": f"Milestone {order}",
+            "phase_xp": 0,
+            "weeks": [
+                {
+                    "week_number": w,
+                    "theme": f"{topic} week {w}",
+                    "outcome": f"Complete week {w} exercises.",
+                    "summary": f"Week {w} of {topic}.",
+                    "week_xp": 0,
+                }
+                for w in range(start, end + 1)
+            ],
+        })
+        week = end + 1
+    slug = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-")
+    return {
+        "id": f"{slug}-{weeks}w",
+        "title": f"{topic} Roadmap",
+        "skill": slug,
+        "level": "beginner",
+        "description": f"A {weeks}-week stub roadmap for {topic}.",
+        "duration_weeks": weeks,
+        "hours_per_week": _int_after(r"Hours per week:\s*(\d+)", prompt, 10),
+        "target_outcome": f"Working knowledge of {topic}.",
+        "prerequisites": "None",
+        "total_xp": 0,
+        "phases": phases,
+    }
+
+
+def _week_expansion(prompt: str) -> dict:
+    week = _int_after(r"Week number:\s*(\d+)", prompt, 1)
+    days = []
+    for d in range(1, 6):
+        days.append({
+            "day_number": d,
+            "title": f"Week {week} day {d}",
+            "time_estimate_hours": 2.0,
+            "xp_reward": 55,
+            "completed": False,
+            "learn_items": [{
+                "description": f"Read the day {d} material",
+                "xp": 10,
+                "completed": False,
+                "resource": {
+                    "title": "Python documentation",
+                    "url": "https://docs.python.org/3/tutorial/",
+                    "provider": "python.org",
+                    "type": "docs",
+                },
+            }],
+            "practice_items": [{"description": f"Practice set {d}", "xp": 15, "completed": False}],
+            "project_items": [{"description": f"Project step {d}", "xp": 25, "completed": False}],
+            "reflection_items": [{"description": "Write a short reflection", "xp": 5, "completed": False}],
+        })
+    return {
+        "week_xp": 55 * len(days),
+        "weekly_resources": [{
+            "title": "freeCodeCamp",
+            "url": "https://www.freecodecamp.org/learn",
+            "provider": "freeCodeCamp",
+            "type": "course",
+        }],
+        "days": days,
+    }
+
+
+def _mcq(prompt: str, seed: int) -> dict:
+    count = _int_after(r"Create (\d+) multiple-choice", prompt, 5)
+    topic_m = re.search(r"for topic '([^']*)'", prompt)
+    topic = topic_m.group(1) if topic_m else "the topic"
+    return {
+        "questions": [
+            {
+                "question": f"Stub question {i + 1} about {topic}?",
+                "choices": [f"Option {c}" for c in "ABCD"],
+                "answer_index": (seed + i) % 4,
+                "explanation": f"Option {'ABCD'[(seed + i) % 4]} is correct for this stub.",
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def _interview_feedback(seed: int) -> dict:
+    return {
+        "type": "feedback",
+        "clarity": 60 + seed % 40,
+        "relevance": 60 + (seed // 7) % 40,
+        "structure": 60 + (seed // 49) % 40,
+        "text": "Clear answer with a concrete example. Quantify the result next time.",
+        "closing": "Good luck!",
+    }
+
+
+def reply_for(messages: list, max_tokens: int, json_mode: bool = False) -> str:
+    """The full reply text for `messages` (deterministic)."""
+    prompt = _prompt_text(messages)
+    seed = _digest(prompt)
+
+    data: Optional[dict] = None
+    if "curriculum architect" in prompt or "roadmap SKELETON" in prompt:
+        data = _roadmap_skeleton(prompt)
+    elif "Expand the supplied week" in prompt or "Expand this week into daily tasks" in prompt:
+        data = _week_expansion(prompt)
+    elif "multiple-choice questions" in prompt:
+        data = _mcq(prompt, seed)
+    elif '"type": "feedback"' in prompt:
+        data = _interview_feedback(seed)
+    elif json_mode:
+        data = {"answer": _prose(seed, min(max_tokens, settings.AI_STUB_OUTPUT_TOKENS))}
+
+    if data is not None:
+        return json.dumps(data)
+    return _prose(seed, min(max_tokens, settings.AI_STUB_OUTPUT_TOKENS))
+
+
+# ============================================================
+#                       PROVIDER API
+# ============================================================
+
+async def _first_token_delay() -> None:
+    fail = _rng.random() < settings.AI_STUB_ERROR_RATE
+    await asyncio.sleep(settings.AI_STUB_TTFT_MS / 1000)
+    if fail:
+        raise RuntimeError("Stub provider: injected error.")
+
+
+def _seconds_for(text: str) -> float:
+    tps = settings.AI_STUB_TOKENS_PER_SEC
+    return estimate_tokens(len(text)) / tps if tps > 0 else 0.0
+
+
+async def complete(messages: list, max_tokens: int, json_mode: bool = False) -> str:
+    """Non-streaming stub call: TTFT + full generation time, then the whole reply."""
+    text = reply_for(messages, max_tokens, json_mode)
+    await _first_token_delay()
+    await asyncio.sleep(_seconds_for(text))
+    return text
+
+
+async def stream(messages: list, max_tokens: int) -> AsyncGenerator[str, None]:
+    """Streaming stub call: yields ~AI_STUB_CHUNK_TOKENS tokens per chunk at the configured rate."""
+    text = reply_for(messages, max_tokens)
+    await _first_token_delay()
+
+    chunk_chars = max(1, settings.AI_STUB_CHUNK_TOKENS) * 4
+    for i in range(0, len(text), chunk_chars):
+        chunk = text[i:i + chunk_chars]
+        if i:
+            await asyncio.sleep(_seconds_for(chunk))
+        yield chunk
@@ -14,6 +14,15 @@ class Settings(BaseSettings):
     # REQUIRED: Must be set in .env — no SQLite fallback.
     # Local dev should use the same Supabase PostgreSQL as production.
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    # Connections per worker, split between the sync and async engines
+    # (app/db/session.py): the async engine gets DB_ASYNC_POOL_SIZE /
+    # DB_ASYNC_MAX_OVERFLOW of the budget, the sync engine the rest.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+    DB_ASYNC_POOL_SIZE: int = int(os.getenv("DB_ASYNC_POOL_SIZE", "8"))
+    DB_ASYNC_MAX_OVERFLOW: int = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "12"))
+    # asyncpg prepared-statement caches; 0 behind pgbouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
 
     # === Security ===
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -33,7 +42,7 @@ class Settings(BaseSettings):
     )
 
     # === AI provider selection ===
-    AI_PROVIDER: str = os.getenv("AI_PROVIDER", "gemini")  # "gemini" or "openai"
+    AI_PROVIDER: str = os.getenv("AI_PROVIDER", "gemini")  # "gemini", "openai" or "stub"
 
     # === OpenAI ===
     OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
@@ -51,6 +60,103 @@ class Settings(BaseSettings):
     # Gemini counterpart for Mock Interview (if using Gemini provider)
     MOCK_INTERVIEW_GEMINI_MODEL: str = os.getenv("MOCK_INTERVIEW_GEMINI_MODEL", "gemini-2.5-pro")
 
+    # === Local stub provider (AI_PROVIDER=stub, see app/core/ai_stub.py) ===
+    AI_STUB_TTFT_MS: int = int(os.getenv("AI_STUB_TTFT_MS", "300"))
+    AI_STUB_TOKENS_PER_SEC: float = float(os.getenv("AI_STUB_TOKENS_PER_SEC", "60"))
+    AI_STUB_OUTPUT_TOKENS: int = int(os.getenv("AI_STUB_OUTPUT_TOKENS", "250"))
+    AI_STUB_CHUNK_TOKENS: int = int(os.getenv("AI_STUB_CHUNK_TOKENS", "4"))
+    AI_STUB_ERROR_RATE: float = float(os.getenv("AI_STUB_ERROR_RATE", "0"))
+    AI_STUB_SEED: int = int(os.getenv("AI_STUB_SEED", "42"))
+
+    # === Provider HTTP pool (shared by every AI call in a worker) ===
+    AI_HTTP_MAX_CONNECTIONS: int = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "100"))
+    AI_HTTP_MAX_KEEPALIVE: int = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "20"))
+    AI_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("AI_HTTP_KEEPALIVE_EXPIRY", "60"))
+    AI_HTTP_TIMEOUT: float = float(os.getenv("AI_HTTP_TIMEOUT", "120"))
+
+    # === Provider failover / hedging (see app/core/ai_router.py) ===
+    AI_FAILOVER_ENABLED: bool = os.getenv("AI_FAILOVER_ENABLED", "True").lower() == "true"
+    # Fallback order after AI_PROVIDER; providers without an API key are skipped.
+    # Never used with AI_PROVIDER=stub, and the stub is never a fallback.
+    AI_FALLBACK_PROVIDERS: str = os.getenv("AI_FALLBACK_PROVIDERS", "gemini,openai")
+    AI_HEDGE_ENABLED: bool = os.getenv("AI_HEDGE_ENABLED", "False").lower() == "true"
+    AI_HEDGE_PERCENTILE: float = float(os.getenv("AI_HEDGE_PERCENTILE", "0.95"))
+    AI_HEDGE_MIN_DELAY_MS: int = int(os.getenv("AI_HEDGE_MIN_DELAY_MS", "1500"))
+    AI_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "5"))
+    AI_BREAKER_OPEN_SECONDS: float = float(os.getenv("AI_BREAKER_OPEN_SECONDS", "30"))
+    AI_STATS_WINDOW_SECONDS: float = float(os.getenv("AI_STATS_WINDOW_SECONDS", "300"))
+
+    # === Upstream concurrency scheduler (see app/core/ai_scheduler.py) ===
+    AI_SCHEDULER_ENABLED: bool = os.getenv("AI_SCHEDULER_ENABLED", "True").lower() == "true"
+    AI_MAX_CONCURRENCY: int = int(os.getenv("AI_MAX_CONCURRENCY", "32"))
+    AI_PROVIDER_MAX_CONCURRENCY: int = int(os.getenv("AI_PROVIDER_MAX_CONCURRENCY", "24"))
+    # Cap for batch work (roadmap expansion etc.) so chat always has headroom
+    AI_BACKGROUND_MAX_CONCURRENCY: int = int(os.getenv("AI_BACKGROUND_MAX_CONCURRENCY", "8"))
+    # False: a stream gives its slot back at the first token, so the limits above
+    # bound concurrent call starts. True: it holds the slot while open, which
+    # caps concurrent tutor streams per worker at AI_PROVIDER_MAX_CONCURRENCY.
+    AI_STREAM_HOLD_SLOT: bool = os.getenv("AI_STREAM_HOLD_SLOT", "False").lower() == "true"
+
+    # === SSE streaming (see app/core/sse.py) ===
+    SSE_COALESCE_MS: int = int(os.getenv("SSE_COALESCE_MS", "40"))        # 0 = one frame per delta
+    SSE_COALESCE_BYTES: int = int(os.getenv("SSE_COALESCE_BYTES", "1024"))
+    SSE_DISCONNECT_POLL_MS: int = int(os.getenv("SSE_DISCONNECT_POLL_MS", "250"))
+    # Resumable tutor streams (see app/core/stream_replay.py)
+    STREAM_REPLAY_EVENTS: int = int(os.getenv("STREAM_REPLAY_EVENTS", "512"))
+    STREAM_REPLAY_TTL_S: int = int(os.getenv("STREAM_REPLAY_TTL_S", "120"))
+    STREAM_REPLAY_MAX_STREAMS: int = int(os.getenv("STREAM_REPLAY_MAX_STREAMS", "1000"))
+    # Cancel a generation this long after its last client left (0 = at once)
+    STREAM_ABANDON_GRACE_MS: int = int(os.getenv("STREAM_ABANDON_GRACE_MS", "3000"))
+
+    # === LLM call telemetry (see app/core/ai_metrics.py) ===
+    AI_METRICS_ENABLED: bool = os.getenv("AI_METRICS_ENABLED", "True").lower() == "true"
+    # JSON {"model": [usd_per_1M_input, usd_per_1M_output]} merged over the built-in table
+    AI_MODEL_PRICES: str = os.getenv("AI_MODEL_PRICES", "")
+
+    # === LLM response cache (see app/core/llm_cache.py) ===
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    # Calls at or below this temperature are cached unless the caller opts out
+    LLM_CACHE_MAX_TEMPERATURE: float = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+    # Shared Postgres tier across workers (table: llm_response_cache)
+    LLM_CACHE_DB_ENABLED: bool = os.getenv("LLM_CACHE_DB_ENABLED", "False").lower() == "true"
+
+    # === Problem catalog snapshot (see app/services/problem_catalog.py) ===
+    # How often a worker checks catalog_versions for writes made by other workers
+    CATALOG_VERSION_CHECK_S: float = float(os.getenv("CATALOG_VERSION_CHECK_S", "5"))
+
+    # === Per-user solved bitmaps (see app/services/solved_index.py) ===
+    # How often a cached bitmap is re-checked for solves made on other workers
+    SOLVED_INDEX_CHECK_S: float = float(os.getenv("SOLVED_INDEX_CHECK_S", "2"))
+    SOLVED_INDEX_CACHE_USERS: int = int(os.getenv("SOLVED_INDEX_CACHE_USERS", "10000"))
+
+    # === Tutor conversation context (see tutor_service.build_contextual_messages) ===
+    # Estimated-token budget for system prompt + summary + history + new message
+    TUTOR_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("TUTOR_CONTEXT_TOKEN_BUDGET", "3000"))
+    # Any single history message is clipped to this many tokens
+    TUTOR_CONTEXT_MESSAGE_MAX_TOKENS: int = int(os.getenv("TUTOR_CONTEXT_MESSAGE_MAX_TOKENS", "1000"))
+    TUTOR_CONTEXT_MAX_MESSAGES: int = int(os.getenv("TUTOR_CONTEXT_MAX_MESSAGES", "20"))
+    # Newest turns kept verbatim; older ones are folded into Conversation.summary
+    TUTOR_SUMMARY_KEEP_RECENT: int = int(os.getenv("TUTOR_SUMMARY_KEEP_RECENT", "6"))
+    TUTOR_SUMMARY_MIN_TOKENS: int = int(os.getenv("TUTOR_SUMMARY_MIN_TOKENS", "600"))
+    TUTOR_SUMMARY_MAX_TOKENS: int = int(os.getenv("TUTOR_SUMMARY_MAX_TOKENS", "350"))
+    # Oldest unsummarised messages folded per refresh; a backlog takes several
+    TUTOR_SUMMARY_BATCH_MESSAGES: int = int(os.getenv("TUTOR_SUMMARY_BATCH_MESSAGES", "40"))
+
+    # === Tutor message write-behind (see app/services/tutor_writer.py) ===
+    TUTOR_WRITE_BEHIND: bool = os.getenv("TUTOR_WRITE_BEHIND", "False").lower() == "true"
+    TUTOR_WRITE_BEHIND_INTERVAL_MS: int = int(os.getenv("TUTOR_WRITE_BEHIND_INTERVAL_MS", "25"))
+    TUTOR_WRITE_BEHIND_BATCH: int = int(os.getenv("TUTOR_WRITE_BEHIND_BATCH", "200"))
+
+    # === Tutor cold storage (see app/services/tutor_archive.py) ===
+    # Conversations idle this many days are packed into one compressed blob
+    TUTOR_ARCHIVE_AFTER_DAYS: int = int(os.getenv("TUTOR_ARCHIVE_AFTER_DAYS", "30"))
+    # Seconds between compaction passes; 0 disables the background job
+    TUTOR_ARCHIVE_INTERVAL_S: int = int(os.getenv("TUTOR_ARCHIVE_INTERVAL_S", "3600"))
+    TUTOR_ARCHIVE_BATCH: int = int(os.getenv("TUTOR_ARCHIVE_BATCH", "200"))
+    TUTOR_ARCHIVE_ZSTD_LEVEL: int = int(os.getenv("TUTOR_ARCHIVE_ZSTD_LEVEL", "10"))
+
     # === System prompt ===
     AI_SYSTEM_PROMPT: str = os.getenv(
         "AI_SYSTEM_PROMPT",
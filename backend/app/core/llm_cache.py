@@ -0,0 +1,208 @@
+# backend/app/core/llm_cache.py
+"""
+Content-addressed cache for deterministic LLM calls.
+
+Keys are a SHA-256 of (provider, model, messages, temperature, max_tokens,
+json_mode), so identical prompts hit regardless of which endpoint sent them.
+
+Two tiers:
+  1. In-process LRU with TTL (bounded by LLM_CACHE_MAX_ENTRIES).
+  2. Optional Postgres table `llm_response_cache` (LLM_CACHE_DB_ENABLED=true),
+     shared by every Gunicorn worker. DB hits are promoted into the LRU.
+
+Callers opt in/out per call via ai_client's `cache=` argument; by default only
+calls at or below LLM_CACHE_MAX_TEMPERATURE are cached.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(
+    provider: str,
+    model: str,
+    messages: list,
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool,
+) -> str:
+    """Stable hash of everything that determines a completion."""
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "temperature": round(float(temperature), 4),
+            "max_tokens": int(max_tokens),
+            "json_mode": bool(json_mode),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def should_cache(temperature: float, cache: Optional[bool]) -> bool:
+    """Resolve the per-call opt-in/opt-out against the temperature default."""
+    if not settings.LLM_CACHE_ENABLED:
+        return False
+    if cache is not None:
+        return cache
+    return temperature <= settings.LLM_CACHE_MAX_TEMPERATURE
+
+
+class LLMCache:
+    """LRU + TTL memory tier in front of an optional shared DB tier."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, db_enabled: bool = False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_enabled = db_enabled
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self.stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "db_errors": 0,
+        }
+
+    # ---------------- memory tier ----------------
+
+    def _get_memory(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    # ---------------- DB tier ----------------
+
+    def _get_db(self, key: str) -> Any:
+        from app.db.session import SessionLocal
+        from app.models.llm_cache import LLMCacheEntry
+
+        db = SessionLocal()
+        try:
+            row = db.get(LLMCacheEntry, key)
+            if row is None:
+                return None
+            expires_at = row.expires_at
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at < datetime.now(timezone.utc):
+                return None
+            return json.loads(row.response)
+        finally:
+            db.close()
+
+    def _set_db(self, key: str, value: Any, ttl: int, provider: str, model: str) -> None:
+        from app.db.session import SessionLocal
+        from app.models.llm_cache import LLMCacheEntry
+
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            db.merge(LLMCacheEntry(
+                cache_key=key,
+                provider=provider,
+                model=model,
+                response=json.dumps(value, ensure_ascii=False),
+                created_at=now,
+                expires_at=now + timedelta(seconds=ttl),
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    # ---------------- public API ----------------
+
+    async def get(self, key: str) -> Any:
+        """Return the cached value or None. Checks memory, then the DB tier."""
+        value = self._get_memory(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+
+        if self.db_enabled:
+            try:
+                value = await asyncio.to_thread(self._get_db, key)
+            except Exception as e:
+                self.stats["db_errors"] += 1
+                logger.warning("LLM cache DB read failed: %s", e)
+                value = None
+            if value is not None:
+                self.stats["db_hits"] += 1
+                self._set_memory(key, value, self.ttl_seconds)
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        provider: str = "",
+        model: str = "",
+        ttl: Optional[int] = None,
+    ) -> None:
+        ttl = ttl or self.ttl_seconds
+        self._set_memory(key, value, ttl)
+        self.stats["stores"] += 1
+
+        if self.db_enabled:
+            try:
+                await asyncio.to_thread(self._set_db, key, value, ttl, provider, model)
+            except Exception as e:
+                self.stats["db_errors"] += 1
+                logger.warning("LLM cache DB write failed: %s", e)
+
+    def clear(self) -> None:
+        """Drop the memory tier and reset counters (DB rows expire on their own)."""
+        self._entries.clear()
+        for k in self.stats:
+            self.stats[k] = 0
+
+    def snapshot(self) -> dict:
+        """Counters + size for the metrics endpoint."""
+        lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["db_hits"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "db_enabled": self.db_enabled,
+        }
+
+
+# Process-wide instance used by ai_client
+llm_cache = LLMCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    db_enabled=settings.LLM_CACHE_DB_ENABLED,
+)
@@ -1,13 +1,11 @@
 # app/core/openai_client.py
-from openai import AsyncOpenAI
 from typing import AsyncGenerator, Dict, Any
 import logging
+from app.core.ai_registry import get_openai_client
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-
 SYSTEM_PROMPT = getattr(settings, "AI_SYSTEM_PROMPT", "You are EduAI, a friendly AI mentor who explains concepts simply.")
 DEFAULT_MODEL = getattr(settings, "OPENAI_MODEL", "gpt-4o-mini")
 
@@ -20,7 +18,7 @@ async def ask_ai(prompt: str, temperature: float = 0.7, max_tokens: int = 300, m
         return "Please provide a valid question."
 
     try:
-        resp = await client.chat.completions.create(
+        resp = await get_openai_client().chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
@@ -42,7 +40,7 @@ async def stream_ai(messages: list, model: str = DEFAULT_MODEL, temperature: flo
     The frontend can consume these and render them as a typing effect.
     """
     try:
-        stream = await client.chat.completions.create(
+        stream = await get_openai_client().chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
@@ -0,0 +1,332 @@
+# backend/app/core/sse.py
+"""
+Shared Server-Sent Events engine for the tutor streaming endpoints.
+
+A provider stream yields many tiny deltas (often a few characters each).
+Sending each one as its own frame costs a JSON encode, a generator yield and
+a socket write per delta, and the old generators also awaited
+request.is_disconnected() per delta. This module instead:
+
+  - coalesces consecutive deltas into one frame per SSE_COALESCE_MS window
+    (or as soon as SSE_COALESCE_BYTES are buffered). The first delta is sent
+    immediately so time-to-first-token is unchanged;
+  - encodes frames with orjson when it is installed (stdlib json otherwise)
+    and yields bytes, so Starlette does not re-encode them;
+  - checks for client disconnects in a separate watcher task polling every
+    SSE_DISCONNECT_POLL_MS, so the hot loop only reads a flag. A disconnect
+    aborts the upstream generation at once (`abort=watcher.gone`) instead of
+    waiting for the next chunk to arrive.
+
+The upstream generator is consumed by a single producer task, so its
+contextvars (ai_metrics call sample, endpoint label) stay in one context.
+Counters are exposed through `sse_stats.snapshot()` (GET /api/ai/streams).
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from starlette.requests import Request
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:   # optional speed-up
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",   # Disable nginx/Render proxy buffering
+    "Connection": "keep-alive",
+}
+
+_END = object()
+_ABORT = object()
+
+
+# ============================================================
+#                        ENCODING
+# ============================================================
+
+def encode_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def frame(obj: Any, event_id: Optional[int] = None) -> bytes:
+    """One `data:` SSE frame (with an `id:` line if given), counted in sse_stats."""
+    data = b"data: " + encode_json(obj) + b"\n\n"
+    if event_id is not None:
+        data = b"id: %d\n" % event_id + data
+    sse_stats.frames += 1
+    sse_stats.bytes += len(data)
+    return data
+
+
+# ============================================================
+#                        COUNTERS
+# ============================================================
+
+class SSEStats:
+    def __init__(self):
+        self.streams = 0
+        self.active = 0
+        self.deltas_in = 0
+        self.frames = 0
+        self.bytes = 0
+        self.disconnects = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "streams": self.streams,
+            "active": self.active,
+            "deltas_in": self.deltas_in,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "disconnects": self.disconnects,
+            "deltas_per_frame": round(self.deltas_in / self.frames, 2) if self.frames else None,
+            "encoder": "orjson" if orjson is not None else "json",
+        }
+
+
+sse_stats = SSEStats()
+
+
+# ============================================================
+#                   DISCONNECT WATCHER
+# ============================================================
+
+class DisconnectWatcher:
+    """
+    Polls request.is_disconnected() off the hot path; read `.disconnected`,
+    await `.gone`, or pass `on_disconnect` to be called once.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        poll_ms: Optional[int] = None,
+        on_disconnect: Optional[Callable[[], None]] = None,
+    ):
+        self.request = request
+        self.on_disconnect = on_disconnect
+        self.poll = (poll_ms if poll_ms is not None else settings.SSE_DISCONNECT_POLL_MS) / 1000
+        self.disconnected = False
+        self.gone = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _watch(self) -> None:
+        while True:
+            if await self.request.is_disconnected():
+                self.disconnected = True
+                self.gone.set()
+                if self.on_disconnect is not None:
+                    self.on_disconnect()
+                return
+            await asyncio.sleep(self.poll)
+
+    async def __aenter__(self) -> "DisconnectWatcher":
+        self._task = asyncio.create_task(self._watch())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+# ============================================================
+#                        COALESCING
+# ============================================================
+
+def _merged(parts: List[str]) -> Dict[str, str]:
+    return {"type": "delta", "text": "".join(parts)}
+
+
+async def coalesce(
+    events: AsyncIterator[dict],
+    window_ms: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    abort: Optional[asyncio.Event] = None,
+) -> AsyncIterator[dict]:
+    """
+    Re-yield stream_ai events with runs of "delta" events merged. Non-delta
+    events flush pending text first, so ordering is preserved. Setting
+    `abort` ends the stream and cancels the upstream generator immediately.
+    """
+    window = (window_ms if window_ms is not None else settings.SSE_COALESCE_MS) / 1000
+    limit = max_bytes if max_bytes is not None else settings.SSE_COALESCE_BYTES
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def _produce() -> None:
+        try:
+            async for evt in events:
+                queue.put_nowait(evt)
+        except Exception as e:
+            queue.put_nowait(e)
+        queue.put_nowait(_END)
+
+    async def _abort() -> None:
+        await abort.wait()
+        queue.put_nowait(_ABORT)
+
+    producer = asyncio.create_task(_produce())
+    aborter = asyncio.create_task(_abort()) if abort is not None else None
+    loop = asyncio.get_running_loop()
+    buf: List[str] = []
+    size = 0
+    deadline = 0.0
+    sent_first = False
+    try:
+        while True:
+            if buf:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield _merged(buf)
+                    buf, size = [], 0
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is _END:
+                break
+            if item is _ABORT:
+                return
+            if isinstance(item, Exception):
+                if buf:
+                    yield _merged(buf)
+                    buf, size = [], 0
+                raise item
+
+            if item.get("type") == "delta":
+                sse_stats.deltas_in += 1
+                text = item.get("text", "")
+                if not sent_first or window <= 0:
+                    sent_first = True
+                    yield {"type": "delta", "text": text}
+                    continue
+                if not buf:
+                    deadline = loop.time() + window
+                buf.append(text)
+                size += len(text)
+                if size >= limit:
+                    yield _merged(buf)
+                    buf, size = [], 0
+                continue
+
+            if buf:
+                yield _merged(buf)
+                buf, size = [], 0
+            yield item
+
+        if buf:
+            yield _merged(buf)
+    finally:
+        if aborter is not None:
+            aborter.cancel()
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+# ============================================================
+#                    TUTOR REPLY STREAM
+# ============================================================
+
+async def _finish(on_finish: Callable[[str], Any], text: str) -> None:
+    result = on_finish(text)
+    if inspect.isawaitable(result):
+        # Shielded: a cancelled (abandoned) stream must still save its partial reply
+        await asyncio.shield(asyncio.ensure_future(result))
+
+
+async def reply_events(
+    events: AsyncIterator[dict],
+    *,
+    conv_id: int,
+    on_finish: Callable[[str], Any],
+    label: str = "tutor",
+    abort: Optional[asyncio.Event] = None,
+) -> AsyncIterator[dict]:
+    """
+    The tutor reply protocol, independent of any connection:
+
+      {"type":"conv","conversation_id":123}   ← sent first
+      {"type":"delta","text":"Hello"}          ← coalesced token chunks
+      {"type":"done","full_text":"Hello ..."}  ← final event
+      {"type":"error","message":"..."}         ← instead of "done" on failure
+
+    `on_finish(text)` persists the reply — the full one on "done", or the
+    partial text if the stream is abandoned or fails first. It may be a
+    coroutine function.
+    """
+    parts: List[str] = []
+    finished = False
+    try:
+        yield {"type": "conv", "conversation_id": conv_id}
+        async for evt in coalesce(events, abort=abort):
+            kind = evt.get("type")
+            if kind == "delta":
+                parts.append(evt.get("text", ""))
+                yield evt
+            elif kind == "done":
+                full_text = "".join(parts).strip()
+                finished = True
+                if full_text:
+                    await _finish(on_finish, full_text)
+                yield {"type": "done", "full_text": full_text}
+    except Exception as e:
+        logger.exception("%s stream error: %s", label, e)
+        yield {"type": "error", "message": "AI streaming error"}
+    finally:
+        if not finished:
+            partial = "".join(parts).strip()
+            if partial:
+                try:
+                    await _finish(on_finish, partial)
+                except Exception as e:
+                    logger.warning("Could not save partial reply for conv_id=%s: %s", conv_id, e)
+
+
+async def reply_stream(
+    request: Request,
+    events: AsyncIterator[dict],
+    *,
+    conv_id: int,
+    on_finish: Callable[[str], Any],
+    label: str = "tutor",
+) -> AsyncIterator[bytes]:
+    """reply_events() framed as an SSE body for `request`; a disconnect stops the generation."""
+    sse_stats.streams += 1
+    sse_stats.active += 1
+    try:
+        async with DisconnectWatcher(request) as watcher:
+            replies = reply_events(events, conv_id=conv_id, on_finish=on_finish, label=label, abort=watcher.gone)
+            try:
+                async for evt in replies:
+                    yield frame(evt)
+            finally:
+                await replies.aclose()
+            if watcher.disconnected:
+                sse_stats.disconnects += 1
+                logger.info("SSE client disconnected for %s conv_id=%s", label, conv_id)
+    except asyncio.CancelledError:
+        sse_stats.disconnects += 1
+        logger.info("SSE client disconnected for %s conv_id=%s", label, conv_id)
+        raise
+    finally:
+        sse_stats.active -= 1
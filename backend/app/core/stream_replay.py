@@ -0,0 +1,255 @@
+# backend/app/core/stream_replay.py
+"""
+Resumable tutor streams (Last-Event-ID).
+
+Without this, a dropped connection mid-answer leaves a partial reply and the
+student has to re-ask, paying for the whole generation again. Instead the
+generation runs in its own task and publishes every SSE event into a bounded
+per-conversation ring buffer (STREAM_REPLAY_EVENTS frames) with ids that only
+ever increase within a conversation: each stream starts above every id this
+worker has issued (seeded from the clock, so a restart doesn't reuse ids), so
+a Last-Event-ID can only ever match the answer it came from. A new turn in a
+conversation that is still generating cancels the old generation (its
+partial reply is saved) and closes it for its clients. Clients read from the
+buffer:
+
+  - a new request subscribes from the start;
+  - a reconnect carrying `Last-Event-ID: N` gets every buffered event after N
+    and then follows the live generation — or, if it has finished, just the
+    replay and the close. No new upstream call is made either way;
+  - if events after N have already been evicted from the ring, the client
+    gets one {"type":"reset","full_text":...} event with the text so far and
+    continues from there.
+
+Nobody pays for answers nobody reads: when the last client of a running
+stream disconnects, the generation gets STREAM_ABANDON_GRACE_MS to be
+resumed and is then cancelled, which closes the provider stream (the partial
+reply is still saved).
+
+Finished streams stay replayable for STREAM_REPLAY_TTL_S seconds. Buffers are
+per worker process: with several workers a reconnect must land on the same
+one (sticky routing), otherwise it gets 410 and should reload the
+conversation, where the reply is saved as usual.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+
+from app.core import sse
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayStream:
+    """One generation's events, ring-buffered as ready-to-send SSE frames."""
+
+    def __init__(self, conv_id: int, user_id, first_id: int, max_events: int):
+        self.conv_id = conv_id
+        self.user_id = user_id
+        # (event id, frame, reply chars sent before this event)
+        self.frames: Deque[Tuple[int, bytes, int]] = deque(maxlen=max_events)
+        self.next_id = first_id
+        self.first_id = first_id
+        self.text: List[str] = []
+        self.text_len = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self._abandon_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def last_id(self) -> int:
+        return self.next_id - 1
+
+    def publish(self, evt: dict) -> None:
+        if self.done:   # superseded by a newer turn; its task is being cancelled
+            return
+        self.frames.append((self.next_id, sse.frame(evt, event_id=self.next_id), self.text_len))
+        if evt.get("type") == "delta":
+            text = evt.get("text", "")
+            self.text.append(text)
+            self.text_len += len(text)
+        self.next_id += 1
+        self._wake()
+
+    def close(self) -> None:
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._wake()
+
+    def attach(self) -> None:
+        self.subscribers += 1
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+
+    def detach(self) -> None:
+        """Last client gone while still generating: cancel after the grace period."""
+        self.subscribers -= 1
+        if self.subscribers > 0 or self.done or self.task is None:
+            return
+        grace = settings.STREAM_ABANDON_GRACE_MS / 1000
+        if grace <= 0:
+            self._abandon()
+        else:
+            self._abandon_timer = asyncio.get_running_loop().call_later(grace, self._abandon)
+
+    def _abandon(self) -> None:
+        self._abandon_timer = None
+        if self.subscribers == 0 and not self.done and self.task is not None:
+            logger.info("Cancelling abandoned stream for conv_id=%s", self.conv_id)
+            self.task.cancel()
+
+    def wake(self) -> None:
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def covers(self, last_event_id: int) -> bool:
+        """True if `last_event_id` was issued by this stream."""
+        return self.first_id <= last_event_id <= self.last_id
+
+    async def follow(
+        self, after_id: Optional[int], stop: Optional[Callable[[], bool]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Buffered frames with id > after_id, then live ones until the stream
+        closes (or `stop()` is true when woken).
+        """
+        cursor = self.first_id - 1 if after_id is None else after_id
+        while True:
+            if stop is not None and stop():
+                return
+            changed = self._changed
+            if self.frames:
+                oldest, _, sent_before = self.frames[0]
+            else:
+                oldest, sent_before = self.next_id, self.text_len
+            if cursor + 1 < oldest:
+                # The client's position fell out of the ring: resync with the text so far
+                full_text = "".join(self.text)[:sent_before]
+                yield sse.frame({"type": "reset", "full_text": full_text}, event_id=oldest - 1)
+                cursor = oldest - 1
+            for event_id, data, _ in list(self.frames):
+                if event_id > cursor:
+                    cursor = event_id
+                    yield data
+            if self.done and cursor >= self.last_id:
+                return
+            await changed.wait()
+
+
+class StreamHub:
+    def __init__(self):
+        self._streams: Dict[int, ReplayStream] = {}
+        # Highest id issued by streams no longer in _streams; new streams start above it
+        self._retired_id = time.time_ns() // 1000
+
+    def get(self, conv_id: int) -> Optional[ReplayStream]:
+        self._prune()
+        return self._streams.get(conv_id)
+
+    def start(self, conv_id: int, user_id, events: AsyncIterator[dict]) -> ReplayStream:
+        """
+        Run `events` (reply_events output) in a task that fills a new replay
+        buffer. A reply still generating in this conversation is cancelled.
+        """
+        self._prune()
+        previous = self._streams.pop(conv_id, None)
+        if previous is not None:
+            if not previous.done:
+                logger.info("New turn supersedes running stream for conv_id=%s", conv_id)
+                previous.close()
+                previous.task.cancel()
+            self._retire(previous)
+        issued = max((s.last_id for s in self._streams.values()), default=0)
+        stream = ReplayStream(
+            conv_id,
+            user_id,
+            first_id=max(issued, self._retired_id) + 1,
+            max_events=settings.STREAM_REPLAY_EVENTS,
+        )
+        self._streams[conv_id] = stream
+
+        async def _pump() -> None:
+            try:
+                async for evt in events:
+                    stream.publish(evt)
+            except asyncio.CancelledError:
+                logger.info("Replay stream cancelled for conv_id=%s", conv_id)
+            except Exception as e:
+                logger.exception("Replay stream failed for conv_id=%s: %s", conv_id, e)
+            finally:
+                stream.close()
+
+        stream.task = asyncio.create_task(_pump())
+        return stream
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        ttl = settings.STREAM_REPLAY_TTL_S
+        for conv_id, stream in list(self._streams.items()):
+            if stream.done and now - stream.finished_at > ttl:
+                self._retire(self._streams.pop(conv_id))
+        overflow = len(self._streams) - settings.STREAM_REPLAY_MAX_STREAMS
+        if overflow > 0:
+            finished = sorted(
+                (s for s in self._streams.values() if s.done), key=lambda s: s.finished_at
+            )
+            for stream in finished[:overflow]:
+                self._retire(self._streams.pop(stream.conv_id))
+
+    def _retire(self, stream: ReplayStream) -> None:
+        self._retired_id = max(self._retired_id, stream.last_id)
+
+    def snapshot(self) -> Dict[str, int]:
+        self._prune()
+        live = sum(1 for s in self._streams.values() if not s.done)
+        return {"buffered_streams": len(self._streams), "live_streams": live}
+
+
+def parse_last_event_id(request: Request) -> Optional[int]:
+    raw = request.headers.get("last-event-id")
+    if raw is None:
+        return None
+    try:
+        return int(raw.strip())
+    except ValueError:
+        return None
+
+
+async def subscribe(request: Request, stream: ReplayStream, after_id: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    SSE body for one client of `stream`. Leaving detaches the client; the
+    generation is cancelled if no one re-attaches within the grace period.
+    """
+    sse.sse_stats.streams += 1
+    sse.sse_stats.active += 1
+    stream.attach()
+    watcher = sse.DisconnectWatcher(request, on_disconnect=stream.wake)
+    frames = stream.follow(after_id, stop=lambda: watcher.disconnected)
+    try:
+        async with watcher:
+            async for data in frames:
+                yield data
+        if watcher.disconnected:
+            sse.sse_stats.disconnects += 1
+            logger.info("SSE client detached from conv_id=%s", stream.conv_id)
+    finally:
+        sse.sse_stats.active -= 1
+        await frames.aclose()
+        stream.detach()
+
+
+# Process-wide instance used by routes_ai
+stream_hub = StreamHub()
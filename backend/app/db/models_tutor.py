@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import DDL, Column, Integer, String, Text, ForeignKey, DateTime, Index, LargeBinary, event
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 
@@ -13,8 +13,35 @@ class Conversation(Base):
     topic = Column(String, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    # Rolling summary of turns that no longer fit the context window
+    # (see tutor_service.refresh_summary). summary_upto_id = last folded message.
+    summary = Column(Text, nullable=True)
+    summary_upto_id = Column(Integer, nullable=True)
+    summary_updated_at = Column(DateTime, nullable=True)
+
+    # Sidebar listing, maintained whenever messages are inserted
+    # (tutor_writer.record_conversation_activity) — no per-request aggregation.
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    preview = Column(String, nullable=True)            # first user message, truncated
+    last_message_at = Column(DateTime, nullable=True)
+
+    # Set while the messages live in tutor_conversation_archives
+    # (tutor_archive.compact_idle_conversations); cleared on rehydration.
+    archived_at = Column(DateTime, nullable=True)
+
     messages = relationship("TutorMessage", back_populates="conversation", cascade="all, delete")
 
+    __table_args__ = (
+        Index("idx_tutor_conversations_user_recent", "user_id", last_message_at.desc()),
+        # Compaction candidates: live conversations by idleness
+        Index(
+            "idx_tutor_conversations_live_idle",
+            last_message_at,
+            postgresql_where=archived_at.is_(None),
+            sqlite_where=archived_at.is_(None),
+        ),
+    )
+
 
 class TutorMessage(Base):
     __tablename__ = "tutor_messages"
@@ -24,9 +51,97 @@ class TutorMessage(Base):
     role = Column(String, nullable=False)     # "user" or "assistant"
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Assigned when tutor_writer buffers the row, so a read racing its flush
+    # can tell it from an identical message (NULL for direct inserts)
+    write_id = Column(String(32), nullable=True)
 
     conversation = relationship("Conversation", back_populates="messages")
 
+    # Serves every history read: WHERE conversation_id = ? ORDER BY id [DESC] LIMIT n.
+    # Ids must never be reused (SQLite would, after cold storage empties the
+    # tail of the table): archived messages come back with their original ids.
+    __table_args__ = (
+        Index("idx_tutor_messages_conv_id", "conversation_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+# Full-text search index over message content (see app/services/tutor_search.py).
+# Postgres: a generated tsvector column + GIN index (migration 013). SQLite
+# (tests, local dev): an external-content FTS5 table kept in step by triggers.
+# Neither is mapped on the model; both are maintained by the database on insert.
+for _ddl in (
+    "ALTER TABLE tutor_messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_tutor_messages_search ON tutor_messages USING GIN (search_vector)",
+):
+    event.listen(TutorMessage.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+
+for _ddl in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tutor_messages_fts USING fts5("
+    "content, content='tutor_messages', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS tutor_messages_fts_ai AFTER INSERT ON tutor_messages BEGIN "
+    "INSERT INTO tutor_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS tutor_messages_fts_ad AFTER DELETE ON tutor_messages BEGIN "
+    "INSERT INTO tutor_messages_fts(tutor_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS tutor_messages_fts_au AFTER UPDATE OF content ON tutor_messages BEGIN "
+    "INSERT INTO tutor_messages_fts(tutor_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO tutor_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+):
+    event.listen(TutorMessage.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(
+    TutorMessage.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS tutor_messages_fts").execute_if(dialect="sqlite"),
+)
+
+
+class ConversationArchive(Base):
+    """All messages of an idle conversation, as one compressed JSON blob."""
+    __tablename__ = "tutor_conversation_archives"
+
+    conversation_id = Column(
+        Integer, ForeignKey("tutor_conversations.id", ondelete="CASCADE"), primary_key=True
+    )
+    codec = Column(String, nullable=False)            # "zstd" or "zlib"
+    message_count = Column(Integer, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)       # uncompressed JSON size
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Message contents, uncompressed, so search still finds the conversation
+    # (indexed like tutor_messages.content, see below)
+    search_text = Column(Text, nullable=True)
+
+
+# Search index over archived conversations, mirroring the one on tutor_messages
+for _ddl in (
+    "ALTER TABLE tutor_conversation_archives ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(search_text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_tutor_conversation_archives_search "
+    "ON tutor_conversation_archives USING GIN (search_vector)",
+):
+    event.listen(ConversationArchive.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+
+for _ddl in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tutor_conversation_archives_fts USING fts5("
+    "search_text, content='tutor_conversation_archives', content_rowid='conversation_id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS tutor_conversation_archives_fts_ai "
+    "AFTER INSERT ON tutor_conversation_archives BEGIN "
+    "INSERT INTO tutor_conversation_archives_fts(rowid, search_text) "
+    "VALUES (new.conversation_id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS tutor_conversation_archives_fts_ad "
+    "AFTER DELETE ON tutor_conversation_archives BEGIN "
+    "INSERT INTO tutor_conversation_archives_fts(tutor_conversation_archives_fts, rowid, search_text) "
+    "VALUES ('delete', old.conversation_id, old.search_text); END",
+):
+    event.listen(ConversationArchive.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(
+    ConversationArchive.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS tutor_conversation_archives_fts").execute_if(dialect="sqlite"),
+)
+
 
 class Roadmap(Base):
     __tablename__ = "tutor_roadmaps"
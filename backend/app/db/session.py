@@ -3,9 +3,19 @@ Single source of truth for database engine, session, and dependency injection.
 
 All routes should import `get_db` from this module:
     from app.db.session import get_db
+
+`async def` route handlers use the async engine instead, so DB round-trips
+don't block the event loop:
+    from app.db.session import get_async_db
+It runs over asyncpg for Postgres and aiosqlite for SQLite, and is created on
+first use so sync-only scripts never need those drivers installed.
 """
 
+from typing import AsyncIterator, Callable, Optional
+from urllib.parse import parse_qsl, urlencode
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 from app.db.base_class import Base  # noqa: F401 – re-exported for Alembic
@@ -13,14 +23,15 @@ from app.db.base_class import Base  # noqa: F401 – re-exported for Alembic
 DATABASE_URL = settings.DATABASE_URL
 
 # Connection pool tuning for 2000+ concurrent users.
-# pool_size=20 base + max_overflow=30 = 50 connections per worker.
+# DB_POOL_SIZE=20 base + DB_MAX_OVERFLOW=30 = 50 connections per worker,
+# shared with the async engine below (which takes 8 + 12 of them by default).
 # With 4 Gunicorn workers → up to 200 total DB connections.
 # pool_recycle=1800 prevents stale connections (30-min recycle).
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=20,
-    max_overflow=30,
+    pool_size=max(1, settings.DB_POOL_SIZE - settings.DB_ASYNC_POOL_SIZE),
+    max_overflow=max(0, settings.DB_MAX_OVERFLOW - settings.DB_ASYNC_MAX_OVERFLOW),
     pool_timeout=30,
     pool_recycle=1800,
 )
@@ -39,3 +50,88 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ============================================================
+#                     ASYNC ENGINE
+# ============================================================
+
+_ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL rewritten for the async driver (asyncpg / aiosqlite)."""
+    scheme, sep, rest = url.partition("://")
+    scheme = _ASYNC_DRIVERS.get(scheme, scheme)
+    base, qmark, query = rest.partition("?")
+    if scheme == "postgresql+asyncpg" and query:
+        # libpq's sslmode=... is spelled ssl=... for asyncpg
+        query = urlencode([("ssl" if k == "sslmode" else k, v) for k, v in parse_qsl(query)])
+    return scheme + sep + base + qmark + query
+
+
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        # Its share of the per-worker connection budget (see `engine` above)
+        url = async_database_url(DATABASE_URL)
+        connect_args = {}
+        if url.startswith("postgresql+asyncpg"):
+            # SQLAlchemy's and asyncpg's own statement caches
+            connect_args = {
+                "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            }
+        _async_engine = create_async_engine(
+            url,
+            pool_pre_ping=True,
+            pool_size=settings.DB_ASYNC_POOL_SIZE,
+            max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+            pool_timeout=30,
+            pool_recycle=1800,
+            connect_args=connect_args,
+        )
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,   # no implicit (blocking) lazy loads after commit
+        )
+    return _async_sessionmaker()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency that yields an AsyncSession (for `async def` handlers)."""
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def get_async_sessionmaker() -> Callable[[], AsyncSession]:
+    """
+    FastAPI dependency for work that outlives the request (e.g. saving a
+    streamed reply): each call of the returned factory opens a new session.
+    """
+    return AsyncSessionLocal
+
+
+async def dispose_async_engine() -> None:
+    if _async_engine is not None:
+        await _async_engine.dispose()
@@ -71,6 +71,11 @@ def check_schema():
         ("playground_settings", "SELECT 1 FROM playground_settings LIMIT 1"),
         ("progress.solved", "SELECT solved FROM progress LIMIT 1"),
         ("tutor_conversations", "SELECT 1 FROM tutor_conversations LIMIT 1"),
+        ("tutor_conversations.summary", "SELECT summary FROM tutor_conversations LIMIT 1"),
+        ("tutor_conversations.message_count", "SELECT message_count FROM tutor_conversations LIMIT 1"),
+        ("tutor_conversation_archives", "SELECT 1 FROM tutor_conversation_archives LIMIT 1"),
+        ("catalog_versions", "SELECT 1 FROM catalog_versions LIMIT 1"),
+        ("user_solved_bitmaps", "SELECT 1 FROM user_solved_bitmaps LIMIT 1"),
     ]
     with engine.connect() as conn:
         for name, sql in checks:
@@ -84,6 +89,11 @@ def check_schema():
         index_statements = [
             "CREATE INDEX IF NOT EXISTS idx_tutor_conversations_user_id ON tutor_conversations(user_id)",
             "CREATE INDEX IF NOT EXISTS idx_tutor_messages_conversation_id ON tutor_messages(conversation_id)",
+            "CREATE INDEX IF NOT EXISTS idx_tutor_messages_conv_id ON tutor_messages(conversation_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_tutor_conversations_user_recent "
+            "ON tutor_conversations(user_id, last_message_at DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_tutor_conversations_live_idle "
+            "ON tutor_conversations(last_message_at) WHERE archived_at IS NULL",
         ]
         for idx_sql in index_statements:
             try:
@@ -92,6 +102,51 @@ def check_schema():
             except Exception as e:
                 logger.warning("Index creation skipped: %s", e)
 
+
+_compaction_task = None
+
+
+@app.on_event("startup")
+async def start_tutor_compaction():
+    """Move idle tutor conversations to cold storage in the background."""
+    global _compaction_task
+    import asyncio
+    from app.services.tutor_archive import run_compaction_loop
+
+    if settings.TUTOR_ARCHIVE_INTERVAL_S > 0:
+        _compaction_task = asyncio.create_task(run_compaction_loop())
+
+
+@app.on_event("shutdown")
+async def stop_tutor_compaction():
+    if _compaction_task is not None:
+        _compaction_task.cancel()
+
+
+@app.on_event("shutdown")
+async def close_ai_clients():
+    """Release pooled provider connections held by the AI registry."""
+    from app.core import ai_registry
+
+    await ai_registry.aclose()
+
+
+@app.on_event("shutdown")
+async def flush_tutor_writes():
+    """Persist tutor messages still waiting in the write-behind buffer."""
+    from app.services.tutor_writer import tutor_writer
+
+    await tutor_writer.aclose()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    """Close the async engine's pooled connections (after the flush above)."""
+    from app.db.session import dispose_async_engine
+
+    await dispose_async_engine()
+
+
 # ============================================================
 # CORS CONFIGURATION
 # ============================================================
@@ -191,6 +246,14 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(SecurityHeadersMiddleware)
 
+
+# ============================================================
+# AI TELEMETRY — lets ai_metrics attribute LLM calls to routes
+# ============================================================
+from app.core.ai_metrics import AIEndpointMiddleware
+
+app.add_middleware(AIEndpointMiddleware)
+
 # ============================================================
 # API ROUTERS
 # ============================================================
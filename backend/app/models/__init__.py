@@ -8,3 +8,6 @@ from app.models.otp_code import OTPCode  # noqa: F401
 from app.models.roadmap import Roadmap  # noqa: F401
 from app.models.leetcode_sync import LeetCodeSync  # noqa: F401
 from app.models.playground_settings import PlaygroundSettings  # noqa: F401
+from app.models.llm_cache import LLMCacheEntry  # noqa: F401
+from app.models.catalog_version import CatalogVersion  # noqa: F401
+from app.models.solved_bitmap import UserSolvedBitmap  # noqa: F401
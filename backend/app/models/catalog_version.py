@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from datetime import datetime, timezone
+
+from app.db.base_class import Base
+
+
+class CatalogVersion(Base):
+    """
+    Change counter per cached catalog (e.g. "problems"), bumped in the same
+    transaction as every write. See app/services/problem_catalog.py.
+    """
+
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
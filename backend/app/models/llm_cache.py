@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Text, DateTime
+from datetime import datetime, timezone
+
+from app.db.base_class import Base
+
+
+class LLMCacheEntry(Base):
+    """Shared (cross-worker) tier of the LLM response cache. See app/core/llm_cache.py."""
+
+    __tablename__ = "llm_response_cache"
+
+    cache_key = Column(String(64), primary_key=True)   # sha256 hex
+    provider = Column(String, nullable=True)
+    model = Column(String, nullable=True)
+    response = Column(Text, nullable=False)             # JSON-encoded str or dict
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime, nullable=False, index=True)
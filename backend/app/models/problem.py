@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, JSON
+from sqlalchemy import DDL, Column, Integer, String, Text, Float, JSON, event
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -36,3 +36,38 @@ class Problem(Base):
         back_populates="problem",
         cascade="all, delete-orphan",
     )
+
+
+# Search indexes (see app/services/problem_search.py), maintained by the
+# database on every write. Postgres: weighted tsvector (title A, description B)
+# + GIN, and a trigram index on title for typo tolerance (migration 015).
+# SQLite (tests, local dev): an external-content FTS5 table kept by triggers.
+for _ddl in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE problems ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_problems_search ON problems USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS idx_problems_title_trgm ON problems USING GIN (title gin_trgm_ops)",
+):
+    event.listen(Problem.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+
+for _ddl in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS problems_fts USING fts5("
+    "title, description, content='problems', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS problems_fts_ai AFTER INSERT ON problems BEGIN "
+    "INSERT INTO problems_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS problems_fts_ad AFTER DELETE ON problems BEGIN "
+    "INSERT INTO problems_fts(problems_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS problems_fts_au AFTER UPDATE OF title, description ON problems BEGIN "
+    "INSERT INTO problems_fts(problems_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO problems_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+):
+    event.listen(Problem.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(
+    Problem.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS problems_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, LargeBinary
+from datetime import datetime, timezone
+
+from app.db.base_class import Base
+
+
+class UserSolvedBitmap(Base):
+    """
+    A user's solved problem ids as a little-endian bitmap (bit i = problem i),
+    with a version bumped on every change. See app/services/solved_index.py.
+    """
+
+    __tablename__ = "user_solved_bitmaps"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+    bitmap = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -58,3 +58,5 @@ class ProblemListResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    # Opaque; pass back as ?cursor= for the next page (None on the last page)
+    next_cursor: Optional[str] = None
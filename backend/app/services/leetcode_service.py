@@ -1,11 +1,13 @@
 # backend/app/services/leetcode_service.py
 import httpx
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
 
 from app.models.leetcode_sync import LeetCodeSync
 from app.models.problem import Problem
 from app.models.progress import Progress
+from app.services.solved_index import mark_solved
 
 LEETCODE_GRAPHQL = "https://leetcode.com/graphql"
 
@@ -36,15 +38,16 @@ query recentAcSubmissions($username: String!) {
 """
 
 
-async def sync_leetcode(db: Session, user_id: int, username: str):
+async def sync_leetcode(db: AsyncSession, user_id: int, username: str):
     sync = LeetCodeSync(
         user_id=user_id,
         sync_status="pending",
         sync_started_at=datetime.now(timezone.utc),
     )
     db.add(sync)
-    db.commit()
-    db.refresh(sync)
+    await db.commit()
+    # Don't hold a pooled connection while waiting on LeetCode
+    await db.close()
 
     try:
         async with httpx.AsyncClient(timeout=20) as client:
@@ -70,21 +73,25 @@ async def sync_leetcode(db: Session, user_id: int, username: str):
         }
 
         problems = (
-            db.query(Problem)
-            .filter(Problem.leetcode_slug.in_(solved_slugs))
-            .all()
-        )
+            await db.scalars(select(Problem).where(Problem.leetcode_slug.in_(solved_slugs)))
+        ).all()
+
+        # One query for all existing progress rows instead of one per problem
+        existing = {
+            p.problem_id: p
+            for p in (
+                await db.scalars(
+                    select(Progress).where(
+                        Progress.user_id == user_id,
+                        Progress.problem_id.in_([problem.id for problem in problems]),
+                    )
+                )
+            ).all()
+        }
 
         solved_count = 0
         for problem in problems:
-            progress = (
-                db.query(Progress)
-                .filter(
-                    Progress.user_id == user_id,
-                    Progress.problem_id == problem.id,
-                )
-                .first()
-            )
+            progress = existing.get(problem.id)
 
             if not progress:
                 progress = Progress(
@@ -100,11 +107,14 @@ async def sync_leetcode(db: Session, user_id: int, username: str):
 
             solved_count += 1
 
+        if problems:
+            await db.run_sync(mark_solved, user_id, [problem.id for problem in problems])
+
         sync.sync_status = "success"
         sync.problems_synced = solved_count
         sync.sync_completed_at = datetime.now(timezone.utc)
 
-        db.commit()
+        await db.commit()
 
         return {
             "status": "success",
@@ -115,5 +125,5 @@ async def sync_leetcode(db: Session, user_id: int, username: str):
     except Exception as e:
         sync.sync_status = "failed"
         sync.error_message = str(e)
-        db.commit()
+        await db.commit()
         raise
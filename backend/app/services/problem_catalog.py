@@ -0,0 +1,409 @@
+# backend/app/services/problem_catalog.py
+"""
+Per-worker, immutable snapshot of the problem catalog.
+
+The `problems` table only changes when an admin creates/updates/deletes a
+problem or scripts/import_leetcode_problemset.py runs, yet every Practice page
+request used to filter, count and paginate it in Postgres. Instead each
+worker keeps a CatalogSnapshot:
+
+  - compact column arrays (array module) for id, difficulty, category and
+    tags, with difficulty/category/tag names interned once;
+  - precomputed id lists per difficulty and per category, plus totals;
+  - the list payload of every problem.
+
+Listing, counting, filtering, pagination, /categories, /stats totals and
+/random run against the snapshot with zero catalog queries; the user's
+solved set is a cached bitmap (app/services/solved_index.py). Text search is
+ranked by the database's search index (app/services/problem_search.py) and
+then filtered here.
+
+Pagination (page_ids): id lists per (difficulty, category) combination are
+built once per snapshot, so totals are a len() and a cursor (`after_id`) is
+a bisect — deep pages and infinite scroll cost the same as page one. The
+solved/unsolved status is applied by skipping the user's solved ids rather
+than rebuilding the filtered list.
+
+Random picks (random_id): a uniform index into the precomputed id array of
+the filter, redrawn while it lands on a solved id; after a few misses (a
+user who solved most of the filter) the k-th unsolved id is located by
+stepping over the solved ones. No list of candidates is ever built.
+
+Stats (problem_stats): catalog totals per difficulty live in the snapshot,
+so they are cached until the catalog version moves; the user's solved
+counts are ANDs against their cached solved bitmap. GET /problems/stats and
+GET /profile/stats both read from it.
+
+Bitmaps: the snapshot also keeps an int bitmap of ids (bit i = problem i)
+per difficulty, per category and per combination, matching the per-user
+solved bitmaps of app/services/solved_index.py. Solved counts and the
+solved ids inside a filter are then a single AND.
+
+Freshness: every catalog write calls bump_version() in its transaction,
+which increments catalog_versions['problems'] and drops this worker's
+snapshot at once. Other workers compare the counter at most every
+CATALOG_VERSION_CHECK_S seconds (one primary-key read) and reload when it
+moved. The check and reload run without a lock; a lock is taken only to swap
+the new snapshot in, so concurrent requests may each load once and the
+newest version wins.
+"""
+
+import logging
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Container, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.catalog_version import CatalogVersion
+from app.models.problem import Problem
+from app.services.solved_index import IdBitmap, bits_from_ids, solved_index
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAME = "problems"
+
+# Fields of the list payload (app.schemas.problem.Problem, minus `solved`)
+_LIST_FIELDS = ("id", "title", "description", "difficulty", "category", "acceptance", "likes", "tags", "hints")
+
+
+def _interned(values: Iterable[str], table: Dict[str, int], names: List[str]) -> List[int]:
+    codes = []
+    for value in values:
+        code = table.get(value)
+        if code is None:
+            code = table[value] = len(names)
+            names.append(value)
+        codes.append(code)
+    return codes
+
+
+class CatalogSnapshot:
+    """Read-only view of the catalog at one version. Positions are in id order."""
+
+    def __init__(self, version: int, problems: Sequence[Problem]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        self.ids = array("l", (p.id for p in problems))
+        self.pos: Dict[int, int] = {pid: i for i, pid in enumerate(self.ids)}
+
+        diff_table: Dict[str, int] = {}
+        self.difficulty_names: List[str] = []
+        self.difficulty = array("B", _interned(
+            ((p.difficulty or "").lower() for p in problems), diff_table, self.difficulty_names
+        ))
+
+        self._category_codes: Dict[str, int] = {"": 0}
+        self.category_names: List[str] = [""]
+        self.category = array("H", _interned(
+            (p.category or "" for p in problems), self._category_codes, self.category_names
+        ))
+
+        tag_table: Dict[str, int] = {}
+        self.tag_names: List[str] = []
+        self.tags: Tuple[array, ...] = tuple(
+            array("H", _interned(p.tags or (), tag_table, self.tag_names)) for p in problems
+        )
+
+        # Precomputed id lists and totals
+        self.by_difficulty: Dict[str, array] = {}
+        self.by_category: Dict[str, array] = {}
+        for i, pid in enumerate(self.ids):
+            self.by_difficulty.setdefault(self.difficulty_names[self.difficulty[i]], array("l")).append(pid)
+            category = self.category_names[self.category[i]]
+            if category:
+                self.by_category.setdefault(category, array("l")).append(pid)
+        self.difficulty_totals: Dict[str, int] = {d: len(ids) for d, ids in self.by_difficulty.items()}
+        self.categories: List[str] = sorted(self.by_category)
+        # (difficulty, category) -> ascending ids, filled on first use
+        self._combos: Dict[Tuple[str, str], array] = {}
+
+        # The same sets as bitmaps, for AND-ing with a user's solved bitmap
+        self.all_bits = bits_from_ids(self.ids)
+        self.difficulty_bits: Dict[str, int] = {d: bits_from_ids(ids) for d, ids in self.by_difficulty.items()}
+        self.category_bits: Dict[str, int] = {c: bits_from_ids(ids) for c, ids in self.by_category.items()}
+
+        self.rows: Tuple[dict, ...] = tuple(
+            {field: getattr(p, field) for field in _LIST_FIELDS} for p in problems
+        )
+        for row in self.rows:
+            row["tags"] = row["tags"] or []
+            row["hints"] = row["hints"] or []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def filter_ids(
+        self,
+        *,
+        difficulty: Optional[str] = None,
+        category: Optional[str] = None,
+        within: Optional[Sequence[int]] = None,
+    ) -> Sequence[int]:
+        """
+        Ids matching every given filter. Difficulty is case-insensitive.
+        Ascending, or in the order of `within` (e.g. ranked search hits) if given.
+        """
+        if difficulty is not None and category is not None:
+            key = (difficulty.lower(), category)
+            ids: Sequence[int] = self._combos.get(key)
+            if ids is None:
+                code = self._category_codes.get(category, -1)
+                ids = self._combos[key] = array("l", (
+                    pid for pid in self.by_difficulty.get(key[0], ()) if self.category[self.pos[pid]] == code
+                ))
+        elif difficulty is not None:
+            ids = self.by_difficulty.get(difficulty.lower(), ())
+        elif category is not None:
+            ids = self.by_category.get(category, ())
+        else:
+            ids = self.ids
+
+        if within is not None:
+            if difficulty is None and category is None:
+                return [pid for pid in within if pid in self.pos]
+            allowed = set(ids)
+            ids = [pid for pid in within if pid in allowed]
+        return ids
+
+    def filter_bits(self, *, difficulty: Optional[str] = None, category: Optional[str] = None) -> int:
+        """Bitmap of the ids filter_ids() returns for the same filters (without `within`)."""
+        if difficulty is not None:
+            bits = self.difficulty_bits.get(difficulty.lower(), 0)
+            if category is not None:
+                bits &= self.category_bits.get(category, 0)
+            return bits
+        if category is not None:
+            return self.category_bits.get(category, 0)
+        return self.all_bits
+
+    def row(self, problem_id: int) -> Optional[dict]:
+        i = self.pos.get(problem_id)
+        return self.rows[i] if i is not None else None
+
+    def difficulty_of(self, problem_id: int) -> Optional[str]:
+        i = self.pos.get(problem_id)
+        return self.difficulty_names[self.difficulty[i]] if i is not None else None
+
+
+# ============================================================
+#                  VERSIONED SNAPSHOT CACHE
+# ============================================================
+
+def current_version(db: Session) -> int:
+    version = db.query(CatalogVersion.version).filter(CatalogVersion.name == CATALOG_NAME).scalar()
+    return version or 0
+
+
+def bump_version(db: Session) -> None:
+    """
+    Mark the catalog changed, in the caller's transaction (caller commits).
+    Call on every write to `problems`. This worker's snapshot is dropped once
+    the transaction commits.
+    """
+    result = db.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.name == CATALOG_NAME)
+        .values(version=CatalogVersion.version + 1, updated_at=datetime.now(timezone.utc))
+    )
+    if result.rowcount == 0:
+        db.add(CatalogVersion(name=CATALOG_NAME, version=1))
+    event.listen(db, "after_commit", lambda _session: problem_catalog.invalidate(), once=True)
+
+
+class ProblemCatalog:
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        # Bumped by invalidate(), so a load that raced a catalog write is not kept
+        self._generation = 0
+        # Guards the swap only; never held across a query, which would stall
+        # every request of the worker behind one slow reload
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "version_checks": 0}
+
+    def _fresh(self) -> Optional[CatalogSnapshot]:
+        snap = self._snapshot
+        if snap is not None and time.monotonic() - self._checked_at < settings.CATALOG_VERSION_CHECK_S:
+            return snap
+        return None
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        """The current snapshot, reloading it if catalog_versions moved."""
+        snap = self._fresh()
+        if snap is not None:
+            return snap
+        generation = self._generation
+        # Version first: a write landing mid-load only causes one extra reload
+        version = current_version(db)
+        self.stats["version_checks"] += 1
+        snap = self._snapshot
+        if snap is None or snap.version != version:
+            started = time.perf_counter()
+            snap = CatalogSnapshot(version, db.query(Problem).order_by(Problem.id).all())
+            self.stats["loads"] += 1
+            logger.info(
+                "Loaded problem catalog v%s (%s problems) in %.1f ms",
+                version, len(snap), (time.perf_counter() - started) * 1000,
+            )
+        with self._lock:
+            if self._generation != generation:
+                return snap   # invalidated meanwhile: serve it to this caller, keep nothing
+            current = self._snapshot
+            if current is not None and current.version > snap.version:
+                return current   # a concurrent reload got a newer version
+            self._snapshot = snap
+            self._checked_at = time.monotonic()
+            return snap
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+
+# Process-wide instance used by routes_problems
+problem_catalog = ProblemCatalog()
+
+
+# ============================================================
+#                       PAGINATION
+# ============================================================
+
+def page_ids(
+    ids: Sequence[int],
+    solved: Container[int],
+    status: Optional[str],
+    limit: int,
+    *,
+    offset: int = 0,
+    after_id: Optional[int] = None,
+    id_ordered: bool = True,
+    ids_bits: Optional[int] = None,
+) -> Tuple[List[int], int, Optional[int]]:
+    """
+    One page of `ids` (from filter_ids) with the "solved"/"unsolved" status
+    applied, starting after `after_id` (cursor) or at `offset` (page mode).
+    Returns (page, total, last id if more follow). Cost is
+    O(limit + |solved| log n) whatever the depth. `id_ordered=False` for
+    ranked lists, where the cursor is located by scan. With `ids_bits`
+    (filter_bits() of the same filters) and an IdBitmap as `solved`, only
+    the solved ids inside the filter are visited.
+    Raises ValueError for a cursor id that is not in a ranked list.
+    """
+    if ids_bits is not None and isinstance(solved, IdBitmap):
+        solved_pos = [bisect_left(ids, pid) for pid in IdBitmap(solved.bits & ids_bits)]
+    elif id_ordered:
+        solved_pos = sorted(
+            i for i in (bisect_left(ids, pid) for pid in solved)
+            if i < len(ids) and ids[i] in solved
+        )
+    else:
+        solved_pos = [i for i, pid in enumerate(ids) if pid in solved]
+
+    if status == "solved":
+        ids = [ids[i] for i in solved_pos]
+        total = len(ids)
+    elif status == "unsolved":
+        total = len(ids) - len(solved_pos)
+    else:
+        total = len(ids)
+
+    if after_id is not None:
+        if id_ordered:
+            start = bisect_right(ids, after_id)
+        else:
+            start = list(ids).index(after_id) + 1
+    elif status == "unsolved":
+        # Index of the offset-th unsolved id: step over solved ids before it
+        start = offset
+        for i in solved_pos:
+            if i > start:
+                break
+            start += 1
+    else:
+        start = offset
+
+    page: List[int] = []
+    i = start
+    while i < len(ids) and len(page) <= limit:
+        if status != "unsolved" or ids[i] not in solved:
+            page.append(ids[i])
+        i += 1
+    more = len(page) > limit
+    page = page[:limit]
+    return page, total, (page[-1] if more and page else None)
+
+
+# ============================================================
+#                        SAMPLING
+# ============================================================
+
+# Redraws before falling back to counting (hit rate per draw = unsolved share)
+_SAMPLE_TRIES = 16
+
+
+def random_id(
+    ids: Sequence[int],
+    exclude: Optional[IdBitmap] = None,
+    ids_bits: Optional[int] = None,
+    rng: Optional[random.Random] = None,
+) -> Optional[int]:
+    """
+    A uniformly random id of `ids` (ascending, from filter_ids) not in
+    `exclude`, or None if there is none. `ids_bits` is filter_bits() of the
+    same filters, needed only when `exclude` is given.
+    """
+    randrange = (rng or random).randrange
+    if not ids:
+        return None
+    if exclude is None:
+        return ids[randrange(len(ids))]
+
+    for _ in range(_SAMPLE_TRIES):
+        pid = ids[randrange(len(ids))]
+        if pid not in exclude:
+            return pid
+
+    # Mostly solved: pick the k-th unsolved id, stepping over solved positions
+    excluded = IdBitmap(exclude.bits & ids_bits)
+    remaining = len(ids) - len(excluded)
+    if remaining <= 0:
+        return None
+    i = randrange(remaining)
+    for pid in excluded:
+        if bisect_left(ids, pid) > i:
+            break
+        i += 1
+    return ids[i]
+
+
+# ============================================================
+#                         STATS
+# ============================================================
+
+_STATS_DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def problem_stats(db: Session, user_id: int) -> Dict[str, int]:
+    """
+    Catalog totals and the user's solved counts, overall and per difficulty.
+    At most one primary-key read (snapshot or bitmap version check); usually none.
+    """
+    catalog = problem_catalog.get(db)
+    solved = solved_index.get(db, user_id)
+    stats = {
+        "total_problems": len(catalog),
+        "total_solved": solved.count_in(catalog.all_bits),
+    }
+    for difficulty in _STATS_DIFFICULTIES:
+        stats[f"{difficulty}_solved"] = solved.count_in(catalog.difficulty_bits.get(difficulty, 0))
+        stats[f"{difficulty}_total"] = catalog.difficulty_totals.get(difficulty, 0)
+    return stats
@@ -0,0 +1,106 @@
+# backend/app/services/problem_search.py
+"""
+Ranked search over the problem catalog (GET /api/problems?search=...).
+
+One indexed query returns the matching problem ids, best first; the
+remaining filters, status and pagination are applied to that list on the
+in-memory catalog snapshot (app/services/problem_catalog.py).
+
+  - Postgres: prefix-aware tsquery against problems.search_vector (title
+    weighted above description, GIN) OR title trigram similarity (pg_trgm,
+    GIN) for typos; ranked by ts_rank_cd + similarity(title).
+  - SQLite: the problems_fts FTS5 table, bm25 with title weighted 10:1.
+    Prefix matching works the same; typo tolerance is Postgres-only.
+
+The last word of the query is matched as a prefix, so search-as-you-type
+works. Ranked id lists are cached per (catalog version, query), so
+repeated keystrokes across users cost no query at all until the catalog
+changes.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Upper bound on ranked matches kept for one query
+MAX_RESULTS = 1000
+_CACHE_SIZE = 512
+
+_PG_SEARCH = text("""
+    SELECT id
+    FROM problems
+    WHERE search_vector @@ to_tsquery('english', :tsquery) OR title % :raw
+    ORDER BY ts_rank_cd(search_vector, to_tsquery('english', :tsquery)) * 2
+             + similarity(title, :raw) DESC,
+             id
+    LIMIT :limit
+""")
+
+_SQLITE_SEARCH = text("""
+    SELECT rowid AS id
+    FROM problems_fts
+    WHERE problems_fts MATCH :match
+    ORDER BY bm25(problems_fts, 10.0, 1.0), rowid
+    LIMIT :limit
+""")
+
+
+def _words(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())
+
+
+def _tsquery(words: List[str]) -> str:
+    """to_tsquery text: every word must match, the last one as a prefix."""
+    return " & ".join(words[:-1] + [words[-1] + ":*"])
+
+
+def _fts5_query(words: List[str]) -> str:
+    """FTS5 MATCH text: quoted words (operators stay literal), the last one as a prefix."""
+    return " ".join('"%s"' % w for w in words[:-1]) + (' "%s"*' % words[-1])
+
+
+class ProblemSearch:
+    def __init__(self):
+        self._cache: "OrderedDict[Tuple[int, str], Tuple[int, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "cache_hits": 0}
+
+    def search_ids(self, db: Session, q: str, catalog_version: int) -> Tuple[int, ...]:
+        """Matching problem ids, most relevant first."""
+        words = _words(q)
+        if not words:
+            return ()
+        key = (catalog_version, " ".join(words))
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return hit
+
+        if db.get_bind().dialect.name == "postgresql":
+            rows = db.execute(
+                _PG_SEARCH, {"tsquery": _tsquery(words), "raw": q.strip(), "limit": MAX_RESULTS}
+            )
+        else:
+            rows = db.execute(_SQLITE_SEARCH, {"match": _fts5_query(words), "limit": MAX_RESULTS})
+        ids = tuple(row[0] for row in rows)
+        self.stats["queries"] += 1
+
+        with self._lock:
+            self._cache[key] = ids
+            while len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return ids
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+# Process-wide instance used by routes_problems
+problem_search = ProblemSearch()
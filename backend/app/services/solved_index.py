@@ -0,0 +1,222 @@
+# backend/app/services/solved_index.py
+"""
+Per-user solved-problem bitmaps.
+
+The Practice list status filter, /stats, /random?unsolved_only and the
+dashboard all need "which problems has this user solved". Instead of reading
+the user's `progress` rows on every request, each user has a bitmap (bit i set
+= problem i solved) in user_solved_bitmaps, written in the same transaction
+as every solve via mark_solved() — practice completion
+(routes_progress.complete_problem) and leetcode_service.sync_leetcode.
+
+Each worker caches decoded bitmaps (LRU, SOLVED_INDEX_CACHE_USERS users).
+A cached entry is trusted for SOLVED_INDEX_CHECK_S seconds, then its version
+is compared with the stored one (one primary-key read); solves committed by
+this worker update the cache at once. Users without a row yet are built from
+`progress` on first read, so existing data needs no backfill.
+
+The catalog snapshot keeps the same kind of bitmap per difficulty and
+category (app/services/problem_catalog.py), so solved counts and "unsolved in
+category X" are an AND and a bit_count().
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.progress import Progress
+from app.models.solved_bitmap import UserSolvedBitmap
+
+
+# ============================================================
+#                         BITMAPS
+# ============================================================
+
+def bits_from_ids(ids: Iterable[int]) -> int:
+    """Non-negative ids as an int bitmap (bit i = id i)."""
+    buf = bytearray()
+    for pid in ids:
+        byte = pid >> 3
+        if byte >= len(buf):
+            buf.extend(bytes(byte + 1 - len(buf)))
+        buf[byte] |= 1 << (pid & 7)
+    return int.from_bytes(buf, "little")
+
+
+class IdBitmap:
+    """Immutable set of ids backed by an int bitmap: O(1) `in`, ascending iteration."""
+
+    __slots__ = ("bits", "_bytes")
+
+    def __init__(self, bits: int = 0):
+        self.bits = bits
+        self._bytes = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "IdBitmap":
+        return cls(bits_from_ids(ids))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "IdBitmap":
+        return cls(int.from_bytes(data, "little"))
+
+    def to_bytes(self) -> bytes:
+        return self._bytes
+
+    def __contains__(self, pid: int) -> bool:
+        byte = pid >> 3
+        return 0 <= byte < len(self._bytes) and bool(self._bytes[byte] >> (pid & 7) & 1)
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        for index, byte in enumerate(self._bytes):
+            if byte:
+                base = index << 3
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield base + bit
+
+    def count_in(self, mask: int) -> int:
+        """How many of these ids are also set in `mask`."""
+        return (self.bits & mask).bit_count()
+
+
+# ============================================================
+#                     WRITE PATH (SOLVES)
+# ============================================================
+
+def _solved_from_progress(db: Session, user_id: int) -> int:
+    rows = db.query(Progress.problem_id).filter(
+        Progress.user_id == user_id,
+        Progress.solved == True,  # noqa: E712
+    )
+    return bits_from_ids(row[0] for row in rows)
+
+
+def _locked_row(db: Session, user_id: int) -> UserSolvedBitmap:
+    """The user's bitmap row, locked for update; created from `progress` if missing."""
+    row = (
+        db.query(UserSolvedBitmap)
+        .filter(UserSolvedBitmap.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+    if row is not None:
+        return row
+    row = UserSolvedBitmap(
+        user_id=user_id,
+        version=1,
+        bitmap=IdBitmap(_solved_from_progress(db, user_id)).to_bytes(),
+    )
+    try:
+        with db.begin_nested():
+            db.add(row)
+    except IntegrityError:   # created concurrently: lock that one
+        row = (
+            db.query(UserSolvedBitmap)
+            .filter(UserSolvedBitmap.user_id == user_id)
+            .with_for_update()
+            .one()
+        )
+    return row
+
+
+def _store(db: Session, row: UserSolvedBitmap, bits: int) -> None:
+    """Write `bits` (bumping the version if they changed); the cache follows on commit."""
+    if bits != int.from_bytes(row.bitmap, "little"):
+        row.bitmap = IdBitmap(bits).to_bytes()
+        row.version = row.version + 1
+        row.updated_at = datetime.now(timezone.utc)
+
+    user_id, version, bitmap = row.user_id, row.version, IdBitmap.from_bytes(row.bitmap)
+    event.listen(
+        db, "after_commit", lambda _session: solved_index.put(user_id, version, bitmap), once=True
+    )
+
+
+def mark_solved(db: Session, user_id: int, problem_ids: Iterable[int]) -> None:
+    """
+    Add problem ids to the user's bitmap, in the caller's transaction (caller
+    commits). Call on every write that sets Progress.solved. This worker's
+    cache is updated once the transaction commits.
+    """
+    row = _locked_row(db, user_id)
+    _store(db, row, int.from_bytes(row.bitmap, "little") | bits_from_ids(problem_ids))
+
+
+def clear_solved(db: Session, user_id: int) -> None:
+    """
+    Empty the user's bitmap, in the caller's transaction (caller commits).
+    Call when the user's solved Progress rows are reset; the version bump
+    makes every worker drop its cached copy.
+    """
+    _store(db, _locked_row(db, user_id), 0)
+
+
+# ============================================================
+#                   READ PATH (PER-WORKER CACHE)
+# ============================================================
+
+class SolvedIndex:
+    def __init__(self):
+        # user_id -> (version, checked_at, bitmap); version 0 = built from progress, no row yet
+        self._cache: "OrderedDict[int, Tuple[int, float, IdBitmap]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "builds": 0, "version_checks": 0}
+
+    def get(self, db: Session, user_id: int) -> IdBitmap:
+        """The user's solved ids."""
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None:
+                self._cache.move_to_end(user_id)
+                if time.monotonic() - entry[1] < settings.SOLVED_INDEX_CHECK_S:
+                    return entry[2]
+
+        if entry is not None:
+            version = db.query(UserSolvedBitmap.version).filter(UserSolvedBitmap.user_id == user_id).scalar()
+            self.stats["version_checks"] += 1
+            if (version or 0) == entry[0]:
+                self.put(user_id, entry[0], entry[2])
+                return entry[2]
+
+        row = (
+            db.query(UserSolvedBitmap.version, UserSolvedBitmap.bitmap)
+            .filter(UserSolvedBitmap.user_id == user_id)
+            .first()
+        )
+        if row is not None:
+            version, bitmap = row.version, IdBitmap.from_bytes(row.bitmap)
+            self.stats["loads"] += 1
+        else:
+            version, bitmap = 0, IdBitmap(_solved_from_progress(db, user_id))
+            self.stats["builds"] += 1
+        self.put(user_id, version, bitmap)
+        return bitmap
+
+    def put(self, user_id: int, version: int, bitmap: IdBitmap) -> None:
+        with self._lock:
+            current: Optional[Tuple[int, float, IdBitmap]] = self._cache.get(user_id)
+            if current is not None and current[0] > version:
+                return
+            self._cache[user_id] = (version, time.monotonic(), bitmap)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > settings.SOLVED_INDEX_CACHE_USERS:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+# Process-wide instance used by routes_problems, routes_dashboard and mark_solved
+solved_index = SolvedIndex()
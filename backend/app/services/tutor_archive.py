@@ -0,0 +1,231 @@
+# backend/app/services/tutor_archive.py
+"""
+Cold storage for idle tutor conversations.
+
+tutor_messages is the hottest table, and without this every message stays a
+row (and an index entry) forever. compact_idle_conversations() packs all
+messages of a conversation idle for TUTOR_ARCHIVE_AFTER_DAYS into one row of
+tutor_conversation_archives — a JSON array compressed with zstd when the
+`zstandard` package is installed, zlib otherwise (the codec is stored per
+row) — and deletes them from tutor_messages, so the live table only holds
+conversations people are actually using.
+
+Message ids are kept in the blob, so ordering, keyset cursors and
+Conversation.summary_upto_id stay valid across a round trip. The listing
+columns (message_count, preview, last_message_at) are left untouched. The
+message text is also kept uncompressed in search_text, which has its own
+full-text index, so conversation search (tutor_search) still finds archived
+conversations.
+
+Opening an archived conversation rehydrates it: rehydrate() puts the rows
+back and drops the blob. tutor_service does this in
+get_conversation_messages, build_contextual_messages and ensure_live (used by
+the conversation endpoints), so callers never see an archived conversation.
+Messages appended without opening it first (e.g. /ask with a
+conversation_id) simply stay live next to the blob until it is opened.
+
+The job runs every TUTOR_ARCHIVE_INTERVAL_S in each worker (started from
+app.main). Overlapping passes are harmless: the archive's primary key lets
+only one of them pack a given conversation.
+"""
+
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models_tutor import Conversation, ConversationArchive, TutorMessage
+
+try:
+    import zstandard
+except ImportError:   # optional: better ratio and speed than zlib
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+#                        CODECS
+# ============================================================
+
+def compress(raw: bytes) -> Tuple[str, bytes]:
+    """(codec, payload) using the best available codec."""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=settings.TUTOR_ARCHIVE_ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Conversation archive is zstd-compressed but `zstandard` is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown conversation archive codec: {codec!r}")
+
+
+def _pack(messages: List[TutorMessage]) -> bytes:
+    return json.dumps(
+        [
+            [m.id, m.role, m.content, m.created_at.isoformat() if m.created_at else None]
+            for m in messages
+        ],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def _unpack(conv_id: int, raw: bytes) -> List[dict]:
+    return [
+        {
+            "id": msg_id,
+            "conversation_id": conv_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.fromisoformat(created_at) if created_at else None,
+        }
+        for msg_id, role, content, created_at in json.loads(raw)
+    ]
+
+
+# ============================================================
+#                    ARCHIVE / REHYDRATE
+# ============================================================
+
+def archive_conversation(db: Session, conv_id: int) -> Optional[Tuple[int, int, int]]:
+    """
+    Move a conversation's live messages into its archive row (one commit).
+    Returns (messages, raw bytes, stored bytes), or None if there was nothing
+    to pack. Raises IntegrityError if it is already archived.
+    """
+    messages = (
+        db.query(TutorMessage)
+        .filter(TutorMessage.conversation_id == conv_id)
+        .order_by(TutorMessage.id)
+        .all()
+    )
+    if not messages:
+        return None
+    raw = _pack(messages)
+    codec, payload = compress(raw)
+    db.add(ConversationArchive(
+        conversation_id=conv_id,
+        codec=codec,
+        message_count=len(messages),
+        raw_bytes=len(raw),
+        payload=payload,
+        search_text="\n".join(m.content for m in messages),
+    ))
+    db.flush()
+    # Only what was packed: a message inserted meanwhile has a higher id and stays live
+    db.execute(
+        delete(TutorMessage)
+        .where(TutorMessage.conversation_id == conv_id, TutorMessage.id <= messages[-1].id)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Conversation)
+        .where(Conversation.id == conv_id)
+        .values(archived_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+    return len(messages), len(raw), len(payload)
+
+
+def rehydrate(db: Session, conv_id: int) -> int:
+    """Put an archived conversation's messages back in tutor_messages. Returns rows restored."""
+    archive = db.get(ConversationArchive, conv_id)
+    if archive is None:
+        db.execute(update(Conversation).where(Conversation.id == conv_id).values(archived_at=None))
+        db.commit()
+        return 0
+    rows = _unpack(conv_id, decompress(archive.codec, archive.payload))
+    try:
+        if rows:
+            db.execute(insert(TutorMessage), rows)
+        db.delete(archive)
+        db.execute(update(Conversation).where(Conversation.id == conv_id).values(archived_at=None))
+        db.commit()
+    except IntegrityError:
+        db.rollback()   # another request rehydrated it first
+        return 0
+    logger.info("Rehydrated %s archived messages for conv_id=%s", len(rows), conv_id)
+    return len(rows)
+
+
+def compact_idle_conversations(
+    db: Session, idle_days: Optional[int] = None, limit: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Archive up to `limit` conversations idle for `idle_days`, oldest first,
+    one commit each. Returns totals for logging.
+    """
+    idle_days = settings.TUTOR_ARCHIVE_AFTER_DAYS if idle_days is None else idle_days
+    limit = settings.TUTOR_ARCHIVE_BATCH if limit is None else limit
+    cutoff = datetime.now(timezone.utc) - timedelta(days=idle_days)
+
+    conv_ids = [
+        conv_id
+        for (conv_id,) in db.query(Conversation.id)
+        .filter(
+            Conversation.archived_at.is_(None),
+            Conversation.message_count > 0,
+            Conversation.last_message_at < cutoff,
+        )
+        .order_by(Conversation.last_message_at)
+        .limit(limit)
+    ]
+
+    totals = {"conversations": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+    for conv_id in conv_ids:
+        try:
+            packed = archive_conversation(db, conv_id)
+        except IntegrityError:
+            db.rollback()   # packed by another worker's pass
+            continue
+        if packed is None:
+            continue
+        messages, raw_bytes, stored_bytes = packed
+        totals["conversations"] += 1
+        totals["messages"] += messages
+        totals["raw_bytes"] += raw_bytes
+        totals["stored_bytes"] += stored_bytes
+    return totals
+
+
+# ============================================================
+#                     BACKGROUND JOB
+# ============================================================
+
+def _compact_once() -> Dict[str, int]:
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return compact_idle_conversations(db)
+    finally:
+        db.close()
+
+
+async def run_compaction_loop() -> None:
+    """Compact every TUTOR_ARCHIVE_INTERVAL_S until cancelled (app shutdown)."""
+    interval = settings.TUTOR_ARCHIVE_INTERVAL_S
+    while True:
+        try:
+            totals = await asyncio.to_thread(_compact_once)
+            if totals["conversations"]:
+                logger.info(
+                    "Archived %s conversations (%s messages, %s -> %s bytes)",
+                    totals["conversations"], totals["messages"], totals["raw_bytes"], totals["stored_bytes"],
+                )
+        except Exception as e:
+            logger.warning("Tutor conversation compaction failed: %s", e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,118 @@
+# backend/app/services/tutor_search.py
+"""
+Full-text search over a user's tutor messages (GET /api/ai/conversations/search).
+
+Postgres matches `websearch_to_tsquery` against the generated
+tutor_messages.search_vector column (GIN index, migration 013), ranks with
+ts_rank_cd and builds ts_headline snippets only for the page being returned.
+SQLite uses the tutor_messages_fts FTS5 table with bm25 ranking and snippet().
+Both indexes are maintained by the database on insert (see
+app/db/models_tutor.py), so write paths don't change.
+
+Snippets are HTML-escaped and matches wrapped in <mark>...</mark>.
+Conversations in cold storage (tutor_archive) are searched through the text
+kept on their archive row (same index types), and come back as one hit per
+conversation with message_id and role set to None and "archived": true;
+opening the conversation restores its messages.
+"""
+
+import html
+import re
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Highlight sentinels: the snippet is escaped first, then these become <mark> tags
+_START, _STOP = "\x02", "\x03"
+
+_PG_SEARCH = text(f"""
+    SELECT hit.id, hit.conversation_id, hit.topic, hit.role, hit.created_at, hit.rank,
+           ts_headline('english', coalesce(m.content, a.search_text), hit.query,
+                       'StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=18, MinWords=6')
+               AS snippet
+    FROM (
+        (
+            SELECT m.id, m.conversation_id, c.topic, m.role, m.created_at, q.query,
+                   ts_rank_cd(m.search_vector, q.query) AS rank
+            FROM websearch_to_tsquery('english', :q) AS q(query)
+            JOIN tutor_messages m ON m.search_vector @@ q.query
+            JOIN tutor_conversations c ON c.id = m.conversation_id
+            WHERE c.user_id = :user_id
+            ORDER BY rank DESC, m.id DESC
+            LIMIT :limit
+        )
+        UNION ALL
+        (
+            SELECT NULL, a.conversation_id, c.topic, NULL, c.last_message_at, q.query,
+                   ts_rank_cd(a.search_vector, q.query) AS rank
+            FROM websearch_to_tsquery('english', :q) AS q(query)
+            JOIN tutor_conversation_archives a ON a.search_vector @@ q.query
+            JOIN tutor_conversations c ON c.id = a.conversation_id
+            WHERE c.user_id = :user_id
+            ORDER BY rank DESC
+            LIMIT :limit
+        )
+    ) AS hit
+    LEFT JOIN tutor_messages m ON m.id = hit.id
+    LEFT JOIN tutor_conversation_archives a ON hit.id IS NULL AND a.conversation_id = hit.conversation_id
+    ORDER BY hit.rank DESC, hit.id DESC NULLS LAST
+    LIMIT :limit
+""")
+
+_SQLITE_SEARCH = text(f"""
+    SELECT * FROM (
+        SELECT m.id, m.conversation_id, c.topic, m.role, m.created_at,
+               -bm25(tutor_messages_fts) AS rank,
+               snippet(tutor_messages_fts, 0, '{_START}', '{_STOP}', '…', 16) AS snippet
+        FROM tutor_messages_fts
+        JOIN tutor_messages m ON m.id = tutor_messages_fts.rowid
+        JOIN tutor_conversations c ON c.id = m.conversation_id
+        WHERE tutor_messages_fts MATCH :q AND c.user_id = :user_id
+        UNION ALL
+        SELECT NULL, a.conversation_id, c.topic, NULL, c.last_message_at,
+               -bm25(tutor_conversation_archives_fts),
+               snippet(tutor_conversation_archives_fts, 0, '{_START}', '{_STOP}', '…', 16)
+        FROM tutor_conversation_archives_fts
+        JOIN tutor_conversation_archives a ON a.conversation_id = tutor_conversation_archives_fts.rowid
+        JOIN tutor_conversations c ON c.id = a.conversation_id
+        WHERE tutor_conversation_archives_fts MATCH :q AND c.user_id = :user_id
+    )
+    ORDER BY rank DESC, id DESC
+    LIMIT :limit
+""")
+
+
+def _fts5_query(q: str) -> str:
+    """User text as an FTS5 query: every word must match, operators are not interpreted."""
+    return " ".join('"%s"' % word for word in re.findall(r"\w+", q))
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet or "").replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def search_messages(db: Session, user_id: int, q: str, limit: int = 20) -> List[Dict]:
+    """The user's best-matching messages (and archived conversations), best first."""
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_PG_SEARCH, {"q": q, "user_id": user_id, "limit": limit})
+    else:
+        match = _fts5_query(q)
+        if not match:
+            return []
+        rows = db.execute(_SQLITE_SEARCH, {"q": match, "user_id": user_id, "limit": limit})
+
+    results = []
+    for row in rows.mappings():
+        created_at = row["created_at"]
+        results.append({
+            "conversation_id": row["conversation_id"],
+            "message_id": row["id"],
+            "topic": row["topic"],
+            "role": row["role"],
+            "snippet": _highlight(row["snippet"]),
+            "rank": round(float(row["rank"]), 4),
+            "archived": row["id"] is None,
+            "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else created_at,
+        })
+    return results
@@ -1,13 +1,25 @@
 # backend/app/services/tutor_service.py
+import asyncio
+import logging
 import tempfile
 import os
 import subprocess
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Set, Tuple
 
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.ai_client import ask_ai, stream_ai
+from app.core.ai_client import ask_ai, complete, stream_ai
+from app.core.ai_metrics import endpoint_label, estimate_tokens
+from app.core.config import settings
 from app.db.models_tutor import Conversation, TutorMessage, Roadmap
+from app.db.session import SessionLocal
+from app.services import tutor_archive
+from app.services.tutor_writer import record_conversation_activity, tutor_writer
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------
@@ -20,24 +32,203 @@ def create_conversation(
     user_id: Optional[int] = None,
     topic: Optional[str] = None,
 ) -> Conversation:
-    conv = Conversation(user_id=user_id, topic=topic)
-    db.add(conv)
+    """
+    Insert a conversation and return it (detached; callers only need .id).
+    INSERT ... RETURNING + one commit — no refresh SELECT afterwards.
+    """
+    created_at = datetime.now(timezone.utc)
+    conv_id = db.execute(
+        insert(Conversation)
+        .values(user_id=user_id, topic=topic, created_at=created_at, last_message_at=created_at)
+        .returning(Conversation.id)
+    ).scalar_one()
     db.commit()
-    db.refresh(conv)
-    return conv
+    return Conversation(
+        id=conv_id, user_id=user_id, topic=topic, created_at=created_at,
+        message_count=0, last_message_at=created_at,
+    )
 
 
 def add_message(db: Session, conv_id: int, role: str, content: str) -> TutorMessage:
-    msg = TutorMessage(conversation_id=conv_id, role=role, content=content)
+    """
+    Store one message. With TUTOR_WRITE_BEHIND on (and inside the event loop)
+    it is buffered and bulk-inserted by tutor_writer; otherwise it is a single
+    INSERT + COMMIT.
+    """
+    if tutor_writer.enabled():
+        return tutor_writer.enqueue(conv_id, role, content)
+    row = {
+        "conversation_id": conv_id,
+        "role": role,
+        "content": content,
+        "created_at": datetime.now(timezone.utc),
+    }
+    msg = TutorMessage(**row)
     db.add(msg)
+    record_conversation_activity(db, [row])
     db.commit()
-    db.refresh(msg)
     return msg
 
 
+def release_connection(db: Session) -> None:
+    """
+    Hand the session's pooled connection back before a long SSE stream.
+    The Session stays usable: its next query checks a connection out again.
+    """
+    db.close()
+
+
+def save_streamed_reply(db: Session, conv_id: int, content: str) -> None:
+    """Persist a finished (or partial) streamed reply as its own short unit of work."""
+    try:
+        add_message(db, conv_id, "assistant", content)
+    finally:
+        db.close()
+
+
+# -------------------------
+# Async entry points (AsyncSession, for `async def` routes)
+# -------------------------
+# The ORM logic above is reused through AsyncSession.run_sync: it runs against
+# the async driver, so its queries await instead of blocking the event loop.
+# It also runs on the loop's own thread: nothing reached from here may hold a
+# threading lock across a query (see TutorWriter.read), or concurrent turns
+# on one worker deadlock.
+
+
+async def prepare_turn(
+    adb: AsyncSession,
+    conv_id: Optional[int],
+    user_id: Optional[int],
+    message: str,
+    *,
+    topic: Optional[str] = None,
+    extra_system: Optional[str] = None,
+    build_context: bool = True,
+) -> Tuple[int, Optional[List[Dict[str, str]]]]:
+    """
+    Start a user turn in one round of DB work: create the conversation if
+    needed, store the user's message and (optionally) build the prompt.
+    Returns (conv_id, messages).
+    """
+
+    def _prepare(db: Session):
+        cid = conv_id
+        if cid is None:
+            cid = create_conversation(db, user_id=user_id, topic=topic).id
+        add_message(db, cid, "user", message)
+        messages = (
+            build_contextual_messages(db, cid, message, extra_system=extra_system)
+            if build_context else None
+        )
+        return cid, messages
+
+    return await adb.run_sync(_prepare)
+
+
+async def add_message_async(adb: AsyncSession, conv_id: int, role: str, content: str) -> TutorMessage:
+    return await adb.run_sync(add_message, conv_id, role, content)
+
+
+async def release_connection_async(adb: AsyncSession) -> None:
+    """release_connection for an AsyncSession."""
+    await adb.close()
+
+
+async def save_streamed_reply_async(adb: AsyncSession, conv_id: int, content: str) -> None:
+    """save_streamed_reply for an AsyncSession."""
+    try:
+        await adb.run_sync(add_message, conv_id, "assistant", content)
+    finally:
+        await adb.close()
+
+
+def ensure_live(db: Session, conv: Optional[Conversation]) -> None:
+    """Rehydrate `conv` from cold storage (tutor_archive) before its messages are read."""
+    if conv is not None and conv.archived_at is not None:
+        tutor_archive.rehydrate(db, conv.id)
+
+
 def get_conversation_messages(db: Session, conv_id: int) -> List[TutorMessage]:
-    conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
-    return conv.messages if conv else []
+    """
+    All messages, oldest first — including ones still in the write-behind buffer.
+    O(history): prefer get_recent_messages / get_messages_page on request paths.
+    """
+    if db.query(Conversation.archived_at).filter(Conversation.id == conv_id).scalar() is not None:
+        tutor_archive.rehydrate(db, conv_id)
+    rows, pending = tutor_writer.read(
+        conv_id,
+        lambda: db.query(TutorMessage)
+        .filter(TutorMessage.conversation_id == conv_id)
+        .order_by(TutorMessage.id)
+        .all(),
+    )
+    return rows + pending
+
+
+# -------------------------
+# Message access (keyset on tutor_messages(conversation_id, id))
+# -------------------------
+
+
+def _messages(db: Session, conv_id: int):
+    return db.query(TutorMessage).filter(TutorMessage.conversation_id == conv_id)
+
+
+def get_recent_messages(
+    db: Session, conv_id: int, limit: int, after_id: Optional[int] = None
+) -> List[TutorMessage]:
+    """
+    The newest `limit` messages, NEWEST FIRST (ORDER BY id DESC LIMIT n), plus
+    any still in the write-behind buffer. `after_id` excludes older messages.
+    """
+    q = _messages(db, conv_id)
+    if after_id:
+        q = q.filter(TutorMessage.id > after_id)
+    rows, pending = tutor_writer.read(
+        conv_id, lambda: q.order_by(TutorMessage.id.desc()).limit(limit).all()
+    )
+    return (list(reversed(pending)) + rows)[:limit]
+
+
+def get_messages_page(
+    db: Session,
+    conv_id: int,
+    *,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: int = 50,
+) -> Tuple[List[TutorMessage], bool]:
+    """
+    One page of messages, oldest first, and whether more exist in the paging
+    direction. No cursor = the latest page; `before_id` pages backwards,
+    `after_id` forwards. Unflushed (write-behind) messages only appear on
+    pages that reach the end of the conversation.
+    """
+    if after_id is not None:
+        q = _messages(db, conv_id).filter(TutorMessage.id > after_id)
+        rows, pending = tutor_writer.read(
+            conv_id, lambda: q.order_by(TutorMessage.id).limit(limit + 1).all()
+        )
+        combined = rows + (pending if len(rows) <= limit else [])
+        return combined[:limit], len(combined) > limit
+
+    q = _messages(db, conv_id)
+    if before_id is not None:
+        q = q.filter(TutorMessage.id < before_id)
+    rows, pending = tutor_writer.read(
+        conv_id, lambda: q.order_by(TutorMessage.id.desc()).limit(limit + 1).all()
+    )
+    newest_first = (list(reversed(pending)) if before_id is None else []) + rows
+    page = newest_first[:limit]
+    page.reverse()
+    return page, len(newest_first) > limit
+
+
+def delete_conversation(db: Session, conv: Conversation) -> None:
+    tutor_writer.discard(conv.id)
+    db.delete(conv)
+    db.commit()
 
 
 # -------------------------
@@ -59,28 +250,200 @@ async def detect_topic(prompt: str) -> str:
 # -------------------------
 
 
+def _clip(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of an oversized message (e.g. a pasted code dump)."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]}\n[... {len(text) - max_chars} characters omitted ...]\n{text[-half:]}"
+
+
 def build_contextual_messages(
     db: Session,
     conv_id: int,
     user_prompt: str,
     extra_system: Optional[str] = None,
 ) -> List[Dict[str, str]]:
-    messages: List[Dict[str, str]] = [
-        {"role": "system", "content": extra_system or "You are EduAI, a friendly and clear tutor."}
-    ]
-    msgs = get_conversation_messages(db, conv_id)
-    for m in msgs[-10:]:
-        messages.append({"role": m.role, "content": m.content})
-    messages.append({"role": "user", "content": user_prompt})
+    """
+    Build the prompt for the next turn within TUTOR_CONTEXT_TOKEN_BUDGET.
+
+    Layout: system prompt, rolling summary of older turns (if any), as many of
+    the newest unsummarised messages as fit (each clipped to
+    TUTOR_CONTEXT_MESSAGE_MAX_TOKENS), then the new user message.
+    If older turns are piling up, a summary refresh is scheduled in the
+    background — it never runs on the request path.
+    """
+    system = extra_system or "You are EduAI, a friendly and clear tutor."
+    user_prompt_clipped = _clip(user_prompt, settings.TUTOR_CONTEXT_MESSAGE_MAX_TOKENS)
+    budget = (
+        settings.TUTOR_CONTEXT_TOKEN_BUDGET
+        - estimate_tokens(len(system))
+        - estimate_tokens(len(user_prompt_clipped))
+    )
+
+    conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
+    ensure_live(db, conv)
+    summary = conv.summary if conv else None
+    if summary:
+        budget -= estimate_tokens(len(summary))
+
+    recent = get_recent_messages(   # newest first
+        db,
+        conv_id,
+        settings.TUTOR_CONTEXT_MAX_MESSAGES,
+        after_id=conv.summary_upto_id if conv is not None else None,
+    )
+
+    # Routes store the user's message before building context; don't send it twice
+    if recent and recent[0].role == "user" and recent[0].content == user_prompt:
+        recent = recent[1:]
+
+    history: List[Dict[str, str]] = []
+    for m in recent:   # newest first
+        content = _clip(m.content, settings.TUTOR_CONTEXT_MESSAGE_MAX_TOKENS)
+        cost = estimate_tokens(len(content))
+        if cost > budget:
+            break
+        budget -= cost
+        history.append({"role": m.role, "content": content})
+    history.reverse()
+
+    if len(recent) > settings.TUTOR_SUMMARY_KEEP_RECENT or len(history) < len(recent):
+        schedule_summary_refresh(conv_id)
+
+    messages: List[Dict[str, str]] = [{"role": "system", "content": system}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    messages.extend(history)
+    messages.append({"role": "user", "content": user_prompt_clipped})
     return messages
 
 
+# -------------------------
+# Rolling conversation summaries
+# -------------------------
+
+_summaries_in_flight: Set[int] = set()
+
+
+def schedule_summary_refresh(conv_id: int) -> None:
+    """Fire-and-forget refresh_summary for conv_id (no-op outside an event loop)."""
+    if conv_id in _summaries_in_flight:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _summaries_in_flight.add(conv_id)
+    task = loop.create_task(refresh_summary(conv_id))
+    task.add_done_callback(lambda _t: _summaries_in_flight.discard(conv_id))
+
+
+def _load_unsummarised(db: Session, conv_id: int):
+    """
+    (conversation, up to TUTOR_SUMMARY_BATCH_MESSAGES of the oldest messages
+    that are not yet summarised and older than the keep-recent window).
+    """
+    conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
+    if conv is None:
+        return None, []
+    in_conv = TutorMessage.conversation_id == conv_id
+    q = db.query(TutorMessage).filter(in_conv)
+    keep = settings.TUTOR_SUMMARY_KEEP_RECENT
+    if keep:
+        # Oldest message of the window kept verbatim
+        boundary = (
+            db.query(TutorMessage.id).filter(in_conv)
+            .order_by(TutorMessage.id.desc()).offset(keep - 1).limit(1).scalar()
+        )
+        if boundary is None:
+            return conv, []
+        q = q.filter(TutorMessage.id < boundary)
+    if conv.summary_upto_id:
+        q = q.filter(TutorMessage.id > conv.summary_upto_id)
+    # Anything past the batch is folded by the next refresh
+    return conv, q.order_by(TutorMessage.id).limit(settings.TUTOR_SUMMARY_BATCH_MESSAGES).all()
+
+
+def _save_summary(db: Session, conv_id: int, summary: str, upto_id: int) -> None:
+    conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
+    if conv is None:
+        return
+    conv.summary = summary
+    conv.summary_upto_id = upto_id
+    conv.summary_updated_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+async def refresh_summary(conv_id: int, db: Optional[Session] = None) -> bool:
+    """
+    Fold turns older than the newest TUTOR_SUMMARY_KEEP_RECENT into
+    Conversation.summary. Skips the model call until at least
+    TUTOR_SUMMARY_MIN_TOKENS of older text has accumulated.
+    Returns True if the summary was updated.
+    """
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        if own_session:
+            conv, older = await asyncio.to_thread(_load_unsummarised, db, conv_id)
+        else:
+            conv, older = _load_unsummarised(db, conv_id)
+        if conv is None or not older:
+            return False
+
+        transcript = "\n".join(
+            f"{m.role.capitalize()}: {_clip(m.content, settings.TUTOR_CONTEXT_MESSAGE_MAX_TOKENS)}"
+            for m in older
+        )
+        if estimate_tokens(len(transcript)) < settings.TUTOR_SUMMARY_MIN_TOKENS:
+            return False
+
+        prompt = (
+            "Update the running summary of a tutoring conversation. Keep the student's "
+            "goals, what has been explained, code/problem details still relevant, and open "
+            f"questions. At most {settings.TUTOR_SUMMARY_MAX_TOKENS * 3 // 4} words. "
+            "Reply with the summary only.\n\n"
+            f"Current summary:\n{conv.summary or '(none)'}\n\n"
+            f"New turns:\n{transcript}"
+        )
+        with endpoint_label("background:tutor_summary"):
+            summary = await complete(
+                [{"role": "user", "content": prompt}],
+                temperature=0.2,
+                max_tokens=settings.TUTOR_SUMMARY_MAX_TOKENS,
+                cache=False,
+                priority="background",
+                user_id=conv.user_id,
+            )
+        summary = (summary or "").strip()
+        if not summary:
+            return False
+
+        if own_session:
+            await asyncio.to_thread(_save_summary, db, conv_id, summary, older[-1].id)
+        else:
+            _save_summary(db, conv_id, summary, older[-1].id)
+        return True
+
+    except Exception as e:
+        logger.warning("Conversation summary refresh failed for conv_id=%s: %s", conv_id, e)
+        return False
+    finally:
+        if own_session:
+            db.close()
+
+
 # -------------------------
 # MCQ generator
 # -------------------------
 
 
-async def generate_mcq(topic: str, difficulty: str = "medium", count: int = 5) -> Dict[str, Any]:
+async def generate_mcq(
+    topic: str, difficulty: str = "medium", count: int = 5, user_id: Optional[int] = None
+) -> Dict[str, Any]:
     """
     Returns a dict: {topic, questions: [{question, choices: [...], answer_index, explanation}]}
     """
@@ -90,7 +453,7 @@ async def generate_mcq(topic: str, difficulty: str = "medium", count: int = 5) -
         "and a 1-2 sentence explanation. Return JSON ONLY in this format: "
         '{"questions": [{"question":"...","choices":["a","b","c","d"],"answer_index":0,"explanation":"..."}]}'
     )
-    out = await ask_ai(prompt, max_tokens=800, temperature=0.2)
+    out = await ask_ai(prompt, max_tokens=800, temperature=0.2, user_id=user_id)
 
     import json
 
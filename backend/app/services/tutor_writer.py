@@ -0,0 +1,275 @@
+# backend/app/services/tutor_writer.py
+"""
+Write-behind persistence for tutor messages (TUTOR_WRITE_BEHIND=true).
+
+tutor_service.add_message normally costs an INSERT + COMMIT per message. With
+write-behind on, messages are buffered in memory and bulk-inserted by one
+background task — every TUTOR_WRITE_BEHIND_INTERVAL_MS, or as soon as
+TUTOR_WRITE_BEHIND_BATCH rows are waiting — in a single transaction.
+
+Guarantees:
+  - read-your-writes: tutor_service merges rows still waiting in the buffer
+    (or in a flush that has not committed yet) into conversation reads;
+  - durability on shutdown: app shutdown awaits aclose(), which drains the
+    buffer. A hard crash can lose at most one interval of messages;
+  - a batch rejected by a constraint is retried row by row so one bad row
+    (e.g. its conversation was deleted meanwhile) cannot block the rest;
+    any other failure (DB unreachable) puts the batch back for the next tick.
+"""
+
+import asyncio
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models_tutor import Conversation, TutorMessage
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CHARS = 80
+# Query retries before read() falls back to matching rows by write_id
+_READ_ATTEMPTS = 3
+
+
+def make_preview(content: str) -> str:
+    return (content[:PREVIEW_CHARS] + "...") if len(content) > PREVIEW_CHARS else content
+
+
+def record_conversation_activity(db: Session, rows: List[dict]) -> None:
+    """
+    Keep tutor_conversations.message_count / preview / last_message_at in step
+    with inserted message rows — one UPDATE per conversation, in the caller's
+    transaction.
+    """
+    per_conv: Dict[int, List[dict]] = {}
+    for row in rows:
+        per_conv.setdefault(row["conversation_id"], []).append(row)
+    for conv_id, conv_rows in per_conv.items():
+        values = {
+            "message_count": Conversation.message_count + len(conv_rows),
+            "last_message_at": max(r["created_at"] for r in conv_rows),
+        }
+        first_user = next((r for r in conv_rows if r["role"] == "user"), None)
+        if first_user is not None:
+            values["preview"] = func.coalesce(Conversation.preview, make_preview(first_user["content"]))
+        db.execute(update(Conversation).where(Conversation.id == conv_id).values(**values))
+
+
+class TutorWriter:
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._session_factory = session_factory
+        self._buffer: List[dict] = []
+        # conv_id -> rows not yet committed (buffered or mid-flush), for reads
+        self._pending: Dict[int, List[dict]] = {}
+        # Guards _pending; only ever held for in-memory work, never across a
+        # query (readers run on the event loop via AsyncSession.run_sync, so a
+        # lock held while their query awaits would block the whole worker).
+        self._commit_lock = threading.Lock()
+        # Odd while a batch commits and leaves _pending; readers retry when it
+        # moved during their query, so a row is never seen twice or not at all
+        self._commit_seq = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "dropped": 0}
+
+    # ---------------- producer side ----------------
+
+    @staticmethod
+    def enabled() -> bool:
+        if not settings.TUTOR_WRITE_BEHIND:
+            return False
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False   # sync/threadpool caller: use the direct path
+        return True
+
+    def enqueue(self, conv_id: int, role: str, content: str) -> TutorMessage:
+        """Buffer one message; returns a transient TutorMessage (id is None until flushed)."""
+        self._ensure_task()
+        row = {
+            "conversation_id": conv_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.now(timezone.utc),
+            # Tells this row apart from an identical message once committed
+            "write_id": uuid.uuid4().hex,
+        }
+        self._buffer.append(row)
+        with self._commit_lock:
+            self._pending.setdefault(conv_id, []).append(row)
+        self.stats["enqueued"] += 1
+        if len(self._buffer) >= settings.TUTOR_WRITE_BEHIND_BATCH:
+            self._wakeup.set()
+        return TutorMessage(**row)
+
+    def discard(self, conv_id: int) -> None:
+        """Forget unflushed rows of a conversation that is being deleted."""
+        self._buffer = [r for r in self._buffer if r["conversation_id"] != conv_id]
+        with self._commit_lock:
+            self._pending.pop(conv_id, None)
+
+    # ---------------- reader side ----------------
+
+    def read(self, conv_id: int, query: Callable[[], list]) -> Tuple[list, List[TutorMessage]]:
+        """
+        Run `query` and snapshot this conversation's uncommitted messages
+        (oldest first), consistent with respect to batch commits.
+        """
+        if not settings.TUTOR_WRITE_BEHIND:
+            return list(query()), []
+        for _ in range(_READ_ATTEMPTS):
+            seq, pending = self._snapshot(conv_id)
+            rows = list(query())
+            if seq % 2 == 0 and seq == self._commit_seq:
+                return rows, [TutorMessage(**r) for r in pending]
+        # Batches kept committing during the query: a row that left _pending
+        # meanwhile may or may not be in `rows`, so keep it only if it is not
+        _, still_pending = self._snapshot(conv_id)
+        seen = {m.write_id for m in rows if m.write_id}
+        merged = pending + [r for r in still_pending if not any(r is p for p in pending)]
+        return rows, [
+            TutorMessage(**r)
+            for r in merged
+            if any(r is p for p in still_pending) or r["write_id"] not in seen
+        ]
+
+    def _snapshot(self, conv_id: int) -> Tuple[int, List[dict]]:
+        with self._commit_lock:
+            return self._commit_seq, list(self._pending.get(conv_id, ()))
+
+    @contextmanager
+    def _committing(self):
+        """Mark a commit in progress for readers (see _commit_seq)."""
+        with self._commit_lock:
+            self._commit_seq += 1
+        try:
+            yield
+        finally:
+            with self._commit_lock:
+                self._commit_seq += 1
+
+    # ---------------- flusher ----------------
+
+    def _ensure_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        interval = settings.TUTOR_WRITE_BEHIND_INTERVAL_MS / 1000
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything buffered so far in one transaction. Returns rows written."""
+        if not self._buffer:
+            return 0
+        batch, self._buffer = self._buffer, []
+        try:
+            return await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            logger.warning("Tutor write-behind flush of %s rows failed, will retry: %s", len(batch), e)
+            with self._commit_lock:
+                unsaved = [
+                    r for r in batch
+                    if any(p is r for p in self._pending.get(r["conversation_id"], ()))
+                ]
+            self._buffer[:0] = unsaved
+            return 0
+
+    def _new_session(self) -> Session:
+        if self._session_factory is not None:
+            return self._session_factory()
+        from app.db.session import SessionLocal
+        return SessionLocal()
+
+    def _write(self, batch: List[dict]) -> int:
+        """Runs in a worker thread. Raises (batch untouched) on non-constraint errors."""
+        db = self._new_session()
+        written: List[dict] = []
+        try:
+            try:
+                db.execute(insert(TutorMessage), batch)
+                record_conversation_activity(db, batch)
+                with self._committing():
+                    db.commit()
+                    written = batch
+                    with self._commit_lock:
+                        self._forget(batch)
+            except IntegrityError as e:
+                db.rollback()
+                logger.warning("Tutor write-behind batch of %s failed (%s); retrying row by row", len(batch), e)
+                for row in batch:
+                    try:
+                        db.execute(insert(TutorMessage), [row])
+                        record_conversation_activity(db, [row])
+                        with self._committing():
+                            db.commit()
+                            written.append(row)
+                            with self._commit_lock:
+                                self._forget([row])
+                    except IntegrityError as row_err:
+                        db.rollback()
+                        self.stats["dropped"] += 1
+                        with self._commit_lock:
+                            self._forget([row])
+                        logger.error(
+                            "Dropping tutor message for conv_id=%s: %s", row["conversation_id"], row_err
+                        )
+        finally:
+            db.close()
+        self.stats["flushed"] += len(written)
+        self.stats["batches"] += 1
+        return len(written)
+
+    def _forget(self, rows: List[dict]) -> None:
+        """Drop committed rows from _pending (caller holds _commit_lock)."""
+        for row in rows:
+            conv_rows = self._pending.get(row["conversation_id"])
+            if not conv_rows:
+                continue
+            for i, r in enumerate(conv_rows):
+                if r is row:
+                    del conv_rows[i]
+                    break
+            if not conv_rows:
+                del self._pending[row["conversation_id"]]
+
+    async def aclose(self) -> None:
+        """Stop the flusher and drain the buffer (called on app shutdown)."""
+        self._stopping = True
+        try:
+            if self._task is not None and not self._task.done():
+                self._wakeup.set()
+                await self._task   # lets an in-progress flush finish committing
+            for _ in range(3):
+                if not self._buffer:
+                    break
+                await self.flush()
+            if self._buffer:
+                logger.error("Tutor write-behind: %s messages could not be saved at shutdown", len(self._buffer))
+        finally:
+            self._task = None
+            self._stopping = False
+
+
+# Process-wide instance used by tutor_service
+tutor_writer = TutorWriter()
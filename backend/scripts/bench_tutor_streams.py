@@ -0,0 +1,196 @@
+"""
+Benchmark: how many concurrent tutor streams can one worker sustain?
+
+Runs N concurrent `stream_ai` consumers against a fake Gemini model that
+produces chunks with realistic pacing (no network, no API key needed), and
+reports time-to-first-token, event-loop lag and wall time for each level.
+
+Two engines are compared:
+  legacy — the previous implementation: a blocking generate_content() call
+           in a thread, then one asyncio.to_thread() hop per streamed chunk.
+           Concurrency is capped by the default thread pool size.
+  async  — the current ai_client path (generate_content_async, awaited
+           chunks on the event loop).
+
+The AI scheduler (app/core/ai_scheduler.py) is off by default here, so the
+numbers measure the engines alone; the configuration used is printed with
+the results. Pass --scheduler to run with the configured slot limits
+(AI_MAX_CONCURRENCY / AI_PROVIDER_MAX_CONCURRENCY, AI_STREAM_HOLD_SLOT).
+
+Usage:
+    python scripts/bench_tutor_streams.py
+    python scripts/bench_tutor_streams.py --levels 10,50,100,200 --chunks 40
+    python scripts/bench_tutor_streams.py --scheduler --hold-slot
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("AI_PROVIDER", "gemini")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core import ai_client, ai_registry
+
+
+# ============================================================
+# Fake Gemini model (sync + async APIs with the same pacing)
+# ============================================================
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    def __init__(self, ttft: float, chunks: int, chunk_interval: float):
+        self.ttft = ttft
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval
+
+    # Legacy sync API: blocks the calling thread
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        time.sleep(self.ttft)
+
+        def _iter():
+            for i in range(self.chunks):
+                if i:
+                    time.sleep(self.chunk_interval)
+                yield _Chunk(f"tok{i} ")
+
+        return _iter()
+
+    # Async API used by the current engine
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        await asyncio.sleep(self.ttft)
+
+        async def _aiter():
+            for i in range(self.chunks):
+                if i:
+                    await asyncio.sleep(self.chunk_interval)
+                yield _Chunk(f"tok{i} ")
+
+        return _aiter()
+
+
+async def _legacy_stream(model, messages):
+    """The pre-async implementation, reproduced for comparison."""
+    response = await asyncio.to_thread(model.generate_content, "prompt", stream=True)
+    sentinel = object()
+    while True:
+        chunk = await asyncio.to_thread(lambda it=response: next(it, sentinel))
+        if chunk is sentinel:
+            break
+        yield {"type": "delta", "text": chunk.text}
+    yield {"type": "done"}
+
+
+# ============================================================
+# Measurement
+# ============================================================
+
+async def _lag_probe(stop: asyncio.Event, samples: list, interval: float = 0.01):
+    """Measure how late the loop wakes us up — a proxy for loop blocking."""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - t0 - interval)
+
+
+async def _one_stream(engine: str, model) -> float:
+    messages = [{"role": "user", "content": "Explain recursion"}]
+    t0 = time.perf_counter()
+    ttft = None
+    stream = _legacy_stream(model, messages) if engine == "legacy" else ai_client.stream_ai(messages)
+    async for evt in stream:
+        if evt.get("type") == "delta" and ttft is None:
+            ttft = time.perf_counter() - t0
+    return ttft if ttft is not None else float("nan")
+
+
+def _pct(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(p * (len(values) - 1))))
+    return values[idx]
+
+
+async def run_level(engine: str, concurrency: int, model) -> dict:
+    stop = asyncio.Event()
+    lag: list = []
+    probe = asyncio.create_task(_lag_probe(stop, lag))
+
+    t0 = time.perf_counter()
+    ttfts = await asyncio.gather(*[_one_stream(engine, model) for _ in range(concurrency)])
+    wall = time.perf_counter() - t0
+
+    stop.set()
+    await probe
+    return {
+        "engine": engine,
+        "streams": concurrency,
+        "ttft_p50_ms": statistics.median(ttfts) * 1000,
+        "ttft_p95_ms": _pct(ttfts, 0.95) * 1000,
+        "loop_lag_p99_ms": _pct(lag, 0.99) * 1000,
+        "wall_s": wall,
+    }
+
+
+async def main(args):
+    settings = ai_client.settings
+    settings.AI_SCHEDULER_ENABLED = args.scheduler
+    settings.AI_STREAM_HOLD_SLOT = args.hold_slot
+    if args.scheduler:
+        print(f"Scheduler: on (global={settings.AI_MAX_CONCURRENCY}, "
+              f"per provider={settings.AI_PROVIDER_MAX_CONCURRENCY}, "
+              f"streams hold their slot: {'yes' if args.hold_slot else 'until first token'})")
+    else:
+        print("Scheduler: off")
+
+    model = FakeGeminiModel(args.ttft, args.chunks, args.interval)
+    ai_registry._gemini_models[settings.GEMINI_MODEL] = model
+    ai_client._gemini_config(0.7, 1024)  # warm the SDK import outside the timings
+
+    ideal_wall = args.ttft + (args.chunks - 1) * args.interval
+    print(f"Ideal stream duration: {ideal_wall:.2f}s "
+          f"(ttft={args.ttft}s, {args.chunks} chunks every {args.interval}s)\n")
+    header = f"{'engine':<8}{'streams':>8}{'ttft p50':>11}{'ttft p95':>11}{'lag p99':>10}{'wall':>8}"
+    print(header)
+    print("-" * len(header))
+
+    capacity = {}
+    for engine in ("legacy", "async"):
+        capacity[engine] = 0
+        for level in args.levels:
+            r = await run_level(engine, level, model)
+            print(f"{r['engine']:<8}{r['streams']:>8}{r['ttft_p50_ms']:>9.0f}ms"
+                  f"{r['ttft_p95_ms']:>9.0f}ms{r['loop_lag_p99_ms']:>8.1f}ms{r['wall_s']:>7.2f}s")
+            # A level is "sustained" if streams finish within 1.5x the ideal duration
+            if r["wall_s"] <= ideal_wall * 1.5:
+                capacity[engine] = level
+        print()
+
+    print("Max sustained concurrent streams per worker:")
+    for engine, level in capacity.items():
+        print(f"  {engine:<8} {level}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")],
+                        default=[10, 25, 50, 100, 200, 400])
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the first chunk")
+    parser.add_argument("--chunks", type=int, default=30, help="chunks per stream")
+    parser.add_argument("--interval", type=float, default=0.03, help="seconds between chunks")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="queue the async engine through the AI scheduler's slot limits")
+    parser.add_argument("--hold-slot", action="store_true",
+                        help="with --scheduler: streams keep their slot until they finish")
+    asyncio.run(main(parser.parse_args()))
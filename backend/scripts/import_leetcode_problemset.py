@@ -30,6 +30,7 @@ if models_dir.exists():
 
 # Now import Problem for use
 from app.models.problem import Problem
+from app.services.problem_catalog import bump_version
 
 
 LEETCODE_GRAPHQL = "https://leetcode.com/graphql"
@@ -146,6 +147,8 @@ def upsert_problems(db: Session, problems: list[dict]):
             db.add(Problem(**payload))
             inserted += 1
 
+    # Running workers reload their in-memory catalog snapshot
+    bump_version(db)
     db.commit()
     print(f"Inserted: {inserted}, Updated: {updated}")
 
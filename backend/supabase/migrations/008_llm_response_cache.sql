@@ -0,0 +1,17 @@
+-- Migration: 008_llm_response_cache.sql
+-- Shared second tier of the LLM response cache (app/core/llm_cache.py).
+-- Only used when LLM_CACHE_DB_ENABLED=true; lets every Gunicorn worker reuse
+-- completions for identical deterministic prompts.
+
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    provider VARCHAR,
+    model VARCHAR,
+    response TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+-- Lets a periodic `DELETE ... WHERE expires_at < now()` purge expired rows cheaply
+CREATE INDEX IF NOT EXISTS ix_llm_response_cache_expires_at
+    ON llm_response_cache(expires_at);
@@ -0,0 +1,8 @@
+-- Migration: 009_conversation_summaries.sql
+-- Rolling summary of older tutor turns (tutor_service.refresh_summary).
+-- build_contextual_messages sends this summary plus the newest turns that fit
+-- TUTOR_CONTEXT_TOKEN_BUDGET instead of the raw last-10 messages.
+
+ALTER TABLE tutor_conversations ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE tutor_conversations ADD COLUMN IF NOT EXISTS summary_upto_id INTEGER;
+ALTER TABLE tutor_conversations ADD COLUMN IF NOT EXISTS summary_updated_at TIMESTAMP;
@@ -0,0 +1,9 @@
+-- Migration: 010_tutor_message_keyset_index.sql
+-- Composite index for tutor history reads. Prompt building fetches only the
+-- newest messages (ORDER BY id DESC LIMIT n) and GET /api/ai/conversations/{id}
+-- pages with before_id / after_id, both as
+--   WHERE conversation_id = ? [AND id < / > ?] ORDER BY id LIMIT n
+-- which this index answers without scanning or sorting the whole history.
+
+CREATE INDEX IF NOT EXISTS idx_tutor_messages_conv_id
+    ON tutor_messages(conversation_id, id);
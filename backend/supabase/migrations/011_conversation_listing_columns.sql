@@ -0,0 +1,37 @@
+-- Migration: 011_conversation_listing_columns.sql
+-- Denormalised listing fields on tutor_conversations, kept current on every
+-- message insert (tutor_writer.record_conversation_activity). GET
+-- /api/ai/conversations used to GROUP BY all tutor_messages for counts and run
+-- a row_number() window over every user message for previews on each call;
+-- it now reads these columns with one indexed range scan.
+
+ALTER TABLE tutor_conversations ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE tutor_conversations ADD COLUMN IF NOT EXISTS preview VARCHAR;
+ALTER TABLE tutor_conversations ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP;
+
+-- Backfill from existing messages
+UPDATE tutor_conversations c
+SET message_count = s.msg_count,
+    last_message_at = s.last_at
+FROM (
+    SELECT conversation_id, COUNT(*) AS msg_count, MAX(created_at) AS last_at
+    FROM tutor_messages
+    GROUP BY conversation_id
+) s
+WHERE s.conversation_id = c.id;
+
+UPDATE tutor_conversations c
+SET preview = CASE WHEN length(f.content) > 80 THEN left(f.content, 80) || '...' ELSE f.content END
+FROM (
+    SELECT DISTINCT ON (conversation_id) conversation_id, content
+    FROM tutor_messages
+    WHERE role = 'user'
+    ORDER BY conversation_id, id
+) f
+WHERE f.conversation_id = c.id AND c.preview IS NULL;
+
+-- Conversations without messages sort by creation time
+UPDATE tutor_conversations SET last_message_at = created_at WHERE last_message_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_tutor_conversations_user_recent
+    ON tutor_conversations(user_id, last_message_at DESC);
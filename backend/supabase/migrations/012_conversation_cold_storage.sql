@@ -0,0 +1,21 @@
+-- Migration: 012_conversation_cold_storage.sql
+-- Cold storage for idle tutor conversations (app/services/tutor_archive.py).
+-- Conversations idle for TUTOR_ARCHIVE_AFTER_DAYS have all their messages
+-- packed into one compressed JSON blob here and deleted from tutor_messages,
+-- keeping the hot table and its indexes small. Opening a conversation
+-- restores its rows (with their original ids) and drops the blob.
+
+CREATE TABLE IF NOT EXISTS tutor_conversation_archives (
+    conversation_id INTEGER PRIMARY KEY REFERENCES tutor_conversations(id) ON DELETE CASCADE,
+    codec VARCHAR NOT NULL,              -- 'zstd' or 'zlib'
+    message_count INTEGER NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    payload BYTEA NOT NULL,
+    archived_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE tutor_conversations ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP;
+
+-- Compaction candidates: live conversations ordered by idleness
+CREATE INDEX IF NOT EXISTS idx_tutor_conversations_live_idle
+    ON tutor_conversations(last_message_at) WHERE archived_at IS NULL;
@@ -0,0 +1,14 @@
+-- Migration: 013_tutor_message_search.sql
+-- Full-text search over tutor messages (GET /api/ai/conversations/search,
+-- app/services/tutor_search.py). The tsvector is a generated column, so
+-- Postgres keeps it current on every insert/update without application code;
+-- the GIN index serves `search_vector @@ websearch_to_tsquery(...)`.
+--
+-- Adding a STORED generated column rewrites tutor_messages: run this in a
+-- quiet window (ideally after 012 cold storage has shrunk the table).
+
+ALTER TABLE tutor_messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_tutor_messages_search
+    ON tutor_messages USING GIN (search_vector);
@@ -0,0 +1,15 @@
+-- Migration: 014_catalog_versions.sql
+-- Change counters for per-worker in-memory catalog snapshots
+-- (app/services/problem_catalog.py). Admin problem writes and
+-- scripts/import_leetcode_problemset.py bump 'problems' in the same
+-- transaction; workers compare it every CATALOG_VERSION_CHECK_S seconds and
+-- reload their snapshot when it moved.
+
+CREATE TABLE IF NOT EXISTS catalog_versions (
+    name VARCHAR PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalog_versions (name, version) VALUES ('problems', 1)
+ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,20 @@
+-- Migration: 015_problem_search.sql
+-- Ranked, typo-tolerant search for GET /api/problems?search=...
+-- (app/services/problem_search.py). Replaces ILIKE '%term%' over title and
+-- description, which scanned the whole table on every keystroke.
+--
+--   search_vector  generated tsvector, title weighted above description,
+--                  kept current by Postgres on every insert/update
+--   title trigrams pg_trgm index so misspelt titles ("dijkstra" vs
+--                  "djikstra") still match, ranked by similarity()
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_problems_search ON problems USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_problems_title_trgm ON problems USING GIN (title gin_trgm_ops);
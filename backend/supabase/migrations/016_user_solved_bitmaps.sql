@@ -0,0 +1,14 @@
+-- Migration: 016_user_solved_bitmaps.sql
+-- Per-user solved-problem bitmaps (app/services/solved_index.py): bit i is
+-- set when the user has solved problem i. Written in the same transaction as
+-- every solve (practice completion, LeetCode sync) with `version` bumped;
+-- workers cache the decoded bitmap and compare the version to stay fresh.
+-- Users without a row are built from `progress` on first read, so no
+-- backfill is needed.
+
+CREATE TABLE IF NOT EXISTS user_solved_bitmaps (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 1,
+    bitmap BYTEA NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,8 @@
+-- Migration: 017_tutor_message_write_id.sql
+-- Id assigned to a tutor message when the write-behind buffer
+-- (app/services/tutor_writer.py) accepts it. Reads that race a batch commit
+-- use it to drop buffered rows that already reached the table without also
+-- dropping a repeated message with the same text. Directly inserted rows
+-- leave it NULL, so no backfill is needed.
+
+ALTER TABLE tutor_messages ADD COLUMN IF NOT EXISTS write_id VARCHAR(32);
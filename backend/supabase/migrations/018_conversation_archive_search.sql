@@ -0,0 +1,16 @@
+-- Migration: 018_conversation_archive_search.sql
+-- Keeps archived tutor conversations (012 cold storage) searchable: the
+-- archive row stores its messages' text uncompressed in search_text, with a
+-- generated tsvector and GIN index like tutor_messages.search_vector (013).
+-- app/services/tutor_search.py searches both tables.
+--
+-- Archives written before this migration have no search_text; they become
+-- searchable once opened (rehydrated) and archived again.
+
+ALTER TABLE tutor_conversation_archives ADD COLUMN IF NOT EXISTS search_text TEXT;
+
+ALTER TABLE tutor_conversation_archives ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(search_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_tutor_conversation_archives_search
+    ON tutor_conversation_archives USING GIN (search_vector);
@@ -2,44 +2,71 @@
 """
 Shared test fixtures for the Ed-AI backend test suite.
 
-- Uses an in-memory SQLite database (fast, isolated per-test-session).
-- Overrides FastAPI's `get_db` dependency so all routes use the test DB.
+- Uses a temporary SQLite file shared by the sync engine and an aiosqlite
+  async engine, so data committed on one is visible to the other. Every
+  table is emptied after each test.
+- Overrides FastAPI's `get_db`, `get_async_db` and `get_async_sessionmaker`
+  dependencies so all routes use the test DB.
 - Provides helper fixtures for creating users and getting auth headers.
 """
 
+import os
+import tempfile
+
+# No background compaction passes against the real DATABASE_URL during tests
+os.environ.setdefault("TUTOR_ARCHIVE_INTERVAL_S", "0")
+
 import pytest
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
 from app.db.base_class import Base
 from app.main import app
 
-# Import get_db from the canonical source
-from app.db.session import get_db
+# Import the dependencies from the canonical source
+from app.db.session import get_async_db, get_async_sessionmaker, get_db
+from app.services.problem_catalog import problem_catalog
+from app.services.problem_search import problem_search
+from app.services.solved_index import solved_index
 
 # ============================================================
-# TEST DATABASE (In-memory SQLite)
+# TEST DATABASE (SQLite file, sync + async engines)
 # ============================================================
-SQLALCHEMY_TEST_URL = "sqlite://"  # in-memory
+_DB_FD, _DB_PATH = tempfile.mkstemp(prefix="edai-test-", suffix=".db")
+os.close(_DB_FD)
 
 test_engine = create_engine(
-    SQLALCHEMY_TEST_URL,
+    f"sqlite:///{_DB_PATH}",
     connect_args={"check_same_thread": False},
 )
+# NullPool: aiosqlite connections are bound to the event loop that opened
+# them, and TestClient / asyncio.run use a fresh loop per test.
+test_async_engine = create_async_engine(f"sqlite+aiosqlite:///{_DB_PATH}", poolclass=NullPool)
+
 
-# Enable WAL-like behavior for SQLite foreign keys
-@event.listens_for(test_engine, "connect")
 def _set_sqlite_pragma(dbapi_conn, connection_record):
     cursor = dbapi_conn.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")   # readers don't block the other engine's writer
     cursor.close()
 
+
+event.listen(test_engine, "connect", _set_sqlite_pragma)
+event.listen(test_async_engine.sync_engine, "connect", _set_sqlite_pragma)
+
 TestingSessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=test_engine,
 )
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=test_async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 
 # ============================================================
@@ -57,20 +84,28 @@ def create_tables():
     Base.metadata.create_all(bind=test_engine)
     yield
     Base.metadata.drop_all(bind=test_engine)
+    test_engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DB_PATH + suffix):
+            os.remove(_DB_PATH + suffix)
 
 
 @pytest.fixture()
 def db():
-    """Provide a transactional database session that rolls back after each test."""
-    connection = test_engine.connect()
-    transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    """Provide a database session; every table is emptied after each test."""
+    session = TestingSessionLocal()
 
     yield session
 
+    session.rollback()
     session.close()
-    transaction.rollback()
-    connection.close()
+    with test_engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    # Per-worker caches of what was just deleted
+    problem_catalog.invalidate()
+    problem_search.clear()
+    solved_index.clear()
 
 
 @pytest.fixture()
@@ -84,8 +119,17 @@ def client(db):
         finally:
             pass
 
-    # Single override — session.py is the canonical source
+    async def _override_get_async_db():
+        adb = TestingAsyncSessionLocal()
+        try:
+            yield adb
+        finally:
+            await adb.close()
+
+    # session.py is the canonical source for both
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_async_db] = _override_get_async_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
 
     # Disable rate limiting during tests
     limiter.enabled = False
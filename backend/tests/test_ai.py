@@ -0,0 +1,720 @@
+# tests/test_ai.py
+"""
+Tests for the AI client layer (no network — provider calls are faked):
+  - content-addressed response cache (app/core/llm_cache.py)
+  - provider failover, circuit breaker and hedging (app/core/ai_router.py)
+  - priority / fair-queuing concurrency scheduler (app/core/ai_scheduler.py)
+  - OpenAI token streaming
+  - per-call telemetry (app/core/ai_metrics.py)
+  - local stub provider (app/core/ai_stub.py)
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import ai_client, ai_registry, ai_stub
+from app.core.ai_metrics import AIMetrics, Histogram
+from app.core.ai_router import AIRouter, CircuitBreaker
+from app.core.ai_scheduler import AIScheduler
+from app.core.config import settings
+from app.core.llm_cache import LLMCache, llm_cache, make_key
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+@pytest.fixture()
+def fake_gemini(monkeypatch):
+    """Route Gemini calls to a counting fake and start from an empty cache."""
+    calls = []
+
+    async def _fake_generate(prompt, model_name, temperature, max_tokens):
+        calls.append(prompt)
+        return f"answer #{len(calls)}"
+
+    monkeypatch.setattr(settings, "AI_PROVIDER", "gemini")
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(ai_client, "_gemini_generate", _fake_generate)
+    llm_cache.clear()
+    yield calls
+    llm_cache.clear()
+
+
+# ============================================================
+# RESPONSE CACHE
+# ============================================================
+
+class TestLLMCache:
+    def test_key_depends_on_all_inputs(self):
+        msgs = [{"role": "user", "content": "hi"}]
+        base = make_key("gemini", "m", msgs, 0.0, 100, False)
+        assert base == make_key("gemini", "m", list(msgs), 0.0, 100, False)
+        assert base != make_key("openai", "m", msgs, 0.0, 100, False)
+        assert base != make_key("gemini", "m", msgs, 0.2, 100, False)
+        assert base != make_key("gemini", "m", msgs, 0.0, 200, False)
+        assert base != make_key("gemini", "m", msgs, 0.0, 100, True)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = LLMCache(max_entries=2, ttl_seconds=60)
+        asyncio.run(cache.set("a", "1"))
+        asyncio.run(cache.set("b", "2"))
+        assert asyncio.run(cache.get("a")) == "1"   # touch a → b is now LRU
+        asyncio.run(cache.set("c", "3"))
+        assert asyncio.run(cache.get("b")) is None
+        assert cache.stats["evictions"] == 1
+
+        asyncio.run(cache.set("d", "4", ttl=-1))    # already expired
+        assert asyncio.run(cache.get("d")) is None
+
+    def test_low_temperature_calls_are_cached(self, fake_gemini):
+        first = asyncio.run(ai_client.ask_ai("What is a heap?", temperature=0.0))
+        second = asyncio.run(ai_client.ask_ai("What is a heap?", temperature=0.0))
+        assert first == second == "answer #1"
+        assert len(fake_gemini) == 1
+        assert llm_cache.stats["memory_hits"] == 1
+
+    def test_high_temperature_calls_bypass_cache(self, fake_gemini):
+        asyncio.run(ai_client.ask_ai("Tell me a joke", temperature=0.9))
+        asyncio.run(ai_client.ask_ai("Tell me a joke", temperature=0.9))
+        assert len(fake_gemini) == 2
+
+    def test_per_call_opt_in_and_opt_out(self, fake_gemini):
+        asyncio.run(ai_client.ask_ai("polish", temperature=0.9, cache=True))
+        asyncio.run(ai_client.ask_ai("polish", temperature=0.9, cache=True))
+        assert len(fake_gemini) == 1
+
+        asyncio.run(ai_client.ask_ai("topic", temperature=0.0, cache=False))
+        asyncio.run(ai_client.ask_ai("topic", temperature=0.0, cache=False))
+        assert len(fake_gemini) == 3
+
+
+# ============================================================
+# FAILOVER / CIRCUIT BREAKER / HEDGING
+# ============================================================
+
+@pytest.fixture()
+def router(monkeypatch):
+    """Fresh router with both providers configured and a low breaker threshold."""
+    monkeypatch.setattr(settings, "AI_PROVIDER", "gemini")
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "AI_FAILOVER_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_FALLBACK_PROVIDERS", "gemini,openai")
+    monkeypatch.setattr(settings, "AI_BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "AI_HEDGE_MIN_DELAY_MS", 20)
+    fresh = AIRouter()
+    monkeypatch.setattr(ai_client, "ai_router", fresh)
+    llm_cache.clear()
+    yield fresh
+    llm_cache.clear()
+
+
+class TestAIRouter:
+    def test_breaker_opens_then_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=2, open_seconds=0)
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        assert breaker.allow() is True       # cool-down elapsed → single probe
+        assert breaker.state == "half_open"
+        assert breaker.allow() is False      # second caller waits for the probe
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_order_skips_unconfigured_fallbacks(self, router, monkeypatch):
+        assert router.order() == ["gemini", "openai"]
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+        assert router.order() == ["gemini"]
+
+    def test_stub_is_kept_out_of_failover(self, router, monkeypatch):
+        monkeypatch.setattr(settings, "AI_PROVIDER", "stub")
+        assert router.order() == ["stub"]
+        monkeypatch.setattr(settings, "AI_PROVIDER", "gemini")
+        monkeypatch.setattr(settings, "AI_FALLBACK_PROVIDERS", "stub,openai")
+        assert router.order() == ["gemini", "openai"]
+
+    def test_complete_fails_over_to_openai(self, router, monkeypatch):
+        async def _broken_gemini(*args):
+            raise RuntimeError("gemini down")
+
+        async def _openai(model, messages, temperature, max_tokens, json_mode):
+            return f"openai:{model}"
+
+        monkeypatch.setattr(ai_client, "_gemini_generate", _broken_gemini)
+        monkeypatch.setattr(ai_client, "_openai_complete", _openai)
+
+        text = asyncio.run(ai_client.ask_ai("hi", temperature=0.9))
+        assert text == f"openai:{settings.OPENAI_MODEL}"
+        assert router.failovers == 1
+
+        # Second failure trips gemini's breaker; later calls skip it entirely
+        asyncio.run(ai_client.ask_ai("hi", temperature=0.9))
+        assert router.breakers["gemini"].state == "open"
+        assert router.snapshot()["providers"]["gemini"]["errors"] == 2
+
+    def test_pinned_provider_does_not_fail_over(self, router, monkeypatch):
+        async def _broken_openai(*args):
+            raise RuntimeError("openai down")
+
+        monkeypatch.setattr(ai_client, "_openai_complete", _broken_openai)
+        with pytest.raises(RuntimeError):
+            asyncio.run(ai_client.complete(
+                [{"role": "user", "content": "x"}], provider="openai", model="gpt-4o",
+            ))
+        assert router.failovers == 0
+
+    def test_hedge_returns_faster_provider(self, router, monkeypatch):
+        async def _slow_gemini(*args):
+            await asyncio.sleep(5)
+            return "gemini"
+
+        async def _fast_openai(*args):
+            return "openai"
+
+        monkeypatch.setattr(ai_client, "_gemini_generate", _slow_gemini)
+        monkeypatch.setattr(ai_client, "_openai_complete", _fast_openai)
+
+        text = asyncio.run(ai_client.complete(
+            [{"role": "user", "content": "x"}], temperature=0.9, hedge=True,
+        ))
+        assert text == "openai"
+        assert router.hedges_fired == 1 and router.hedges_won == 1
+        # The cancelled primary neither counts as a failure nor holds a probe slot
+        assert router.breakers["gemini"].consecutive_failures == 0
+
+    def test_cache_hit_does_not_touch_breaker_or_stats(self, router, monkeypatch):
+        messages = [{"role": "user", "content": "x"}]
+        key = make_key("gemini", ai_client.MODEL_TIERS["chat"]["gemini"], messages, 0.0, 1024, False)
+        asyncio.run(llm_cache.set(key, "cached", provider="gemini", model="m"))
+        self._half_open(router.breakers["gemini"])
+
+        assert asyncio.run(ai_client.complete(messages, temperature=0.0)) == "cached"
+        assert router.breakers["gemini"].state == "open"     # no probe happened
+        assert router.breakers["gemini"].allow() is True
+        assert router.stats["gemini"].summary()["calls"] == 0
+
+    def test_scheduler_queueing_is_not_provider_latency(self, router, monkeypatch):
+        monkeypatch.setattr(settings, "AI_SCHEDULER_ENABLED", True)
+        monkeypatch.setattr(settings, "AI_PROVIDER_MAX_CONCURRENCY", 1)
+        scheduler = AIScheduler()
+        monkeypatch.setattr(ai_client, "ai_scheduler", scheduler)
+
+        async def _gemini(*args):
+            return "gemini"
+
+        monkeypatch.setattr(ai_client, "_gemini_generate", _gemini)
+
+        async def _scenario():
+            await scheduler.acquire("gemini", "interactive", "holder")
+            task = asyncio.create_task(ai_client.complete([{"role": "user", "content": "x"}], temperature=0.9))
+            await asyncio.sleep(0.2)
+            scheduler._release("gemini", "interactive")
+            return await task
+
+        assert asyncio.run(_scenario()) == "gemini"
+        assert router.stats["gemini"].latency_percentile(0.5) < 0.1
+
+    def test_json_mode_only_routes_to_json_capable_providers(self, router, monkeypatch):
+        monkeypatch.setattr(settings, "AI_PROVIDER", "openai")
+        gemini_calls = []
+
+        async def _broken_openai(*args):
+            raise RuntimeError("openai down")
+
+        async def _gemini(*args):
+            gemini_calls.append(args)
+            return "not json"
+
+        monkeypatch.setattr(ai_client, "_openai_complete", _broken_openai)
+        monkeypatch.setattr(ai_client, "_gemini_generate", _gemini)
+
+        result = asyncio.run(ai_client.ask_ai("hi", temperature=0.9, json_mode=True))
+        assert result["error"] == "openai_error" and "openai down" in result["message"]
+        assert gemini_calls == []
+
+    def test_stream_fails_over_before_first_token(self, router, monkeypatch):
+        async def _broken_stream(*args):
+            raise RuntimeError("gemini down")
+            yield  # pragma: no cover
+
+        async def _openai_stream(*args):
+            yield "from openai"
+
+        monkeypatch.setattr(ai_client, "_stream_gemini", _broken_stream)
+        monkeypatch.setattr(ai_client, "_stream_openai", _openai_stream)
+
+        async def _collect():
+            return [e async for e in ai_client.stream_ai([{"role": "user", "content": "x"}])]
+
+        events = asyncio.run(_collect())
+        assert events == [{"type": "delta", "text": "from openai"}, {"type": "done"}]
+
+    @staticmethod
+    def _half_open(breaker):
+        breaker.state, breaker.opened_at, breaker.open_seconds = breaker.OPEN, 0.0, 0
+
+    @pytest.mark.parametrize("how", ["aclose", "cancel"])
+    def test_abandoned_stream_releases_half_open_probe(self, router, monkeypatch, how):
+        self._half_open(router.breakers["gemini"])
+
+        async def _slow_stream(*args):
+            yield "first"
+            await asyncio.sleep(10)
+            yield "never"  # pragma: no cover
+
+        monkeypatch.setattr(ai_client, "_stream_gemini", _slow_stream)
+
+        async def _scenario():
+            stream = ai_client.stream_ai([{"role": "user", "content": "x"}])
+            assert await stream.__anext__() == {"type": "delta", "text": "first"}
+            if how == "aclose":
+                await stream.aclose()
+            else:
+                task = asyncio.create_task(stream.__anext__())
+                await asyncio.sleep(0.01)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(_scenario())
+        breaker = router.breakers["gemini"]
+        assert breaker.state == "half_open"
+        assert breaker.allow() is True   # the next request may probe again
+
+    def test_cancelled_hedged_call_cancels_primary(self, router, monkeypatch):
+        cancelled = []
+
+        async def _run(provider):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(provider)
+                raise
+
+        self._half_open(router.breakers["gemini"])
+
+        async def _scenario():
+            task = asyncio.create_task(router.call(_run, hedge=True))
+            await asyncio.sleep(0.005)   # inside the first wait, before the hedge fires
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0)
+            # Not left running until the loop shuts down
+            assert cancelled == ["gemini"]
+            assert router.breakers["gemini"].allow() is True
+
+        asyncio.run(_scenario())
+
+    def test_providers_endpoint_is_admin_only(self, client, user_and_headers, admin_and_headers):
+        _, user_headers = user_and_headers
+        assert client.get("/api/ai/providers", headers=user_headers).status_code == 403
+
+        _, admin_headers = admin_and_headers
+        resp = client.get("/api/ai/providers", headers=admin_headers)
+        assert resp.status_code == 200
+        assert "gemini" in resp.json()["providers"]
+
+
+# ============================================================
+# OPENAI STREAMING
+# ============================================================
+
+class _FakeOpenAIStream:
+    """Async iterator shaped like openai's AsyncStream of ChatCompletionChunk."""
+
+    def __init__(self, pieces):
+        self._chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=p))])
+            for p in pieces
+        ] + [SimpleNamespace(choices=[])]   # trailing usage-only chunk
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for c in self._chunks:
+            yield c
+
+    async def close(self):
+        self.closed = True
+
+
+class TestOpenAIStreaming:
+    def test_streams_deltas_over_full_history(self, router, monkeypatch):
+        seen = {}
+
+        async def _create(**kwargs):
+            seen.update(kwargs)
+            return _FakeOpenAIStream(["Hel", None, "lo"])
+
+        fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+        monkeypatch.setattr(settings, "AI_PROVIDER", "openai")
+        monkeypatch.setattr(ai_registry, "get_openai_client", lambda: fake_client)
+
+        history = [
+            {"role": "user", "content": "What is recursion?"},
+            {"role": "assistant", "content": "A function calling itself."},
+            {"role": "user", "content": "Example?"},
+        ]
+
+        async def _collect():
+            return [e async for e in ai_client.stream_ai(history)]
+
+        events = asyncio.run(_collect())
+        assert events == [
+            {"type": "delta", "text": "Hel"},
+            {"type": "delta", "text": "lo"},
+            {"type": "done"},
+        ]
+        assert seen["stream"] is True
+        assert seen["messages"][0]["role"] == "system"
+        assert seen["messages"][1:] == history
+
+    def test_client_per_loop_is_closed_on_its_own_loop(self, monkeypatch):
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+        monkeypatch.setattr(ai_registry, "_openai_clients", {})
+
+        async def _get():
+            return ai_registry.get_openai_client()
+
+        other = asyncio.new_event_loop()
+        thread = threading.Thread(target=other.run_forever, daemon=True)
+        thread.start()
+        try:
+            theirs = asyncio.run_coroutine_threadsafe(_get(), other).result(5)
+
+            async def _run():
+                ours = await _get()
+                assert await _get() is ours and ours is not theirs
+                assert not theirs.is_closed()       # not replaced by another loop's client
+                await ai_registry.aclose()
+                return ours
+
+            ours = asyncio.run(_run())
+            assert ours.is_closed() and theirs.is_closed()
+        finally:
+            other.call_soon_threadsafe(other.stop)
+            thread.join(5)
+            other.close()
+
+    def test_clients_of_closed_loops_are_dropped(self, monkeypatch):
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+        monkeypatch.setattr(ai_registry, "_openai_clients", {})
+
+        async def _get():
+            return ai_registry.get_openai_client()
+
+        first, second = asyncio.run(_get()), asyncio.run(_get())
+        assert first is not second
+        assert list(ai_registry._openai_clients.values()) == [second]
+
+
+# ============================================================
+# CONCURRENCY SCHEDULER
+# ============================================================
+
+@pytest.fixture()
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "AI_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "AI_PROVIDER_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "AI_BACKGROUND_MAX_CONCURRENCY", 1)
+    return AIScheduler()
+
+
+async def _run_in_order(scheduler, jobs):
+    """Hold the only slot, queue `jobs` as (priority, user, label), record grant order."""
+    granted = []
+
+    async def _job(priority, user_id, label):
+        async with scheduler.slot("gemini", priority, user_id):
+            granted.append(label)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire("gemini", "interactive", "holder")
+    tasks = []
+    for priority, user_id, label in jobs:
+        tasks.append(asyncio.create_task(_job(priority, user_id, label)))
+        await asyncio.sleep(0)       # enqueue in the listed order
+    scheduler._release("gemini", "interactive")
+    await asyncio.gather(*tasks)
+    return granted
+
+
+class TestAIScheduler:
+    def test_interactive_jumps_ahead_of_background(self, scheduler):
+        granted = asyncio.run(_run_in_order(scheduler, [
+            ("background", 1, "bg-1"),
+            ("background", 1, "bg-2"),
+            ("interview", 2, "interview"),
+            ("interactive", 3, "chat"),
+        ]))
+        assert granted == ["chat", "interview", "bg-1", "bg-2"]
+
+    def test_round_robin_across_users(self, scheduler):
+        granted = asyncio.run(_run_in_order(scheduler, [
+            ("background", "alice", "a1"),
+            ("background", "alice", "a2"),
+            ("background", "alice", "a3"),
+            ("background", "bob", "b1"),
+        ]))
+        assert granted == ["a1", "b1", "a2", "a3"]
+
+    def test_background_cap_leaves_room_for_chat(self, scheduler, monkeypatch):
+        monkeypatch.setattr(settings, "AI_MAX_CONCURRENCY", 4)
+        monkeypatch.setattr(settings, "AI_PROVIDER_MAX_CONCURRENCY", 4)
+
+        async def _scenario():
+            await scheduler.acquire("gemini", "background", 1)
+            blocked = asyncio.create_task(scheduler.acquire("gemini", "background", 1))
+            await asyncio.sleep(0)
+            assert not blocked.done()
+            # Chat still gets a slot immediately despite the queued batch call
+            await asyncio.wait_for(scheduler.acquire("gemini", "interactive", 2), 1)
+            blocked.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await blocked
+
+        asyncio.run(_scenario())
+        snap = scheduler.snapshot()
+        assert snap["inflight"] == 2
+        assert snap["classes"]["background"]["queued"] == 0
+        assert snap["classes"]["background"]["max_queued"] == 1
+
+    def test_per_provider_limit(self, scheduler, monkeypatch):
+        monkeypatch.setattr(settings, "AI_MAX_CONCURRENCY", 4)
+
+        async def _scenario():
+            await scheduler.acquire("gemini", "interactive", 1)
+            # gemini is full but openai has its own budget
+            await asyncio.wait_for(scheduler.acquire("openai", "interactive", 1), 1)
+
+        asyncio.run(_scenario())
+        assert scheduler.snapshot()["inflight_by_provider"] == {"gemini": 1, "openai": 1}
+
+    def test_cancelled_waiter_is_skipped_and_slot_returned(self, scheduler):
+        granted = []
+
+        async def _job(label):
+            async with scheduler.slot("gemini", "interactive", label):
+                granted.append(label)
+
+        async def _scenario():
+            await scheduler.acquire("gemini", "interactive", "holder")
+            gone = asyncio.create_task(_job("gone"))
+            waiting = asyncio.create_task(_job("waiting"))
+            await asyncio.sleep(0)
+            # Disconnect: cancelled, but its cleanup has not run when the slot frees up
+            gone.cancel()
+            scheduler._release("gemini", "interactive")
+            await asyncio.gather(gone, waiting, return_exceptions=True)
+
+        asyncio.run(_scenario())
+        assert granted == ["waiting"]
+        snap = scheduler.snapshot()
+        assert snap["inflight"] == 0 and snap["classes"]["interactive"]["queued"] == 0
+
+    @pytest.mark.parametrize("hold", [False, True])
+    def test_stream_slot_is_released_at_first_token(self, scheduler, router, monkeypatch, hold):
+        monkeypatch.setattr(settings, "AI_STREAM_HOLD_SLOT", hold)
+        monkeypatch.setattr(ai_client, "ai_scheduler", scheduler)
+
+        async def _gemini_stream(*args):
+            yield "a"
+            yield "b"
+
+        monkeypatch.setattr(ai_client, "_stream_gemini", _gemini_stream)
+
+        async def _scenario():
+            stream = ai_client.stream_ai([{"role": "user", "content": "x"}])
+            assert await stream.__anext__() == {"type": "delta", "text": "a"}
+            inflight = scheduler.snapshot()["inflight"]
+            await stream.aclose()
+            return inflight
+
+        assert asyncio.run(_scenario()) == (1 if hold else 0)
+        assert scheduler.snapshot()["inflight"] == 0
+
+    def test_complete_releases_slot(self, fake_gemini):
+        from app.core.ai_scheduler import ai_scheduler
+
+        before = ai_scheduler.snapshot()["inflight"]
+        asyncio.run(ai_client.ask_ai("q", temperature=0.9, user_id=7))
+        assert ai_scheduler.snapshot()["inflight"] == before
+
+
+# ============================================================
+# TELEMETRY
+# ============================================================
+
+@pytest.fixture()
+def metrics(monkeypatch):
+    fresh = AIMetrics()
+    monkeypatch.setattr(settings, "AI_METRICS_ENABLED", True)
+    monkeypatch.setattr(ai_client, "ai_metrics", fresh)
+    return fresh
+
+
+class TestAIMetrics:
+    def test_histogram_percentiles(self):
+        h = Histogram((10, 100, 1000))
+        for v in (5, 50, 50, 500):
+            h.observe(v)
+        assert h.percentile(0.5) == 100
+        assert h.percentile(0.95) == 1000
+        assert h.summary()["buckets"] == {"10": 1, "100": 2, "1000": 1, "+Inf": 0}
+
+    def test_complete_records_usage_cache_hits_and_errors(self, fake_gemini, metrics, monkeypatch):
+        asyncio.run(ai_client.ask_ai("What is a heap?", temperature=0.0))
+        asyncio.run(ai_client.ask_ai("What is a heap?", temperature=0.0))   # cache hit
+
+        async def _broken(*args):
+            raise TimeoutError("slow")
+
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", None)   # no failover target
+        monkeypatch.setattr(ai_client, "_gemini_generate", _broken)
+        asyncio.run(ai_client.ask_ai("boom", temperature=0.9))
+
+        [row] = metrics.snapshot()["series"]
+        assert (row["endpoint"], row["provider"], row["mode"]) == ("unknown", "gemini", "complete")
+        assert row["calls"] == 3
+        assert row["cache_hits"] == 1
+        assert row["errors"] == {"TimeoutError": 1}
+        assert row["latency_ms"]["count"] == 1
+        assert row["prompt_tokens"] > 0 and row["completion_tokens"] > 0
+        assert row["cost_usd"] is not None
+
+    def test_stream_records_ttft(self, router, metrics, monkeypatch):
+        async def _stream(*args):
+            yield "a"
+            await asyncio.sleep(0.01)
+            yield "b"
+
+        monkeypatch.setattr(ai_client, "_stream_gemini", _stream)
+
+        async def _collect():
+            return [e async for e in ai_client.stream_ai([{"role": "user", "content": "x"}])]
+
+        asyncio.run(_collect())
+        [row] = metrics.snapshot()["series"]
+        assert row["mode"] == "stream"
+        assert row["ttft_ms"]["count"] == 1
+        assert row["latency_ms"]["mean"] >= row["ttft_ms"]["mean"]
+
+    def test_cancelled_stream_closes_provider_and_counts_saved_tokens(self, router, metrics, monkeypatch):
+        closed = []
+
+        async def _stream(*args):
+            try:
+                yield "abcd"
+                await asyncio.sleep(10)
+                yield "never"
+            finally:
+                closed.append(True)
+
+        monkeypatch.setattr(ai_client, "_stream_gemini", _stream)
+
+        async def _consume_then_cancel():
+            async def _consume():
+                async for _ in ai_client.stream_ai([{"role": "user", "content": "x"}], max_tokens=100):
+                    pass
+
+            task = asyncio.create_task(_consume())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(_consume_then_cancel())
+        assert closed == [True]
+        [row] = metrics.snapshot()["series"]
+        assert row["errors"] == {"ClientDisconnected": 1}
+        assert row["abandoned"] == 1 and row["tokens_saved_est"] == 99
+        # What was generated before the cancel is still spent
+        assert row["completion_tokens"] == 1 and row["prompt_tokens"] == 1
+
+    def test_endpoint_attribution_and_admin_endpoint(self, client, fake_gemini, admin_and_headers, monkeypatch):
+        from app.core.ai_metrics import ai_metrics
+
+        ai_metrics.reset()
+        _, headers = admin_and_headers
+        resp = client.post("/api/ai/ask", json={"prompt": "hello"}, headers=headers)
+        assert resp.status_code == 200
+
+        data = client.get("/api/ai/metrics", headers=headers).json()
+        assert "POST /api/ai/ask" in data["endpoints"]
+
+
+# ============================================================
+# STUB PROVIDER
+# ============================================================
+
+@pytest.fixture()
+def stub(monkeypatch):
+    """AI_PROVIDER=stub with no pacing and no failover to real providers."""
+    monkeypatch.setattr(settings, "AI_PROVIDER", "stub")
+    monkeypatch.setattr(settings, "AI_FAILOVER_ENABLED", False)
+    monkeypatch.setattr(settings, "AI_STUB_TTFT_MS", 0)
+    monkeypatch.setattr(settings, "AI_STUB_TOKENS_PER_SEC", 0)
+    monkeypatch.setattr(settings, "AI_STUB_ERROR_RATE", 0.0)
+    monkeypatch.setattr(ai_client, "ai_router", AIRouter())
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
+
+
+class TestStubProvider:
+    def test_replies_are_deterministic(self, stub):
+        first = asyncio.run(ai_client.ask_ai("Explain recursion", temperature=0.9))
+        second = asyncio.run(ai_client.ask_ai("Explain recursion", temperature=0.9))
+        assert first == second and len(first) > 100
+
+    def test_stream_is_chunked_and_paced(self, stub, monkeypatch):
+        monkeypatch.setattr(settings, "AI_STUB_TTFT_MS", 50)
+        messages = [{"role": "user", "content": "hello"}]
+
+        async def _collect():
+            t0 = time.perf_counter()
+            chunks, ttft = [], None
+            async for e in ai_client.stream_ai(messages):
+                if e["type"] == "delta":
+                    ttft = ttft or time.perf_counter() - t0
+                    chunks.append(e["text"])
+            return chunks, ttft
+
+        chunks, ttft = asyncio.run(_collect())
+        assert len(chunks) > 1
+        assert "".join(chunks) == ai_stub.reply_for(messages, 1024)
+        assert ttft >= 0.05
+
+    def test_error_injection(self, stub, monkeypatch):
+        monkeypatch.setattr(settings, "AI_STUB_ERROR_RATE", 1.0)
+        assert asyncio.run(ai_client.ask_ai("hi")) == "AI error. Try again later."
+
+    def test_roadmap_generation_end_to_end(self, client, stub, user_and_headers):
+        _, headers = user_and_headers
+        resp = client.post(
+            "/api/roadmaps/generate",
+            json={"topic": "Python", "duration_weeks": 12},
+            headers=headers,
+        )
+        assert resp.status_code == 200
+        roadmap = resp.json()["roadmap"]
+        weeks = [w for p in roadmap["phases"] for w in p["weeks"]]
+        assert [w["week_number"] for w in weeks] == list(range(1, 13))
+        assert all(len(w["days"]) == 5 for w in weeks)
+        assert roadmap["total_xp"] == sum(w["week_xp"] for w in weeks)
+
+    def test_mcq_json(self, client, stub, user_and_headers):
+        _, headers = user_and_headers
+        resp = client.post("/api/ai/mcq", json={"topic": "heaps", "count": 3}, headers=headers)
+        assert resp.status_code == 200
+        assert len(resp.json()["questions"]) == 3
@@ -4,10 +4,21 @@ Tests for problem endpoints:
   GET /api/problems
   GET /api/problems/stats
   GET /api/problems/categories
+  GET /api/problems/random
+  and the in-memory catalog snapshot behind them (app/services/problem_catalog.py)
 """
 
-from tests.conftest import _register_user, _get_auth_headers
+from sqlalchemy import event
+
+from tests.conftest import _register_user, _get_auth_headers, test_engine
+from app.core.config import settings
+from app.models.catalog_version import CatalogVersion
 from app.models.problem import Problem
+from app.models.progress import Progress
+from app.models.solved_bitmap import UserSolvedBitmap
+from app.services.problem_catalog import page_ids, problem_catalog, random_id
+from app.services.problem_search import problem_search
+from app.services.solved_index import IdBitmap, bits_from_ids, mark_solved, solved_index
 
 
 # ============================================================
@@ -76,6 +87,33 @@ class TestProblemStats:
         assert "easy_total" in data
         assert "medium_total" in data
 
+    def test_stats_and_profile_stats_share_cached_counts(self, client, user_and_headers, db):
+        _, headers = user_and_headers
+        problems = _seed_problems(db, count=5)   # easy, medium, hard, easy, medium
+        _solve(client, db, headers, problems[0])
+        _solve(client, db, headers, problems[4])
+
+        stats = client.get("/api/problems/stats", headers=headers).json()
+        assert stats == {
+            "total_problems": 5, "total_solved": 2,
+            "easy_solved": 1, "easy_total": 2,
+            "medium_solved": 1, "medium_total": 2,
+            "hard_solved": 0, "hard_total": 1,
+        }
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(test_engine, "before_cursor_execute", listener)
+        try:
+            assert client.get("/api/problems/stats", headers=headers).json() == stats
+            profile = client.get("/api/profile/stats", headers=headers).json()
+        finally:
+            event.remove(test_engine, "before_cursor_execute", listener)
+        assert profile == {"total_problems": 5, "solved": 2, "completion_percentage": 40.0}
+        # Warm caches: only auth hits the database, never the catalog or progress
+        assert statements
+        assert not [s for s in statements if "FROM problems" in s or "FROM progress" in s]
+
 
 # ============================================================
 # CATEGORIES
@@ -87,3 +125,291 @@ class TestCategories:
         _seed_problems(db)
         resp = client.get("/api/problems/categories", headers=headers)
         assert resp.status_code == 200
+
+
+# ============================================================
+# CATALOG SNAPSHOT
+# ============================================================
+
+def _solve(client, db, headers, problem):
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    db.add(Progress(user_id=user_id, problem_id=problem.id, solved=True, attempted=True))
+    mark_solved(db, user_id, [problem.id])
+    db.commit()
+
+
+class TestCatalogSnapshot:
+    def test_filters_status_and_counts_in_memory(self, client, user_and_headers, db):
+        _, headers = user_and_headers
+        problems = _seed_problems(db, count=6)
+        _solve(client, db, headers, problems[0])   # easy / arrays
+
+        def ids(**params):
+            data = client.get("/api/problems", params=params, headers=headers).json()
+            return data["total"], [p["id"] for p in data["problems"]]
+
+        assert ids(difficulty="Easy") == (2, [problems[0].id, problems[3].id])
+        assert ids(difficulty="easy", category="arrays", status="unsolved") == (1, [problems[3].id])
+        assert ids(category="strings", page=2, page_size=1) == (2, [problems[4].id])
+        assert ids(search="PROBLEM 6") == (1, [problems[5].id])
+        assert ids(status="solved") == (1, [problems[0].id])
+
+        listed = client.get("/api/problems", headers=headers).json()["problems"]
+        assert [p["solved"] for p in listed] == [True] + [False] * 5
+
+        stats = client.get("/api/problems/stats", headers=headers).json()
+        assert (stats["total_problems"], stats["total_solved"], stats["easy_solved"]) == (6, 1, 1)
+        assert (stats["easy_total"], stats["medium_total"], stats["hard_total"]) == (2, 2, 2)
+
+        random_pick = client.get(
+            "/api/problems/random", params={"difficulty": "easy", "unsolved_only": True}, headers=headers
+        ).json()
+        assert (random_pick["id"], random_pick["solved"]) == (problems[3].id, False)
+        assert client.get("/api/problems/categories", headers=headers).json() == ["arrays", "strings", "trees"]
+
+    def test_snapshot_is_loaded_once_and_reloaded_on_admin_write(self, client, admin_and_headers, db):
+        _, headers = admin_and_headers
+        _seed_problems(db)
+        loads = problem_catalog.stats["loads"]
+        for _ in range(3):
+            client.get("/api/problems", headers=headers)
+            client.get("/api/problems/categories", headers=headers)
+        assert problem_catalog.stats["loads"] == loads + 1
+
+        resp = client.post("/api/problems", json={
+            "title": "Two Sum", "description": "Find two numbers", "difficulty": "easy", "category": "hashing",
+        }, headers=headers)
+        assert resp.status_code == 200
+        assert db.query(CatalogVersion.version).filter(CatalogVersion.name == "problems").scalar() == 1
+        assert client.get("/api/problems", headers=headers).json()["total"] == 4
+        assert "hashing" in client.get("/api/problems/categories", headers=headers).json()
+        assert problem_catalog.stats["loads"] == loads + 2
+
+    def test_other_workers_writes_seen_after_version_check(self, client, user_and_headers, db, monkeypatch):
+        _, headers = user_and_headers
+        _seed_problems(db)
+        client.get("/api/problems", headers=headers)
+
+        # Another worker adds a problem and bumps the counter; this worker's snapshot is untouched
+        db.add(Problem(title="Extra", description="x", difficulty="hard", category="graphs"))
+        db.add(CatalogVersion(name="problems", version=7))
+        db.commit()
+        assert client.get("/api/problems", headers=headers).json()["total"] == 3
+
+        monkeypatch.setattr(settings, "CATALOG_VERSION_CHECK_S", 0)
+        assert client.get("/api/problems", headers=headers).json()["total"] == 4
+
+    def test_reload_runs_outside_the_lock(self, db, monkeypatch):
+        _seed_problems(db)
+        problem_catalog.invalidate()
+        seen = []
+
+        def _version_while_loading(session):
+            # Another request's write lands while this reload is querying
+            if problem_catalog._lock.acquire(blocking=False):
+                problem_catalog._lock.release()
+                seen.append("unlocked")
+            problem_catalog.invalidate()
+            return 0
+
+        monkeypatch.setattr("app.services.problem_catalog.current_version", _version_while_loading)
+        assert len(problem_catalog.get(db)) == 3
+        assert seen == ["unlocked"]
+        assert problem_catalog._snapshot is None   # the stale load was not kept
+
+
+# ============================================================
+# SEARCH
+# ============================================================
+
+class TestProblemSearch:
+    def _seed(self, db):
+        rows = [
+            ("Binary Tree Level Order", "Traverse a tree breadth first.", "medium", "trees"),
+            ("Merge Intervals", "Sort the intervals, then merge; a binary search is not needed.", "medium", "arrays"),
+            ("Binary Search", "Classic binary search on a sorted array.", "easy", "arrays"),
+            ("Valid Anagram", "Compare character counts.", "easy", "strings"),
+        ]
+        problems = [Problem(title=t, description=d, difficulty=df, category=c) for t, d, df, c in rows]
+        db.add_all(problems)
+        db.commit()
+        return problems
+
+    def _search(self, client, headers, **params):
+        data = client.get("/api/problems", params=params, headers=headers).json()
+        return data["total"], [p["title"] for p in data["problems"]]
+
+    def test_ranked_prefix_search_with_filters(self, client, user_and_headers, db):
+        _, headers = user_and_headers
+        self._seed(db)
+
+        total, titles = self._search(client, headers, search="binary search")
+        assert total == 2
+        assert titles[0] == "Binary Search"          # title hits outrank description hits
+        assert set(titles) == {"Binary Search", "Merge Intervals"}
+
+        assert self._search(client, headers, search="anagr") == (1, ["Valid Anagram"])   # as-you-type
+        assert self._search(client, headers, search="binary", difficulty="easy") == (1, ["Binary Search"])
+        assert self._search(client, headers, search="binary", category="trees") == (1, ["Binary Tree Level Order"])
+        assert self._search(client, headers, search='"OR NEAR(') == (0, [])
+
+    def test_results_follow_catalog_writes_and_are_cached(self, client, admin_and_headers, db):
+        _, headers = admin_and_headers
+        problems = self._seed(db)
+        assert self._search(client, headers, search="anagram")[0] == 1
+        queries = problem_search.stats["queries"]
+        assert self._search(client, headers, search="Anagram ")[0] == 1
+        assert problem_search.stats["queries"] == queries        # served from the cache
+
+        client.put(f"/api/problems/{problems[3].id}", json={"title": "Group Words"}, headers=headers)
+        assert self._search(client, headers, search="anagram") == (0, [])
+        assert self._search(client, headers, search="group") == (1, ["Group Words"])
+
+
+# ============================================================
+# PAGINATION
+# ============================================================
+
+class TestPagination:
+    def test_page_ids_matches_naive_filtering(self):
+        import random
+
+        rng = random.Random(7)
+        ids = sorted(rng.sample(range(1, 500), 120))
+        solved = set(rng.sample(ids, 30)) | {999}
+        # A plain set, and the solved bitmap with the filter's bitmap
+        variants = [(solved, None), (IdBitmap.from_ids(solved), bits_from_ids(ids))]
+        for status in (None, "solved", "unsolved"):
+            expected = [
+                pid for pid in ids
+                if status is None or (pid in solved) == (status == "solved")
+            ]
+            for solved_arg, ids_bits in variants:
+                for limit in (1, 7, 50):
+                    # page mode
+                    for offset in range(0, len(expected) + limit, limit):
+                        page, total, _ = page_ids(
+                            ids, solved_arg, status, limit, offset=offset, ids_bits=ids_bits
+                        )
+                        assert (page, total) == (expected[offset:offset + limit], len(expected))
+                    # cursor mode walks the same sequence
+                    walked, after = [], None
+                    while True:
+                        page, _, after = page_ids(
+                            ids, solved_arg, status, limit, after_id=after, ids_bits=ids_bits
+                        )
+                        walked += page
+                        if after is None:
+                            break
+                    assert walked == expected
+
+    def test_cursor_mode_over_the_api(self, client, user_and_headers, db):
+        _, headers = user_and_headers
+        problems = _seed_problems(db, count=7)
+        _solve(client, db, headers, problems[1])
+
+        seen, cursor = [], None
+        while True:
+            params = {"page_size": 2, "status": "unsolved"}
+            if cursor:
+                params["cursor"] = cursor
+            data = client.get("/api/problems", params=params, headers=headers).json()
+            assert data["total"] == 6
+            seen += [p["id"] for p in data["problems"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == [p.id for p in problems if p is not problems[1]]
+
+        page3 = client.get("/api/problems", params={"page": 3, "page_size": 2, "status": "unsolved"}, headers=headers)
+        assert [p["id"] for p in page3.json()["problems"]] == seen[4:6]
+
+        bad = client.get("/api/problems", params={"cursor": "not-a-cursor"}, headers=headers)
+        assert bad.status_code == 400
+
+
+# ============================================================
+# SOLVED BITMAPS (app/services/solved_index.py)
+# ============================================================
+
+class TestSolvedIndex:
+    def test_id_bitmap(self):
+        ids = [0, 3, 8, 9, 700]
+        bitmap = IdBitmap.from_ids(ids)
+        assert list(bitmap) == ids
+        assert len(bitmap) == 5
+        assert 700 in bitmap and 7 not in bitmap and 10_000 not in bitmap and -1 not in bitmap
+        assert list(IdBitmap.from_bytes(bitmap.to_bytes())) == ids
+        assert bitmap.count_in(bits_from_ids([3, 9, 11])) == 2
+
+    def test_practice_completion_updates_bitmap_and_views(self, client, user_and_headers, db):
+        _, headers = user_and_headers
+        problems = _seed_problems(db, count=6)   # easy/arrays: problems[0], problems[3]
+        user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+        assert client.get("/api/problems/stats", headers=headers).json()["total_solved"] == 0
+
+        resp = client.post(f"/api/progress/problem/{problems[0].id}/complete", headers=headers)
+        assert resp.status_code == 200
+        stored = db.get(UserSolvedBitmap, user_id)
+        assert list(IdBitmap.from_bytes(stored.bitmap)) == [problems[0].id]
+
+        stats = client.get("/api/problems/stats", headers=headers).json()
+        assert (stats["total_solved"], stats["easy_solved"], stats["medium_solved"]) == (1, 1, 0)
+        solved = client.get("/api/problems", params={"status": "solved"}, headers=headers).json()
+        assert [p["id"] for p in solved["problems"]] == [problems[0].id]
+        assert client.get(f"/api/problems/{problems[0].id}", headers=headers).json()["solved"] is True
+        assert client.get("/api/dashboard/summary", headers=headers).json()["problems_solved"] == 1
+
+        # "Unsolved in category X": only problems[3] is left in easy/arrays
+        for _ in range(5):
+            pick = client.get(
+                "/api/problems/random", params={"category": "arrays", "unsolved_only": True}, headers=headers
+            ).json()
+            assert pick["id"] == problems[3].id
+
+        # Completing again changes nothing
+        version = stored.version
+        client.post(f"/api/progress/problem/{problems[0].id}/complete", headers=headers)
+        db.expire_all()
+        assert db.get(UserSolvedBitmap, user_id).version == version
+
+    def test_built_from_progress_then_revalidated_by_version(self, client, user_and_headers, db, monkeypatch):
+        _, headers = user_and_headers
+        problems = _seed_problems(db, count=3)
+        user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+        # Solved before bitmaps existed: no row, built from progress
+        db.add(Progress(user_id=user_id, problem_id=problems[0].id, solved=True))
+        db.commit()
+        builds = solved_index.stats["builds"]
+        assert list(solved_index.get(db, user_id)) == [problems[0].id]
+        assert solved_index.stats["builds"] == builds + 1
+
+        # A solve committed by another worker: this worker's cache is not told
+        db.add(UserSolvedBitmap(
+            user_id=user_id, version=1, bitmap=IdBitmap.from_ids([problems[0].id, problems[2].id]).to_bytes()
+        ))
+        db.commit()
+
+        monkeypatch.setattr(settings, "SOLVED_INDEX_CHECK_S", 60)
+        assert list(solved_index.get(db, user_id)) == [problems[0].id]   # still trusted
+        monkeypatch.setattr(settings, "SOLVED_INDEX_CHECK_S", 0)
+        assert list(solved_index.get(db, user_id)) == [problems[0].id, problems[2].id]
+
+    def test_random_id_is_uniform_over_unsolved(self):
+        import random
+        from collections import Counter
+
+        rng = random.Random(3)
+        ids = list(range(10, 60))
+        ids_bits = bits_from_ids(ids)
+        assert random_id([], None, 0, rng) is None
+        assert set(random_id(ids, None, ids_bits, rng) for _ in range(500)) == set(ids)
+
+        # Mostly solved, so most picks go through the counting fallback
+        for unsolved in ([10], [59], [10, 33, 59], ids[::7]):
+            exclude = IdBitmap.from_ids(set(ids) - set(unsolved) | {5, 99})
+            counts = Counter(random_id(ids, exclude, ids_bits, rng) for _ in range(300 * len(unsolved)))
+            assert set(counts) == set(unsolved)
+            assert min(counts.values()) > 200
+
+        assert random_id(ids, IdBitmap.from_ids(ids), ids_bits, rng) is None
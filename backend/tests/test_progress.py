@@ -77,3 +77,29 @@ class TestAdminStats:
         _, headers = user_and_headers
         resp = client.get("/api/progress/admin-stats", headers=headers)
         assert resp.status_code == 403
+
+
+# ============================================================
+# RESET PROGRESS
+# ============================================================
+
+class TestResetProgress:
+    def test_reset_clears_solved_state(self, client, user_and_headers, admin_and_headers, db):
+        _, headers = user_and_headers
+        _, admin_headers = admin_and_headers
+        problem = _seed_problem(db)
+        user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+
+        client.post(f"/api/progress/problem/{problem.id}/complete", headers=headers)
+        assert client.get("/api/problems/stats", headers=headers).json()["total_solved"] == 1
+
+        resp = client.post(f"/api/progress/user/{user_id}/reset", headers=admin_headers)
+        assert resp.json()["message"] == "Progress reset successfully"
+
+        assert client.get("/api/problems/stats", headers=headers).json()["total_solved"] == 0
+        solved = client.get("/api/problems", params={"status": "solved"}, headers=headers).json()
+        assert solved["problems"] == []
+        assert client.get("/api/dashboard/summary", headers=headers).json()["problems_solved"] == 0
+        pick = client.get("/api/problems/random", params={"unsolved_only": True}, headers=headers).json()
+        assert pick["id"] == problem.id
+        assert client.get("/api/progress/user/me", headers=headers).json()["completed_problems"] == []
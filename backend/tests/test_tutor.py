@@ -0,0 +1,898 @@
+# tests/test_tutor.py
+"""
+Tests for tutor conversation handling (app/services/tutor_service.py):
+  - token-budgeted context building and rolling summaries
+  - SSE chat streams (no DB connection held while streaming)
+  - write-behind message persistence (app/services/tutor_writer.py)
+  - keyset-paginated message history and the conversation list
+  - cold storage of idle conversations (app/services/tutor_archive.py)
+  - full-text search over a user's messages (app/services/tutor_search.py)
+  - the async session path (app/db/session.py get_async_db)
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.core.ai_metrics import estimate_tokens
+from app.core.config import settings
+from app.db.models_tutor import Conversation, ConversationArchive, TutorMessage
+from app.services import tutor_archive, tutor_service
+from app.services.tutor_writer import TutorWriter
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def _conversation(db, turns):
+    conv = tutor_service.create_conversation(db, user_id=None)
+    for role, content in turns:
+        tutor_service.add_message(db, conv.id, role, content)
+    return conv
+
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(len(m["content"])) for m in messages)
+
+
+@pytest.fixture()
+def no_background_summaries(monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(tutor_service, "schedule_summary_refresh", scheduled.append)
+    return scheduled
+
+
+# ============================================================
+# CONTEXT BUILDER
+# ============================================================
+
+class TestContextBuilder:
+    def test_short_history_is_sent_verbatim_without_duplicating_prompt(self, db, no_background_summaries):
+        conv = _conversation(db, [
+            ("user", "What is a stack?"),
+            ("assistant", "LIFO structure."),
+            ("user", "And a queue?"),
+        ])
+        messages = tutor_service.build_contextual_messages(db, conv.id, "And a queue?")
+        assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+        assert messages[-1]["content"] == "And a queue?"
+        assert no_background_summaries == []
+
+    def test_prompt_stays_within_budget(self, db, monkeypatch, no_background_summaries):
+        monkeypatch.setattr(settings, "TUTOR_CONTEXT_TOKEN_BUDGET", 500)
+        monkeypatch.setattr(settings, "TUTOR_CONTEXT_MESSAGE_MAX_TOKENS", 200)
+        dump = "x = 1\n" * 5000   # a pasted code dump
+        conv = _conversation(db, [("user", dump), ("assistant", "ok")] * 8)
+
+        messages = tutor_service.build_contextual_messages(db, conv.id, "next question")
+        assert _prompt_tokens(messages) <= 500
+        assert all(len(m["content"]) <= 200 * 4 + 100 for m in messages)
+        assert messages[-1]["content"] == "next question"
+        assert no_background_summaries == [conv.id]
+
+    def test_summary_replaces_folded_turns(self, db, monkeypatch):
+        monkeypatch.setattr(settings, "TUTOR_SUMMARY_KEEP_RECENT", 2)
+        monkeypatch.setattr(settings, "TUTOR_SUMMARY_MIN_TOKENS", 1)
+        prompts = []
+
+        async def _fake_complete(messages, **kwargs):
+            prompts.append(messages[0]["content"])
+            assert kwargs["priority"] == "background"
+            return "Student is learning graphs; BFS explained."
+
+        monkeypatch.setattr(tutor_service, "complete", _fake_complete)
+        conv = _conversation(db, [
+            ("user", "What is BFS?"),
+            ("assistant", "Breadth-first search ..."),
+            ("user", "And DFS?"),
+            ("assistant", "Depth-first search ..."),
+        ])
+
+        assert asyncio.run(tutor_service.refresh_summary(conv.id, db=db)) is True
+        assert "What is BFS?" in prompts[0] and "And DFS?" not in prompts[0]
+        conv = db.query(Conversation).filter(Conversation.id == conv.id).one()
+        assert conv.summary.startswith("Student is learning graphs")
+
+        messages = tutor_service.build_contextual_messages(db, conv.id, "Compare them")
+        assert messages[1]["content"].endswith("BFS explained.")
+        assert [m["content"] for m in messages[2:]] == [
+            "And DFS?", "Depth-first search ...", "Compare them",
+        ]
+
+    def test_summary_waits_for_enough_old_text(self, db, monkeypatch):
+        monkeypatch.setattr(settings, "TUTOR_SUMMARY_KEEP_RECENT", 1)
+
+        async def _fail(*args, **kwargs):
+            raise AssertionError("should not summarise yet")
+
+        monkeypatch.setattr(tutor_service, "complete", _fail)
+        conv = _conversation(db, [("user", "hi"), ("assistant", "hello")])
+        assert asyncio.run(tutor_service.refresh_summary(conv.id, db=db)) is False
+
+    def test_summary_folds_a_bounded_batch_per_refresh(self, db, monkeypatch):
+        monkeypatch.setattr(settings, "TUTOR_SUMMARY_KEEP_RECENT", 2)
+        monkeypatch.setattr(settings, "TUTOR_SUMMARY_MIN_TOKENS", 1)
+        monkeypatch.setattr(settings, "TUTOR_SUMMARY_BATCH_MESSAGES", 3)
+        prompts = []
+
+        async def _fake_complete(messages, **kwargs):
+            prompts.append(messages[0]["content"].split("New turns:\n")[1])
+            return f"summary {len(prompts)}"
+
+        monkeypatch.setattr(tutor_service, "complete", _fake_complete)
+        conv = _conversation(db, [("user", f"m{i}") for i in range(8)])
+
+        for _ in range(3):
+            asyncio.run(tutor_service.refresh_summary(conv.id, db=db))
+        assert prompts == ["User: m0\nUser: m1\nUser: m2", "User: m3\nUser: m4\nUser: m5"]
+        upto_id = db.query(Conversation.summary_upto_id).filter(Conversation.id == conv.id).scalar()
+        assert [m.content for m in _stored(db, conv.id) if m.id == upto_id] == ["m5"]
+
+
+# ============================================================
+# STREAMING ENDPOINTS
+# ============================================================
+
+@pytest.fixture()
+def stub_ai(monkeypatch):
+    monkeypatch.setattr(settings, "AI_PROVIDER", "stub")
+    monkeypatch.setattr(settings, "AI_FAILOVER_ENABLED", False)
+    monkeypatch.setattr(settings, "AI_STUB_TTFT_MS", 0)
+    monkeypatch.setattr(settings, "AI_STUB_TOKENS_PER_SEC", 0)
+
+
+def _sse_events(resp):
+    return [json.loads(line[6:]) for line in resp.text.splitlines() if line.startswith("data: ")]
+
+
+class TestChatStream:
+    def test_stream_releases_session_and_saves_reply(self, client, db, stub_ai, user_and_headers, monkeypatch):
+        from app.api import routes_ai
+        from app.db.models_tutor import TutorMessage
+
+        in_tx_during_stream = []
+        real_stream = routes_ai.stream_ai
+
+        async def _spy(**kwargs):
+            in_tx_during_stream.append(db.in_transaction())
+            async for evt in real_stream(**kwargs):
+                yield evt
+
+        monkeypatch.setattr(routes_ai, "stream_ai", _spy)
+        _, headers = user_and_headers
+        resp = client.post("/api/ai/chat/stream", json={"message": "What is a trie?"}, headers=headers)
+        assert resp.status_code == 200
+
+        events = _sse_events(resp)
+        assert events[0]["type"] == "conv" and events[-1]["type"] == "done"
+        assert in_tx_during_stream == [False]
+
+        rows = (
+            db.query(TutorMessage)
+            .filter(TutorMessage.conversation_id == events[0]["conversation_id"])
+            .order_by(TutorMessage.id)
+            .all()
+        )
+        assert [r.role for r in rows] == ["user", "assistant"]
+        assert rows[1].content == events[-1]["full_text"]
+
+
+async def _collect(agen):
+    return [evt async for evt in agen]
+
+
+async def _deltas(texts, gap=0.0):
+    for t in texts:
+        if gap:
+            await asyncio.sleep(gap)
+        yield {"type": "delta", "text": t}
+    yield {"type": "done", "usage": None}
+
+
+class TestSSECoalescing:
+    def test_burst_is_merged_after_first_delta(self):
+        from app.core import sse
+
+        out = asyncio.run(_collect(sse.coalesce(_deltas(list("abcdef")), window_ms=50, max_bytes=1024)))
+        assert out[0] == {"type": "delta", "text": "a"}          # TTFT unchanged
+        assert out[1] == {"type": "delta", "text": "bcdef"}
+        assert out[-1]["type"] == "done"
+
+    def test_window_and_byte_limit_flush(self):
+        from app.core import sse
+
+        slow = asyncio.run(_collect(sse.coalesce(_deltas(["a", "b", "c"], gap=0.03), window_ms=5)))
+        assert [e["text"] for e in slow if e["type"] == "delta"] == ["a", "b", "c"]
+
+        capped = asyncio.run(_collect(sse.coalesce(_deltas(["x"] + ["yy"] * 4), window_ms=1000, max_bytes=4)))
+        assert [e["text"] for e in capped if e["type"] == "delta"] == ["x", "yyyy", "yyyy"]
+
+    def test_upstream_error_is_reraised_after_pending_text(self):
+        from app.core import sse
+
+        async def _broken():
+            yield {"type": "delta", "text": "a"}
+            yield {"type": "delta", "text": "b"}
+            raise RuntimeError("upstream died")
+
+        async def _run():
+            seen = []
+            with pytest.raises(RuntimeError):
+                async for evt in sse.coalesce(_broken(), window_ms=1000):
+                    seen.append(evt["text"])
+            return seen
+
+        assert asyncio.run(_run()) == ["a", "b"]
+
+    def test_stream_counts_frames_and_bytes(self, client, db, stub_ai, user_and_headers, monkeypatch):
+        from app.core import sse
+
+        monkeypatch.setattr(sse, "sse_stats", sse.SSEStats())
+        _, headers = user_and_headers
+        resp = client.post("/api/ai/chat/stream", json={"message": "Explain heaps"}, headers=headers)
+        events = _sse_events(resp)
+
+        stats = sse.sse_stats.snapshot()
+        assert stats["frames"] == len(events) and stats["bytes"] == len(resp.content)
+        assert stats["deltas_in"] >= len(events) - 2 and stats["active"] == 0
+
+
+def _sse_ids(resp):
+    return [int(line[4:]) for line in resp.text.splitlines() if line.startswith("id: ")]
+
+
+class TestResumableStream:
+    def test_reconnect_replays_without_new_ai_call(self, client, db, stub_ai, user_and_headers, monkeypatch):
+        from app.api import routes_ai
+
+        calls = []
+        real_stream = routes_ai.stream_ai
+
+        def _counting(**kwargs):
+            calls.append(kwargs)
+            return real_stream(**kwargs)
+
+        monkeypatch.setattr(routes_ai, "stream_ai", _counting)
+        _, headers = user_and_headers
+        first = client.post("/api/ai/chat/stream", json={"message": "Explain tries"}, headers=headers)
+        events, ids = _sse_events(first), _sse_ids(first)
+        conv_id = events[0]["conversation_id"]
+        assert ids == sorted(ids) and len(set(ids)) == len(ids) == len(events)
+
+        resumed = client.post(
+            "/api/ai/chat/stream",
+            json={"message": "Explain tries", "conversation_id": conv_id},
+            headers={**headers, "Last-Event-ID": str(ids[1])},
+        )
+        assert _sse_events(resumed) == events[2:]
+        assert _sse_ids(resumed) == ids[2:]
+
+        via_get = client.get(f"/api/ai/chat/stream/{conv_id}/resume?last_event_id={ids[0]}", headers=headers)
+        assert _sse_events(via_get) == events[1:]
+
+        assert len(calls) == 1
+        history = client.get(f"/api/ai/conversations/{conv_id}", headers=headers).json()
+        assert [m["role"] for m in history["messages"]] == ["user", "assistant"]
+
+    def test_reply_is_saved_in_its_own_session(self, client, db, stub_ai, user_and_headers, monkeypatch):
+        sessions = {}
+        real_add = tutor_service.add_message
+
+        def _spy(session, conv_id, role, content):
+            sessions[role] = session
+            return real_add(session, conv_id, role, content)
+
+        monkeypatch.setattr(tutor_service, "add_message", _spy)
+        _, headers = user_and_headers
+        resp = client.post("/api/ai/chat/stream", json={"message": "Explain tries"}, headers=headers)
+        conv_id = _sse_events(resp)[0]["conversation_id"]
+
+        # The request's session is closed before streaming; the reply gets a new one
+        assert sessions["assistant"] is not sessions["user"]
+        history = client.get(f"/api/ai/conversations/{conv_id}", headers=headers).json()
+        assert [m["role"] for m in history["messages"]] == ["user", "assistant"]
+
+    def test_event_ids_keep_increasing_after_prune(self, monkeypatch):
+        from app.core.stream_replay import StreamHub
+
+        monkeypatch.setattr(settings, "STREAM_REPLAY_MAX_STREAMS", 1)
+
+        async def _reply(text):
+            yield {"type": "delta", "text": text}
+
+        async def _run():
+            hub = StreamHub()
+            streams = []
+            for conv_id in (1, 2, 3, 1):     # conv 1 is pruned when conv 3 starts
+                streams.append(hub.start(conv_id, None, _reply("x")))
+                await asyncio.wait_for(streams[-1].task, 1)
+            return streams
+
+        first, _, _, again = asyncio.run(_run())
+        assert again.first_id > first.last_id
+
+    def test_new_turn_supersedes_running_stream(self, monkeypatch):
+        from app.core import sse
+        from app.core.stream_replay import StreamHub
+
+        async def _run():
+            cancelled, saved = [], []
+            hub = StreamHub()
+            old = hub.start(7, 1, sse.reply_events(_slow_reply(cancelled), conv_id=7, on_finish=saved.append))
+            await asyncio.sleep(0.05)        # first delta published
+            new = hub.start(7, 1, sse.reply_events(_quick_reply("Fresh answer"), conv_id=7, on_finish=saved.append))
+            await asyncio.wait_for(asyncio.gather(old.task, new.task), 1)
+            resumed = [f async for f in hub.get(7).follow(after_id=new.first_id)]
+            return hub, old, new, cancelled, saved, resumed
+
+        hub, old, new, cancelled, saved, resumed = asyncio.run(_run())
+        assert cancelled == [True] and saved == ["Partial answer", "Fresh answer"]
+        assert hub.get(7) is new and new.first_id > old.last_id
+        # A client of the old answer can't be resumed into the new one
+        assert not any(new.covers(i) for i in range(old.first_id - 1, old.last_id + 1))
+        assert b"Fresh answer" in b"".join(resumed) and b"Partial" not in b"".join(resumed)
+
+    def test_resume_with_an_earlier_turns_id_is_gone(self, client, db, stub_ai, user_and_headers):
+        _, headers = user_and_headers
+        first = client.post("/api/ai/chat/stream", json={"message": "Explain tries"}, headers=headers)
+        conv_id = _sse_events(first)[0]["conversation_id"]
+        second = client.post(
+            "/api/ai/chat/stream", json={"message": "And heaps?", "conversation_id": conv_id}, headers=headers
+        )
+        assert min(_sse_ids(second)) > max(_sse_ids(first))
+
+        resumed = client.get(
+            f"/api/ai/chat/stream/{conv_id}/resume?last_event_id={max(_sse_ids(first))}", headers=headers
+        )
+        assert resumed.status_code == 410
+
+    def test_unknown_stream_is_gone(self, client, user_and_headers):
+        _, headers = user_and_headers
+        resp = client.get("/api/ai/chat/stream/999999/resume", headers={**headers, "Last-Event-ID": "3"})
+        assert resp.status_code == 410
+
+    def test_evicted_position_resyncs_with_full_text(self):
+        from app.core.stream_replay import ReplayStream
+
+        async def _run():
+            stream = ReplayStream(conv_id=1, user_id=1, first_id=1, max_events=2)
+            for text in ("a", "b", "c", "d"):
+                stream.publish({"type": "delta", "text": text})
+            stream.close()
+            return [f async for f in stream.follow(after_id=1)]
+
+        frames = [f.decode() for f in asyncio.run(_run())]
+        assert frames[0].startswith("id: 2\n") and '"full_text":"ab"' in frames[0]
+        assert [f.split("\n")[0] for f in frames[1:]] == ["id: 3", "id: 4"]
+
+
+
+async def _slow_reply(cancelled):
+    try:
+        yield {"type": "delta", "text": "Partial answer"}
+        await asyncio.sleep(10)
+        yield {"type": "delta", "text": " never sent"}
+        yield {"type": "done"}
+    except asyncio.CancelledError:
+        cancelled.append(True)
+        raise
+
+
+async def _quick_reply(text):
+    yield {"type": "delta", "text": text}
+    yield {"type": "done"}
+
+
+class TestUpstreamCancellation:
+    def test_abort_cancels_upstream_without_waiting_for_a_chunk(self):
+        from app.core import sse
+
+        async def _run():
+            cancelled, abort = [], asyncio.Event()
+            seen = []
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            async for evt in sse.coalesce(_slow_reply(cancelled), abort=abort):
+                seen.append(evt)
+                abort.set()
+            return seen, cancelled, loop.time() - started
+
+        seen, cancelled, elapsed = asyncio.run(_run())
+        assert [e["text"] for e in seen] == ["Partial answer"]
+        assert cancelled == [True] and elapsed < 1
+
+    def test_abandoned_replay_stream_is_cancelled_and_partial_saved(self, monkeypatch):
+        from app.core import sse
+        from app.core.stream_replay import StreamHub
+
+        monkeypatch.setattr(settings, "STREAM_ABANDON_GRACE_MS", 0)
+
+        async def _run():
+            cancelled, saved = [], []
+            stream = StreamHub().start(
+                7, None, sse.reply_events(_slow_reply(cancelled), conv_id=7, on_finish=saved.append)
+            )
+            stream.attach()
+            await asyncio.sleep(0.05)        # first delta published
+            stream.detach()                  # last client gone
+            await asyncio.wait_for(stream.task, 1)
+            return stream, cancelled, saved
+
+        stream, cancelled, saved = asyncio.run(_run())
+        assert stream.done and cancelled == [True]
+        assert saved == ["Partial answer"]
+
+    def test_abandoned_stream_frees_half_open_breaker_probe(self, monkeypatch):
+        from app.core import ai_client, sse
+        from app.core.ai_router import AIRouter
+        from app.core.stream_replay import StreamHub
+
+        monkeypatch.setattr(settings, "STREAM_ABANDON_GRACE_MS", 0)
+        monkeypatch.setattr(settings, "AI_PROVIDER", "gemini")
+        monkeypatch.setattr(settings, "GEMINI_API_KEY", "test-key")
+        monkeypatch.setattr(settings, "AI_FAILOVER_ENABLED", False)
+        router = AIRouter()
+        monkeypatch.setattr(ai_client, "ai_router", router)
+        breaker = router.breakers["gemini"]
+        breaker.state, breaker.opened_at, breaker.open_seconds = breaker.OPEN, 0.0, 0
+
+        async def _slow_gemini(*args):
+            yield "Partial answer"
+            await asyncio.sleep(10)
+            yield " never sent"  # pragma: no cover
+
+        monkeypatch.setattr(ai_client, "_stream_gemini", _slow_gemini)
+
+        async def _run():
+            saved = []
+            events = ai_client.stream_ai([{"role": "user", "content": "x"}])
+            stream = StreamHub().start(7, None, sse.reply_events(events, conv_id=7, on_finish=saved.append))
+            stream.attach()
+            await asyncio.sleep(0.05)        # the half-open probe is streaming
+            stream.detach()                  # last client gone: generation cancelled
+            await asyncio.wait_for(stream.task, 1)
+            return saved
+
+        assert asyncio.run(_run()) == ["Partial answer"]
+        # One disconnect must not leave the provider disabled
+        assert breaker.state == "half_open" and breaker.allow() is True
+
+    def test_grace_period_allows_reattach(self, monkeypatch):
+        from app.core import sse
+        from app.core.stream_replay import StreamHub
+
+        monkeypatch.setattr(settings, "STREAM_ABANDON_GRACE_MS", 20)
+
+        async def _run():
+            cancelled = []
+            stream = StreamHub().start(
+                8, None, sse.reply_events(_slow_reply(cancelled), conv_id=8, on_finish=lambda t: None)
+            )
+            stream.attach()
+            stream.detach()
+            stream.attach()                  # resumed within the grace period
+            await asyncio.sleep(0.05)
+            alive = not stream.task.done()
+            stream.task.cancel()
+            return alive
+
+        assert asyncio.run(_run()) is True
+
+
+# ============================================================
+# WRITE-BEHIND
+# ============================================================
+
+@pytest.fixture()
+def writer(db, monkeypatch):
+    monkeypatch.setattr(settings, "TUTOR_WRITE_BEHIND", True)
+    monkeypatch.setattr(settings, "TUTOR_WRITE_BEHIND_INTERVAL_MS", 10_000)
+    w = TutorWriter(session_factory=TestingSessionLocal)
+    monkeypatch.setattr(tutor_service, "tutor_writer", w)
+    return w
+
+
+def _stored(db, conv_id):
+    return (
+        db.query(TutorMessage)
+        .filter(TutorMessage.conversation_id == conv_id)
+        .order_by(TutorMessage.id)
+        .all()
+    )
+
+
+class TestWriteBehind:
+    def test_messages_are_batched_into_one_flush(self, db, writer):
+        conv = tutor_service.create_conversation(db, user_id=None)
+
+        async def _run():
+            for i in range(5):
+                tutor_service.add_message(db, conv.id, "user", f"m{i}")
+            assert _stored(db, conv.id) == []
+            return await writer.flush()
+
+        assert asyncio.run(_run()) == 5
+        assert [m.content for m in _stored(db, conv.id)] == [f"m{i}" for i in range(5)]
+        assert writer.stats["batches"] == 1
+
+    def test_reads_include_unflushed_messages(self, db, writer, no_background_summaries):
+        conv = tutor_service.create_conversation(db, user_id=None)
+        tutor_service.add_message(db, conv.id, "user", "stored")   # no loop: direct write
+
+        async def _run():
+            tutor_service.add_message(db, conv.id, "assistant", "buffered")
+            history = tutor_service.get_conversation_messages(db, conv.id)
+            context = tutor_service.build_contextual_messages(db, conv.id, "next")
+            await writer.aclose()
+            return history, context
+
+        history, context = asyncio.run(_run())
+        assert [m.content for m in history] == ["stored", "buffered"]
+        assert [m["content"] for m in context[1:]] == ["stored", "buffered", "next"]
+        assert tutor_service.get_conversation_messages(db, conv.id)[-1].id is not None
+
+    def test_shutdown_drains_buffer(self, db, writer):
+        conv = tutor_service.create_conversation(db, user_id=None)
+
+        async def _run():
+            tutor_service.add_message(db, conv.id, "user", "hello")
+            tutor_service.add_message(db, conv.id, "assistant", "hi")
+            await writer.aclose()
+
+        asyncio.run(_run())
+        assert [m.role for m in _stored(db, conv.id)] == ["user", "assistant"]
+        assert writer.stats["flushed"] == 2
+
+    def test_concurrent_reads_on_the_event_loop_do_not_block(self, db, writer):
+        conv = _conversation(db, [("user", "q"), ("assistant", "a")])
+
+        async def _run():
+            tutor_service.add_message(db, conv.id, "user", "buffered")
+
+            async def _read():
+                adb = TestingAsyncSessionLocal()
+                try:
+                    return await adb.run_sync(tutor_service.get_recent_messages, conv.id, 10)
+                finally:
+                    await adb.close()
+
+            # Readers share the loop's thread (run_sync is a greenlet), so no
+            # lock may be held while one of them awaits its query
+            results = await asyncio.wait_for(asyncio.gather(*(_read() for _ in range(5))), timeout=10)
+            await writer.aclose()
+            return results
+
+        for messages in asyncio.run(_run()):
+            assert [m.content for m in messages] == ["buffered", "a", "q"]
+
+    def test_read_during_commit_sees_each_row_once(self, db, writer):
+        conv = _conversation(db, [("user", "q")])
+
+        async def _run():
+            tutor_service.add_message(db, conv.id, "assistant", "a")
+            return await writer.flush()
+
+        def _query_while_flushing():
+            # A batch commits between the reader's snapshot and its query
+            if not flushed:
+                flushed.append(asyncio.run(_run()))
+            return _stored(db, conv.id)
+
+        flushed = []
+        rows, pending = writer.read(conv.id, _query_while_flushing)
+        assert flushed == [1]
+        assert [m.content for m in rows] == ["q", "a"] and pending == []
+
+    def test_fallback_read_keeps_repeated_messages(self, db, writer, monkeypatch):
+        monkeypatch.setattr("app.services.tutor_writer._READ_ATTEMPTS", 1)
+        conv = _conversation(db, [("user", "yes")])
+
+        async def _enqueue():
+            tutor_service.add_message(db, conv.id, "user", "yes")
+
+        asyncio.run(_enqueue())
+
+        def _query_then_flush():
+            # The buffered "yes" commits after the query ran, so the reader
+            # gives up and must not mistake it for the stored "yes"
+            rows = _stored(db, conv.id)
+            flushed.append(asyncio.run(writer.flush()))
+            return rows
+
+        flushed = []
+        rows, pending = writer.read(conv.id, _query_then_flush)
+        assert flushed == [1]
+        assert [m.content for m in rows + pending] == ["yes", "yes"]
+
+
+# ============================================================
+# KEYSET PAGINATION
+# ============================================================
+
+class TestMessagePages:
+    def test_recent_messages_are_newest_first_and_limited(self, db):
+        conv = _conversation(db, [("user", f"m{i}") for i in range(6)])
+        recent = tutor_service.get_recent_messages(db, conv.id, 3)
+        assert [m.content for m in recent] == ["m5", "m4", "m3"]
+
+    def test_api_pages_backwards_and_forwards(self, client, db, user_and_headers):
+        _, headers = user_and_headers
+        user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+        conv = tutor_service.create_conversation(db, user_id=user_id)
+        for i in range(5):
+            tutor_service.add_message(db, conv.id, "user", f"m{i}")
+        url = f"/api/ai/conversations/{conv.id}"
+
+        latest = client.get(url, params={"limit": 2}, headers=headers).json()
+        assert [m["content"] for m in latest["messages"]] == ["m3", "m4"] and latest["has_more"]
+
+        older = client.get(url, params={"limit": 2, "before_id": latest["messages"][0]["id"]}, headers=headers).json()
+        assert [m["content"] for m in older["messages"]] == ["m1", "m2"] and older["has_more"]
+
+        oldest = client.get(url, params={"limit": 2, "before_id": older["messages"][0]["id"]}, headers=headers).json()
+        assert [m["content"] for m in oldest["messages"]] == ["m0"] and not oldest["has_more"]
+
+        newer = client.get(url, params={"limit": 3, "after_id": oldest["messages"][0]["id"]}, headers=headers).json()
+        assert [m["content"] for m in newer["messages"]] == ["m1", "m2", "m3"] and newer["has_more"]
+
+        both = client.get(url, params={"before_id": 1, "after_id": 1}, headers=headers)
+        assert both.status_code == 400
+
+
+class TestConversationList:
+    def test_listing_uses_maintained_counters(self, client, db, user_and_headers):
+        _, headers = user_and_headers
+        user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+        older = tutor_service.create_conversation(db, user_id=user_id, topic="older")
+        newer = tutor_service.create_conversation(db, user_id=user_id, topic="newer")
+        tutor_service.add_message(db, newer.id, "assistant", "Welcome!")
+        tutor_service.add_message(db, newer.id, "user", "What is dynamic programming " + "x" * 100)
+        tutor_service.add_message(db, newer.id, "user", "second question")
+        tutor_service.add_message(db, older.id, "user", "revived")   # most recent activity
+
+        data = client.get("/api/ai/conversations", headers=headers).json()
+        assert data["total"] == 2
+        first, second = data["conversations"]
+        assert (first["id"], first["message_count"], first["preview"]) == (older.id, 1, "revived")
+        assert second["message_count"] == 3
+        assert second["preview"].startswith("What is dynamic programming") and second["preview"].endswith("...")
+        assert len(second["preview"]) == 83
+
+    def test_write_behind_flush_updates_counters(self, db, writer):
+        conv = tutor_service.create_conversation(db, user_id=None)
+
+        async def _run():
+            tutor_service.add_message(db, conv.id, "user", "hi")
+            tutor_service.add_message(db, conv.id, "assistant", "hello")
+            await writer.aclose()
+
+        asyncio.run(_run())
+        row = db.query(Conversation).filter(Conversation.id == conv.id).one()
+        assert (row.message_count, row.preview) == (2, "hi")
+        assert row.last_message_at is not None
+
+
+# ============================================================
+# COLD STORAGE
+# ============================================================
+
+def _idle(db, conv, days=40):
+    from datetime import datetime, timedelta, timezone
+
+    db.query(Conversation).filter(Conversation.id == conv.id).update(
+        {"last_message_at": datetime.now(timezone.utc) - timedelta(days=days)}
+    )
+    db.commit()
+
+
+class TestColdStorage:
+    def test_idle_conversation_is_packed_and_rehydrated_on_read(self, db):
+        conv = _conversation(db, [("user", "What is a trie?"), ("assistant", "A prefix tree. " * 50)])
+        before = [(m.id, m.role, m.content) for m in _stored(db, conv.id)]
+        _idle(db, conv)
+
+        totals = tutor_archive.compact_idle_conversations(db, idle_days=30)
+        assert (totals["conversations"], totals["messages"]) == (1, 2)
+        assert totals["stored_bytes"] < totals["raw_bytes"]
+        assert _stored(db, conv.id) == []
+        row = db.query(Conversation).filter(Conversation.id == conv.id).one()
+        assert row.archived_at is not None and row.message_count == 2
+
+        msgs = tutor_service.get_conversation_messages(db, conv.id)
+        assert [(m.id, m.role, m.content) for m in msgs] == before
+        assert db.get(ConversationArchive, conv.id) is None
+        assert db.query(Conversation).filter(Conversation.id == conv.id).one().archived_at is None
+
+    def test_active_conversations_are_left_alone(self, db):
+        conv = _conversation(db, [("user", "hi")])
+        assert tutor_archive.compact_idle_conversations(db, idle_days=30)["conversations"] == 0
+        assert len(_stored(db, conv.id)) == 1
+
+    def test_zlib_fallback_round_trip(self, db, monkeypatch):
+        monkeypatch.setattr(tutor_archive, "zstandard", None)
+        conv = _conversation(db, [("user", "héllo"), ("assistant", "wörld")])
+        _idle(db, conv)
+        tutor_archive.compact_idle_conversations(db, idle_days=30)
+        assert db.get(ConversationArchive, conv.id).codec == "zlib"
+
+        assert tutor_archive.rehydrate(db, conv.id) == 2
+        assert [m.content for m in _stored(db, conv.id)] == ["héllo", "wörld"]
+
+    def test_context_and_endpoint_rehydrate(self, client, db, user_and_headers, no_background_summaries):
+        _, headers = user_and_headers
+        user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+        conv = tutor_service.create_conversation(db, user_id=user_id)
+        for role, content in [("user", "q1"), ("assistant", "a1")]:
+            tutor_service.add_message(db, conv.id, role, content)
+        _idle(db, conv)
+        tutor_archive.compact_idle_conversations(db, idle_days=30)
+
+        tutor_service.add_message(db, conv.id, "user", "q2")   # appended while archived
+        data = client.get(f"/api/ai/conversations/{conv.id}", headers=headers).json()
+        assert [m["content"] for m in data["messages"]] == ["q1", "a1", "q2"]
+
+        messages = tutor_service.build_contextual_messages(db, conv.id, "q3")
+        assert [m["content"] for m in messages[1:]] == ["q1", "a1", "q2", "q3"]
+
+    def test_deleting_archived_conversation_drops_blob(self, db):
+        conv = _conversation(db, [("user", "bye")])
+        _idle(db, conv)
+        tutor_archive.compact_idle_conversations(db, idle_days=30)
+        tutor_service.delete_conversation(db, db.query(Conversation).filter(Conversation.id == conv.id).one())
+        assert db.query(ConversationArchive).count() == 0
+
+
+# ============================================================
+# SEARCH
+# ============================================================
+
+class TestConversationSearch:
+    def _seed(self, client, db, headers):
+        user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+        mine = tutor_service.create_conversation(db, user_id=user_id, topic="searching")
+        tutor_service.add_message(db, mine.id, "user", "How does binary search work on an <array>?")
+        tutor_service.add_message(db, mine.id, "assistant", "Binary search halves the search range every step.")
+        tutor_service.add_message(db, mine.id, "user", "And what about recursion?")
+        other = tutor_service.create_conversation(db, user_id=user_id + 1000)
+        tutor_service.add_message(db, other.id, "user", "binary search for someone else")
+        return mine
+
+    def test_ranked_results_scoped_to_user_with_highlights(self, client, db, user_and_headers):
+        _, headers = user_and_headers
+        mine = self._seed(client, db, headers)
+
+        resp = client.get("/api/ai/conversations/search", params={"q": "binary search"}, headers=headers)
+        assert resp.status_code == 200
+        results = resp.json()["results"]
+        assert {r["conversation_id"] for r in results} == {mine.id}
+        assert len(results) == 2
+        assert results[0]["role"] == "assistant"   # "search" twice ranks higher
+        assert results[0]["topic"] == "searching"
+        assert "<mark>Binary</mark>" in results[0]["snippet"]
+        question = results[1]["snippet"]
+        assert "&lt;array&gt;" in question and "<array>" not in question
+
+    def test_operators_in_query_are_literal(self, client, db, user_and_headers):
+        _, headers = user_and_headers
+        self._seed(client, db, headers)
+        for q in ['"OR (', "recursion*", "NEAR(binary"]:
+            resp = client.get("/api/ai/conversations/search", params={"q": q}, headers=headers)
+            assert resp.status_code == 200
+        assert client.get(
+            "/api/ai/conversations/search", params={"q": "recursion*"}, headers=headers
+        ).json()["results"][0]["snippet"].startswith("And what about <mark>recursion</mark>")
+
+    def test_archived_conversations_stay_searchable(self, client, db, user_and_headers):
+        _, headers = user_and_headers
+        mine = self._seed(client, db, headers)
+        search = lambda: client.get(
+            "/api/ai/conversations/search", params={"q": "recursion"}, headers=headers
+        ).json()["results"]
+
+        _idle(db, mine)
+        tutor_archive.compact_idle_conversations(db, idle_days=30)
+        [hit] = search()
+        assert hit["conversation_id"] == mine.id and hit["archived"]
+        assert hit["message_id"] is None and "<mark>recursion</mark>" in hit["snippet"]
+
+        tutor_archive.rehydrate(db, mine.id)
+        [hit] = search()
+        assert hit["message_id"] is not None and not hit["archived"]
+
+        _idle(db, mine)
+        tutor_archive.compact_idle_conversations(db, idle_days=30)
+        client.delete(f"/api/ai/conversations/{mine.id}", headers=headers)
+        assert search() == []
+
+
+# ============================================================
+# ASYNC SESSION PATH
+# ============================================================
+
+class TestAsyncSession:
+    def test_async_database_url(self):
+        from app.db.session import async_database_url
+
+        assert async_database_url("postgresql://u:p@db:5432/edai?sslmode=require") == (
+            "postgresql+asyncpg://u:p@db:5432/edai?ssl=require"
+        )
+        assert async_database_url("postgres://u@db/edai") == "postgresql+asyncpg://u@db/edai"
+        assert async_database_url("sqlite:////tmp/edai.db") == "sqlite+aiosqlite:////tmp/edai.db"
+
+    def test_engines_share_one_connection_budget(self):
+        from app.db import session
+
+        sync_pool, async_pool = session.engine.pool, session.get_async_engine().pool
+        assert sync_pool.size() + async_pool.size() == settings.DB_POOL_SIZE
+        assert sync_pool._max_overflow + async_pool._max_overflow == settings.DB_MAX_OVERFLOW
+
+    def test_async_routes_make_no_sync_db_calls(self, client, stub_ai, user_and_headers):
+        from app.db.session import get_db
+        from app.main import app
+
+        def _no_sync_db():
+            raise AssertionError("sync session used by an async route")
+            yield  # pragma: no cover
+
+        _, headers = user_and_headers
+        app.dependency_overrides[get_db] = _no_sync_db
+        resp = client.post("/api/ai/chat/stream", json={"message": "What is a trie?"}, headers=headers)
+        conv_id = _sse_events(resp)[0]["conversation_id"]
+        assert client.post("/api/ai/ask", json={"prompt": "And a heap?"}, headers=headers).status_code == 200
+        resumed = client.get(f"/api/ai/chat/stream/{conv_id}/resume?last_event_id={max(_sse_ids(resp))}", headers=headers)
+        assert resumed.status_code == 200
+
+        bad = client.post("/api/ai/ask", json={"prompt": "x"}, headers={"Authorization": "Bearer nope"})
+        assert bad.status_code == 401
+
+    def test_prepare_turn_and_reply_on_async_session(self, db, no_background_summaries):
+        async def _run():
+            adb = TestingAsyncSessionLocal()
+            conv_id, messages = await tutor_service.prepare_turn(
+                adb, None, None, "What is a heap?", topic="dsa", extra_system="Be brief."
+            )
+            await tutor_service.release_connection_async(adb)
+            await tutor_service.save_streamed_reply_async(adb, conv_id, "A tree-shaped priority queue.")
+            return conv_id, messages
+
+        conv_id, messages = asyncio.run(_run())
+        assert messages[-1] == {"role": "user", "content": "What is a heap?"}
+        assert any(m["content"] == "Be brief." for m in messages if m["role"] == "system")
+        row = db.query(Conversation).filter(Conversation.id == conv_id).one()
+        assert (row.topic, row.message_count) == ("dsa", 2)
+        assert [m.role for m in _stored(db, conv_id)] == ["user", "assistant"]
+
+    @pytest.mark.parametrize("write_behind", [False, True])
+    def test_concurrent_turns_share_the_event_loop(self, db, monkeypatch, no_background_summaries, write_behind):
+        monkeypatch.setattr(settings, "TUTOR_WRITE_BEHIND", write_behind)
+        writer = TutorWriter(session_factory=TestingSessionLocal)
+        monkeypatch.setattr(tutor_service, "tutor_writer", writer)
+        conv = _conversation(db, [("user", "earlier"), ("assistant", "answer")])
+
+        async def _turn(i):
+            adb = TestingAsyncSessionLocal()
+            try:
+                conv_id, messages = await tutor_service.prepare_turn(
+                    adb, conv.id, None, f"question {i}", topic=None, extra_system=None
+                )
+                await tutor_service.release_connection_async(adb)
+                await tutor_service.save_streamed_reply_async(adb, conv_id, f"reply {i}")
+                return messages
+            finally:
+                await adb.close()
+
+        async def _run():
+            # Several turns on one worker: every one must finish, none may block the loop
+            results = await asyncio.wait_for(asyncio.gather(*(_turn(i) for i in range(5))), timeout=20)
+            await writer.aclose()
+            return results
+
+        for i, messages in enumerate(asyncio.run(_run())):
+            assert messages[-1] == {"role": "user", "content": f"question {i}"}
+            assert {"role": "user", "content": "earlier"} in messages
+        contents = [m.content for m in _stored(db, conv.id)]
+        assert len(contents) == 12
+        assert {f"reply {i}" for i in range(5)} <= set(contents)
@@ -122,6 +122,8 @@ export interface ProblemListResponse {
   total: number;
   page: number;
   page_size: number;
+  /** Pass back as `cursor` to fetch the next page; null on the last page. */
+  next_cursor?: string | null;
 }
 
 export interface ProblemStats {
@@ -145,6 +147,7 @@ export const problemsApi = {
     difficulty?: string;
     category?: string;
     status?: string;
+    cursor?: string;
   }): Promise<ProblemListResponse> => {
     const queryParams = new URLSearchParams();
     Object.entries(params).forEach(([key, value]) => {